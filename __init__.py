@@ -1,55 +1,116 @@
 from .lua_code_gen import body_to_code as lua_node_to_code
 from .lua_code_gen import LuaParser as LuaCodeGenerator
+from .lua_code_gen import LuaEmitter as LuaCodeEmitter
+from .lua_code_gen import LuaMinifier as LuaCodeMinifier
 from .parse_python import PythonParser
-from .parse_lua import LuaParser
+from .parse_lua import LuaParser, store_chunk_return, rename_functions
 from . import lua_nodes as LuaNodes
+from .parser_pool import ParserPool, get_pool, set_pool_size, luaparse_version
+from .ast_cache import AstCache, get_cache, set_cache
+from . import lua_parser
+from .batch import transpile_tree, TranspileResult
+from .incremental import transpile_incremental, IncrementalResult
+from .watch import Watcher, write_if_changed
+from .profiling import Profile, MemoryBudgetExceeded, get_profile, set_profile, phase
+from .optimize import optimize_py_ast
+from .runtime import LuaTable
+from .importer import LuaFinder, LuaPathHook, install_import_hook, uninstall_import_hook
+from .lua_fold import fold_lua_ast
+from .lua_hoist import hoist_lua_globals
+from .source_map import SourceMap, map_python_lines, remap_stats, remap_text
 
-import subprocess
-import tempfile
-import astor
-import json
+import ast
 import sys
-import os
+import io
+import astor
+
+# Bumped whenever the code objects compile_lua returns change.
+code_version = "3"
 
-def get_lua_ast(file, version):
+@phase("get_lua_ast")
+def get_lua_ast(file, version, pool=None, parser="node", cache=None,
+				encoding="json", nodes=False, locations=False):
 	"""Returns the lua abstract syntax tree of a given file."""
-	stdout, stderr = subprocess.Popen(
-		["node", "./lua-parser.js", file, version],
-		stdout=subprocess.PIPE, stderr=subprocess.PIPE
-	).communicate()
-
-	if stderr != b"":
-		sys.stderr.write(stderr.decode())
-		raise Exception()
-
-	return json.loads(stdout)
-
-def gen_lua_ast(lua_code, version):
-	"""Returns the lua abstract syntax tree of a given code."""
-	if isinstance(lua_code, bytes):
-		mode = "wb"
-	elif isinstance(lua_code, str):
-		mode = "w"
-	else:
+	with open(file, "rb") as source:
+		return gen_lua_ast(
+			source.read(), version, pool, parser, cache, encoding, nodes, locations
+		)
+
+def get_parser_version(parser):
+	"""Returns the name and version of a lua parser, keying its trees."""
+	if parser == "native":
+		return "native-" + lua_parser.VERSION
+	if parser == "node":
+		return "luaparse-" + luaparse_version()
+	raise ValueError(f"Unknown lua parser: {parser}")
+
+@phase("gen_lua_ast")
+def gen_lua_ast(lua_code, version, pool=None, parser="node", cache=None,
+				encoding="json", nodes=False, locations=False):
+	"""Returns the lua abstract syntax tree of a given code.
+	`parser` is either "node" (luaparse through the worker pool, which
+	sends the tree back as "json" or "binary" depending on `encoding`)
+	or "native" (the in-process lua_parser module). Trees are looked up
+	in `cache` (or the shared one, see set_cache) before parsing.
+	With `nodes`, the tree is made of LuaNodes classes instead of dicts.
+	With `locations`, the statements and functions (every node, with
+	luaparse) have a "loc" key, used by the source maps."""
+	if not isinstance(lua_code, (bytes, str)):
 		raise TypeError("lua_code must be either a str or bytes object.")
 	version = str(version) # Force string.
+	parser_version = get_parser_version(parser)
+
+	cache = cache or get_cache()
+	if cache is not None:
+		key = cache.key(
+			lua_code, version, parser_version, *(("locations",) if locations else ())
+		)
+		lua_ast = cache.get(key)
+		if lua_ast is not None:
+			return LuaNodes.from_dict(lua_ast) if nodes else lua_ast
 
-	file_data = tempfile.mksfile()
-	with open(file_data[0], mode) as file:
-		file.write(lua_code)
+	if parser == "native":
+		profile = get_profile()
+		progress = profile.check if profile is not None and profile.budget else None
+		lua_ast = lua_parser.parse(lua_code, version, progress, locations)
+	else:
+		lua_ast = (pool or get_pool()).parse(lua_code, version, encoding, locations)
 
-	ast = get_lua_ast(file_data[1], version)
-	os.unlink(file_data[1])
-	return ast
+	if cache is not None:
+		cache.put(key, lua_ast)
+	return LuaNodes.from_dict(lua_ast) if nodes else lua_ast
 
+@phase("gen_py_code")
 def gen_py_code(py_ast, *args, **kwargs):
 	"""Returns a python code generated from
 	a python abstract syntax tree."""
 	return astor.code_gen.to_source(py_ast, *args, **kwargs)
 
-def gen_lua_code(lua_ast, indent="  ", generator=None):
+@phase("gen_lua_code")
+def gen_lua_code(lua_ast, indent="  ", generator=None, output=None, source_map=None,
+				 minify=0):
 	"""Returns a lua code generated from
-	a lua abstract syntax tree."""
+	a lua abstract syntax tree.
+	With `output`, a text stream, the code of the chunk is written to it
+	as it is generated (see LuaCodeEmitter) and None is returned in
+	place of the code. With `source_map`, the lines of the statements
+	located in the tree are mapped in it (always with LuaCodeEmitter).
+	With `minify`, the code is generated by LuaCodeMinifier, renaming
+	the local variables from level 2, and isn't mapped."""
+	if minify:
+		generator = generator or LuaCodeMinifier(rename=minify > 1)
+		result = generator.visit(lua_ast)
+		if output is None:
+			return generator, result
+		output.write(result)
+		return generator, None
+
+	if output is not None or source_map is not None:
+		stream = io.StringIO() if output is None else output
+		generator = generator or LuaCodeEmitter(stream, indent, source_map)
+		generator.visit(lua_ast)
+		return generator, (stream.getvalue() if output is None else None)
+
 	generator = generator or LuaCodeGenerator(indent)
 	result = generator.visit(lua_ast)
 
@@ -58,14 +119,119 @@ def gen_lua_code(lua_ast, indent="  ", generator=None):
 
 	return generator, result
 
+@phase("lua_to_py_ast")
 def lua_to_py_ast(lua_ast, generator=None):
 	"""Returns a python abstract syntax tree generated from
 	a lua one."""
 	generator = generator or LuaParser()
-	return generator, generator.visit(lua_ast)
+	return generator, generator.visit(lua_ast, [])
 
+@phase("py_to_lua_ast")
 def py_to_lua_ast(py_ast, generator=None):
 	"""Returns a lua abstract syntax tree generated from
 	a python one."""
 	generator = generator or PythonParser()
-	return generator, generator.visit(py_ast)
\ No newline at end of file
+	return generator, generator.visit(py_ast, [])
+
+directions = {
+	"lua2py": (".lua", ".py"),
+	"py2lua": (".py", ".lua"),
+	"lua2lua": (".lua", ".lua")
+}
+
+@phase("transpile")
+def transpile(code, direction, version="5.1", parser="node", indent="  ",
+			  output=None, concat="call", optimize=0, tables="dict",
+			  source_map=None, minify=0):
+	"""Returns the given code converted in a direction
+	("lua2py", "py2lua" or "lua2lua"). With `output`, the code is
+	written to that text stream instead and None is returned.
+	Python code is generated with the `concat` and `tables` modes of
+	LuaParser and the `optimize` level of optimize_py_ast; from level 1,
+	the lua trees are folded by fold_lua_ast too, and from level 2 the
+	lua code generated reads its hot globals from locals (see
+	hoist_lua_globals).
+	With `source_map`, a SourceMap, the lines and function names of the
+	generated code are mapped to the ones of `code` in it. Lua code is
+	minified with a `minify` level (see gen_lua_code)."""
+	if direction == "py2lua":
+		lua_ast = py_to_lua_ast(ast.parse(code))[1]
+		if optimize:
+			lua_ast = fold_lua_ast(lua_ast, version)
+		if optimize > 1:
+			lua_ast = hoist_lua_globals(lua_ast, version)
+		return gen_lua_code(
+			lua_ast, indent, output=output, source_map=source_map, minify=minify
+		)[1]
+
+	lua_ast = gen_lua_ast(code, version, parser=parser, locations=source_map is not None)
+	if optimize:
+		lua_ast = fold_lua_ast(lua_ast, version)
+	if direction == "lua2lua":
+		if optimize > 1:
+			lua_ast = hoist_lua_globals(lua_ast, version)
+		return gen_lua_code(
+			lua_ast, indent, output=output, source_map=source_map, minify=minify
+		)[1]
+	if direction == "lua2py":
+		generator, py_ast = lua_to_py_ast(
+			lua_ast, LuaParser(concat=concat, tables=tables)
+		)
+		if optimize:
+			py_ast = optimize_py_ast(py_ast, optimize)
+		result = gen_py_code(py_ast)
+		if source_map is not None:
+			map_python_lines(py_ast, result, source_map)
+			source_map.names.update(generator.names)
+		if output is None:
+			return result
+		output.write(result)
+		return None
+	raise ValueError(f"Unknown direction: {direction}")
+
+@phase("compile_lua")
+def compile_lua(lua_code, filename="<lua>", version="5.1", parser="node",
+				concat="call", optimize=0, tables="dict", cache=None):
+	"""Returns the code object of a lua code converted to python (like
+	transpile would), compiled from the python tree, without generating
+	and parsing its code. Statements keep their lua lines (the prelude
+	is on line 0), functions their lua names (see rename_functions),
+	and the return ending the chunk assigns LUA_RETURN instead (see
+	store_chunk_return).
+
+	Code objects are looked up in `cache` (or the shared one, see
+	set_cache) before converting, keyed by the code, the options and
+	the python version."""
+	if not isinstance(lua_code, (bytes, str)):
+		raise TypeError("lua_code must be either a str or bytes object.")
+	version = str(version)
+
+	cache = cache or get_cache()
+	if cache is not None:
+		key = cache.key(
+			lua_code, version, get_parser_version(parser), "code", code_version,
+			sys.implementation.cache_tag, filename, concat, optimize, tables
+		)
+		code = cache.get(key)
+		if code is not None:
+			return code
+
+	lua_ast = gen_lua_ast(lua_code, version, parser=parser, cache=cache, locations=True)
+	if optimize:
+		lua_ast = fold_lua_ast(lua_ast, version)
+	generator, py_ast = lua_to_py_ast(lua_ast, LuaParser(concat=concat, tables=tables))
+	# The prelude (LUA_CONCAT, ...) is on line 0, so tracebacks of errors
+	# in it don't show a line of the lua code.
+	for statement in py_ast.body[:len(generator.prelude())]:
+		for node in ast.walk(statement):
+			if "lineno" in node._attributes:
+				node.lineno = node.end_lineno = 0
+				node.col_offset = node.end_col_offset = 0
+	if optimize:
+		py_ast = optimize_py_ast(py_ast, optimize)
+
+	py_ast = ast.fix_missing_locations(store_chunk_return(py_ast))
+	code = rename_functions(compile(py_ast, filename, "exec"), generator.names)
+	if cache is not None:
+		cache.put(key, code)
+	return code
@@ -0,0 +1,144 @@
+import tempfile
+import hashlib
+import marshal
+import zlib
+import os
+
+magic = b"HLA\x01"
+
+class AstCache:
+	"""A content addressed on-disk cache of lua abstract syntax trees,
+	and of the code objects compile_lua returns.
+
+	Entries are zlib compressed marshal dumps, written atomically so
+	several processes can share a directory. Once the directory grows
+	past `max_size` bytes, the least recently used entries are removed."""
+
+	def __init__(self, directory, max_size=256 * 1024 * 1024):
+		self.directory = directory
+		self.max_size = max_size
+		self.size = None # Lazily computed
+		os.makedirs(directory, exist_ok=True)
+
+	def key(self, lua_code, version, parser_version, *options):
+		"""Returns the key of a code. Entries that aren't trees, like
+		compiled code, are told apart by their `options`."""
+		if isinstance(lua_code, str):
+			lua_code = lua_code.encode()
+
+		digest = hashlib.sha256()
+		digest.update(f"{version}\0{parser_version}\0".encode())
+		for option in options:
+			digest.update(f"{option}\0".encode())
+		digest.update(lua_code)
+		return digest.hexdigest()
+
+	def path(self, key):
+		return os.path.join(self.directory, key[:2], key[2:])
+
+	def get(self, key):
+		"""Returns the cached entry for a key, or None."""
+		path = self.path(key)
+		try:
+			with open(path, "rb") as file:
+				data = file.read()
+		except OSError:
+			return None
+
+		if not data.startswith(magic):
+			return None
+		try:
+			ast = marshal.loads(zlib.decompress(data[len(magic):]))
+		except (ValueError, EOFError, TypeError, zlib.error):
+			return None
+
+		try:
+			os.utime(path) # Mark as recently used
+		except OSError:
+			pass
+		return ast
+
+	def put(self, key, ast):
+		data = magic + zlib.compress(marshal.dumps(ast), 1)
+		path = self.path(key)
+		directory = os.path.dirname(path)
+		os.makedirs(directory, exist_ok=True)
+
+		replaced = 0 # Size of the entry overwritten
+		if self.size is not None:
+			try:
+				replaced = os.stat(path).st_size
+			except OSError:
+				pass
+
+		descriptor, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+		try:
+			with os.fdopen(descriptor, "wb") as file:
+				file.write(data)
+			os.replace(temporary, path)
+		except BaseException:
+			try:
+				os.unlink(temporary)
+			except OSError:
+				pass
+			raise
+
+		if self.size is None:
+			self.size = sum(size for _, size, _ in self.entries())
+		else:
+			self.size += len(data) - replaced
+		if self.size > self.max_size:
+			self.evict()
+
+	def entries(self):
+		"""Yields (path, size, last use) for every entry."""
+		for prefix in os.scandir(self.directory):
+			if not prefix.is_dir():
+				continue
+
+			for entry in os.scandir(prefix.path):
+				if entry.name.endswith(".tmp"):
+					continue
+				try:
+					stat = entry.stat()
+				except OSError:
+					continue
+				yield entry.path, stat.st_size, stat.st_mtime
+
+	def evict(self, target=None):
+		"""Removes the least recently used entries until the cache
+		is below `target` bytes (90% of max_size by default)."""
+		if target is None:
+			target = self.max_size * 0.9
+
+		entries = sorted(self.entries(), key=lambda entry: entry[2])
+		size = sum(entry[1] for entry in entries)
+
+		for path, entry_size, _ in entries:
+			if size <= target:
+				break
+			try:
+				os.unlink(path)
+			except OSError:
+				continue
+			size -= entry_size
+
+		self.size = size
+
+	def clear(self):
+		self.evict(0)
+
+default_cache = None
+
+def get_cache():
+	"""Returns the shared cache, or None if caching is disabled."""
+	return default_cache
+
+def set_cache(directory, max_size=256 * 1024 * 1024):
+	"""Enables the shared cache in a directory (None disables it)."""
+	global default_cache
+	if directory is None:
+		default_cache = None
+	else:
+		default_cache = AstCache(directory, max_size)
+	return default_cache
@@ -0,0 +1,22 @@
+"""Binary interchange of lua abstract syntax trees.
+
+lua-parser.js can answer with the tree serialized in CPython's marshal
+format (version 4) instead of JSON. Every distinct string (node types,
+keys, names, operators) is written once and referenced by index after
+that, short ASCII strings are interned, and numbers are stored as
+binary integers and doubles. Decoding is a single marshal.loads call,
+so it runs entirely in C."""
+import marshal
+
+version = 4
+
+def encode(lua_ast):
+	"""Returns the binary encoding of an abstract syntax tree."""
+	return marshal.dumps(lua_ast, version)
+
+def decode(data):
+	"""Returns the abstract syntax tree of a binary encoding."""
+	try:
+		return marshal.loads(data)
+	except (EOFError, ValueError, TypeError) as error:
+		raise ValueError(f"Invalid binary lua abstract syntax tree: {error}")
@@ -0,0 +1,156 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from collections import namedtuple
+import time
+import os
+
+from .ast_cache import get_cache, set_cache
+
+TranspileResult = namedtuple(
+	"TranspileResult", ("source", "destination", "error", "elapsed")
+)
+
+def collect_files(src, suffix):
+	"""Returns the sorted relative paths of every file under src
+	with the given suffix."""
+	files = []
+
+	for root, directories, names in os.walk(src):
+		directories.sort()
+		for name in names:
+			if name.endswith(suffix):
+				files.append(os.path.relpath(os.path.join(root, name), src))
+
+	files.sort()
+	return files
+
+def chunk_by_size(sizes, jobs):
+	"""Groups file indexes into chunks of roughly the same total size,
+	biggest chunks first. Big files get a chunk of their own, small ones
+	are packed together to amortize the inter-process overhead."""
+	order = sorted(range(len(sizes)), key=lambda index: -sizes[index])
+	target = max(sum(sizes) // (jobs * 4), 1)
+
+	chunks, current, current_size = [], [], 0
+	for index in order:
+		current.append(index)
+		current_size += sizes[index]
+		if current_size >= target:
+			chunks.append(current)
+			current, current_size = [], 0
+
+	if current:
+		chunks.append(current)
+	return chunks
+
+def transpile_file(source, destination, direction, version, parser, indent,
+				   memory_budget=None, concat="call", optimize=0, tables="dict",
+				   minify=0):
+	from . import Profile, get_profile, set_profile, transpile
+
+	start = time.perf_counter()
+	if memory_budget is not None:
+		previous = get_profile()
+		set_profile(Profile(budget=memory_budget))
+	try:
+		with open(source, encoding="utf-8") as file:
+			code = file.read()
+
+		result = transpile(
+			code, direction, version, parser, indent,
+			concat=concat, optimize=optimize, tables=tables, minify=minify
+		)
+
+		os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+		with open(destination, "w", encoding="utf-8") as file:
+			file.write(result)
+	except Exception as error: # One bad file must not abort the batch
+		return TranspileResult(
+			source, destination,
+			f"{type(error).__name__}: {error}",
+			time.perf_counter() - start
+		)
+	finally:
+		if memory_budget is not None:
+			set_profile(previous)
+
+	return TranspileResult(source, destination, None, time.perf_counter() - start)
+
+def transpile_chunk(tasks, direction, version, parser, indent, memory_budget=None,
+					concat="call", optimize=0, tables="dict", minify=0):
+	return [
+		(index, transpile_file(
+			source, destination, direction, version, parser, indent,
+			memory_budget, concat, optimize, tables, minify
+		))
+		for index, source, destination in tasks
+	]
+
+def transpile_tree(src, dst, direction, jobs=None, version="5.1", parser="node",
+				   indent="  ", report=None, memory_budget=None, concat="call",
+				   optimize=0, tables="dict", minify=0):
+	"""Converts every file under src into dst, keeping the directory
+	layout, using `jobs` processes. Returns the TranspileResult of every
+	file, in path order, and calls `report` with each of them in the
+	same order as soon as it is available.
+
+	With a `memory_budget`, in bytes, the memory of every conversion is
+	traced (see Profile) and a file going over the budget fails with
+	MemoryBudgetExceeded instead of taking its worker down. `concat`,
+	`optimize`, `tables` and `minify` are passed to transpile."""
+	from . import directions
+
+	if direction not in directions:
+		raise ValueError(f"Unknown direction: {direction}")
+	source_suffix, destination_suffix = directions[direction]
+	jobs = jobs or os.cpu_count() or 1
+
+	files = collect_files(src, source_suffix)
+	tasks = []
+	for index, path in enumerate(files):
+		tasks.append((
+			index,
+			os.path.join(src, path),
+			os.path.join(dst, path[:-len(source_suffix)] + destination_suffix)
+		))
+
+	results = [None] * len(tasks)
+	reported = 0
+
+	def collect(chunk_results):
+		nonlocal reported
+		for index, result in chunk_results:
+			results[index] = result
+
+		while reported < len(results) and results[reported] is not None:
+			if report is not None:
+				report(results[reported])
+			reported += 1
+
+	if jobs == 1 or len(tasks) <= 1:
+		for task in tasks:
+			collect(transpile_chunk(
+				[task], direction, version, parser, indent, memory_budget,
+				concat, optimize, tables, minify
+			))
+		return results
+
+	# Workers share the cache of this process, if any.
+	cache = get_cache()
+	cache_args = (cache.directory, cache.max_size) if cache is not None else (None,)
+
+	sizes = [os.path.getsize(task[1]) for task in tasks]
+	with ProcessPoolExecutor(jobs, initializer=set_cache, initargs=cache_args) as executor:
+		futures = [
+			executor.submit(
+				transpile_chunk,
+				[tasks[index] for index in chunk],
+				direction, version, parser, indent, memory_budget,
+				concat, optimize, tables, minify
+			)
+			for chunk in chunk_by_size(sizes, jobs)
+		]
+
+		for future in as_completed(futures):
+			collect(future.result())
+
+	return results
@@ -0,0 +1,65 @@
+"""Compares the JSON and binary tree interchange with lua-parser.js.
+
+	python -m <package>.benchmarks.ast_codec [--version 5.1] [file.lua ...]
+
+Reports bytes transferred and python side decode time per format. When
+node (or luaparse) is not available, the trees are produced by the native
+parser and encoded on the python side instead."""
+import argparse
+import json
+import time
+
+from .. import gen_lua_ast, get_pool, ast_codec
+from .lua_parser import generated_sources
+
+def payloads(code, version):
+	try:
+		pool = get_pool()
+		return (
+			pool.parse_raw(code, version, "json"),
+			pool.parse_raw(code, version, "binary"),
+			"lua-parser.js"
+		)
+	except (OSError, RuntimeError):
+		lua_ast = gen_lua_ast(code, version, parser="native")
+		return (
+			json.dumps(lua_ast, separators=(",", ":")).encode(),
+			ast_codec.encode(lua_ast),
+			"python encoder"
+		)
+
+def timed(function, data, rounds):
+	function(data)
+	start = time.perf_counter()
+	for _ in range(rounds):
+		function(data)
+	return (time.perf_counter() - start) / rounds
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("files", nargs="*")
+	parser.add_argument("--version", default="5.1")
+	parser.add_argument("--rounds", type=int, default=20)
+	args = parser.parse_args()
+
+	if args.files:
+		sources = []
+		for path in args.files:
+			with open(path, encoding="utf-8") as file:
+				sources.append((path, file.read()))
+	else:
+		sources = list(generated_sources())
+
+	for name, code in sources:
+		json_data, binary_data, origin = payloads(code, args.version)
+		json_time = timed(json.loads, json_data, args.rounds)
+		binary_time = timed(ast_codec.decode, binary_data, args.rounds)
+
+		print(f"{name} ({len(code.encode())} source bytes, {origin}):")
+		print(f"  json:   {len(json_data):>10} bytes {json_time * 1000:8.3f} ms")
+		print(f"  binary: {len(binary_data):>10} bytes {binary_time * 1000:8.3f} ms "
+			  f"({json_time / binary_time:.1f}x faster, "
+			  f"{len(binary_data) / len(json_data):.0%} of the bytes)")
+
+if __name__ == "__main__":
+	main()
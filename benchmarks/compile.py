@@ -0,0 +1,87 @@
+"""Times loading the corpus scripts as python code objects.
+
+	python -m <package>.benchmarks.compile [--copies 20] [--rounds 5]
+
+Every script of the corpus, repeated --copies times, is turned into a
+code object three ways, best of --rounds:
+
+	source: transpile, then compile the python code it generated
+	compile_lua: compiled from the python tree, with an empty cache
+	cached: compile_lua again, reading the code object from the cache
+
+The native lua parser is used, and the code objects must use the same
+global names. The return ending a script (of its module table) is only kept
+once, at the end of the copies, and dropped for the source way, which
+can't compile it."""
+import argparse
+import tempfile
+import time
+import os
+
+from .. import AstCache, compile_lua, transpile
+from .suite import corpus
+
+def load_scripts(copies):
+	"""Returns {name: (copies without returns, their final return)}."""
+	scripts = {}
+	for name in sorted(os.listdir(corpus)):
+		if name.endswith(".lua"):
+			with open(os.path.join(corpus, name), encoding="utf-8") as file:
+				code = file.read()
+			body, found, value = code.rpartition("\nreturn ")
+			if not found:
+				body, value = code, ""
+			scripts[name] = (body * copies, found.lstrip() + value)
+	return scripts
+
+def best(function, rounds):
+	elapsed = float("inf")
+	for _ in range(rounds):
+		start = time.perf_counter()
+		function()
+		elapsed = min(elapsed, time.perf_counter() - start)
+	return elapsed
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--copies", type=int, default=20)
+	parser.add_argument("--rounds", type=int, default=5)
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as directory:
+		for name, (body, end) in load_scripts(args.copies).items():
+			code = body + "\n" + end
+
+			def source():
+				python = transpile(body, "lua2py", parser="native")
+				return compile(python, name, "exec")
+
+			def uncached():
+				return compile_lua(code, name, parser="native", cache=AstCache(
+					tempfile.mkdtemp(dir=directory)
+				))
+
+			cache = AstCache(os.path.join(directory, "shared"))
+			compile_lua(code, name, parser="native", cache=cache)
+
+			def cached():
+				return compile_lua(code, name, parser="native", cache=cache)
+
+			# Functions of method declarations get random names.
+			names = [
+				{global_name for global_name in compiled.co_names
+				 if not global_name.startswith("hybridpython_var_")}
+				for compiled in (source(), cached())
+			]
+			if names[0] - names[1]:
+				raise AssertionError(f"{name}: the code objects differ")
+
+			timings = [best(function, args.rounds) for function in (source, uncached, cached)]
+			print(
+				f"{name}: source {timings[0] * 1000:.1f} ms, "
+				f"compile_lua {timings[1] * 1000:.1f} ms ({timings[0] / timings[1]:.2f}x), "
+				f"cached {timings[2] * 1000:.2f} ms ({timings[0] / timings[2]:.0f}x)"
+			)
+
+if __name__ == "__main__":
+	main()
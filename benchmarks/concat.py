@@ -0,0 +1,98 @@
+"""Times converted string-heavy lua scripts under every concat mode.
+
+	python -m <package>.benchmarks.concat [--size 20000] [--rounds 5]
+
+Every script is converted to python with LuaParser in the "call" and
+"join" modes (see LuaParser), executed, and its run(size) function
+timed, best of --rounds. The results of both modes must be equal."""
+import argparse
+import time
+
+from .. import LuaParser, gen_py_code, lua_parser
+
+scripts = {
+	# A few fields per line, from tostring results.
+	"csv": """
+local function run(size)
+	local rows = {}
+	for i = 1, size, 1 do
+		local name = "item" .. tostring(i)
+		rows[#rows + 1] = name .. "," .. tostring(i * 2) .. "," .. tostring(i % 7) .. "\\n"
+	end
+	return #rows
+end
+""",
+	# Nested calls building markup around strings.
+	"markup": """
+local function tag(name, content)
+	return "<" .. name .. ">" .. content .. "</" .. name .. ">"
+end
+
+local function run(size)
+	local total = 0
+	for i = 1, size, 1 do
+		local cell = tag("td", "value " .. tostring(i))
+		local row = tag("tr", cell .. tag("td", "x") .. tag("td", "y"))
+		total = total + #row
+	end
+	return total
+end
+""",
+	# Log lines of mostly literal parts.
+	"log": """
+local function format(level, module, message, count)
+	return "[" .. level .. "] " .. module .. ": " .. message .. " (" .. tostring(count) .. " times)"
+end
+
+local function run(size)
+	local last = ""
+	for i = 1, size, 1 do
+		last = format("INFO", "scheduler", "task " .. tostring(i) .. " done", i)
+	end
+	return last
+end
+"""
+}
+
+environment = {"tostring": str}
+
+def convert(code, concat):
+	lua_ast = lua_parser.parse(code)
+	return gen_py_code(LuaParser(concat=concat).visit(lua_ast, []))
+
+def time_script(code, concat, size, rounds):
+	"""Returns (result, best time) of running a converted script."""
+	namespace = dict(environment)
+	exec(compile(convert(code, concat), "<" + concat + ">", "exec"), namespace)
+	run = namespace["run"]
+
+	elapsed = float("inf")
+	for _ in range(rounds):
+		start = time.perf_counter()
+		result = run(size)
+		elapsed = min(elapsed, time.perf_counter() - start)
+	return result, elapsed
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--size", type=int, default=20000)
+	parser.add_argument("--rounds", type=int, default=5)
+	args = parser.parse_args()
+
+	for name, code in scripts.items():
+		timings = {}
+		results = set()
+		for concat in ("call", "join"):
+			result, timings[concat] = time_script(code, concat, args.size, args.rounds)
+			results.add(result)
+		if len(results) != 1:
+			raise AssertionError(f"{name}: the concat modes returned {results}")
+
+		print(
+			f"{name}: call {timings['call'] * 1000:.1f} ms, "
+			f"join {timings['join'] * 1000:.1f} ms "
+			f"({timings['call'] / timings['join']:.2f}x)"
+		)
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,176 @@
+-- A small class library with inheritance, mixins and properties.
+local Class = {}
+Class.__index = Class
+
+local function copy(source, destination)
+	destination = destination or {}
+	for key, value in pairs(source) do
+		if type(value) == "table" and key ~= "__index" then
+			destination[key] = copy(value)
+		else
+			destination[key] = value
+		end
+	end
+	return destination
+end
+
+function Class:extend(name)
+	local child = copy(self)
+	child.__index = child
+	child.super = self
+	child.name = name or "Anonymous"
+	return setmetatable(child, {__index = self, __call = function(cls, ...)
+		return cls:new(...)
+	end})
+end
+
+function Class:new(...)
+	local instance = setmetatable({}, self)
+	if instance.init then
+		instance:init(...)
+	end
+	return instance
+end
+
+function Class:include(mixin)
+	for key, value in pairs(mixin) do
+		if key ~= "included" then
+			self[key] = value
+		end
+	end
+	if mixin.included then
+		mixin.included(self)
+	end
+	return self
+end
+
+function Class:is(other)
+	local current = getmetatable(self)
+	while current do
+		if current == other then
+			return true
+		end
+		current = current.super
+	end
+	return false
+end
+
+function Class:tostring()
+	return "<" .. (self.name or "instance") .. ">"
+end
+
+local Observable = {}
+
+function Observable.included(cls)
+	cls.listeners = {}
+end
+
+function Observable:on(event, callback)
+	local listeners = self.listeners[event]
+	if not listeners then
+		listeners = {}
+		self.listeners[event] = listeners
+	end
+	listeners[#listeners + 1] = callback
+end
+
+function Observable:emit(event, ...)
+	local listeners = self.listeners[event]
+	if listeners == nil then
+		return 0
+	end
+	for index = 1, #listeners, 1 do
+		listeners[index](self, ...)
+	end
+	return #listeners
+end
+
+local Vector = Class:extend("Vector")
+
+function Vector:init(x, y)
+	self.x = x or 0
+	self.y = y or 0
+end
+
+function Vector:add(other)
+	return Vector(self.x + other.x, self.y + other.y)
+end
+
+function Vector:scale(factor)
+	return Vector(self.x * factor, self.y * factor)
+end
+
+function Vector:length()
+	return math.sqrt(self.x * self.x + self.y * self.y)
+end
+
+function Vector:normalized()
+	local length = self:length()
+	if length == 0 then
+		return Vector(0, 0)
+	end
+	return self:scale(1 / length)
+end
+
+local Entity = Class:extend("Entity")
+Entity:include(Observable)
+
+function Entity:init(name, position, health)
+	self.label = name
+	self.position = position or Vector(0, 0)
+	self.health = health or 100
+	self.alive = true
+end
+
+function Entity:damage(amount, source)
+	if not self.alive then
+		return false
+	end
+	self.health = self.health - amount
+	self:emit("damaged", amount, source)
+	if self.health <= 0 then
+		self.alive = false
+		self:emit("died", source)
+	end
+	return true
+end
+
+function Entity:move(direction, speed, elapsed)
+	local step = direction:normalized():scale(speed * elapsed)
+	self.position = self.position:add(step)
+	self:emit("moved", self.position)
+end
+
+local Player = Entity:extend("Player")
+
+function Player:init(name, position)
+	Player.super.init(self, name, position, 150)
+	self.inventory = {}
+	self.gold = 0
+end
+
+function Player:pick(item, count)
+	local stack = self.inventory[item.id]
+	if stack then
+		stack.count = stack.count + (count or 1)
+	else
+		self.inventory[item.id] = {item = item, count = count or 1}
+	end
+	self.gold = self.gold + item.value * (count or 1)
+end
+
+function Player:describe()
+	local parts = {}
+	for id, stack in pairs(self.inventory) do
+		parts[#parts + 1] = stack.item.name .. " x" .. stack.count
+	end
+	return self.label .. " (" .. self.health .. " hp, " .. self.gold .. " gold): " .. table.concat(parts, ", ")
+end
+
+return {
+	Class = Class,
+	Observable = Observable,
+	Vector = Vector,
+	Entity = Entity,
+	Player = Player
+}
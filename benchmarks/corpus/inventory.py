@@ -0,0 +1,108 @@
+# Inventory bookkeeping for a shop: stock, orders and restocking.
+
+def new_inventory(name):
+    return {"name": name, "items": {}, "count": 0, "value": 0}
+
+
+def add_item(inventory, item_id, name, price, quantity):
+    items = inventory["items"]
+    if items[item_id] == None:
+        items[item_id] = {"name": name, "price": price, "quantity": 0, "sold": 0}
+        inventory["count"] = inventory["count"] + 1
+    item = items[item_id]
+    item["quantity"] = item["quantity"] + quantity
+    inventory["value"] = inventory["value"] + price * quantity
+    return item
+
+
+def remove_item(inventory, item_id, quantity):
+    item = inventory["items"][item_id]
+    if item == None:
+        return False
+    if item["quantity"] < quantity:
+        return False
+    item["quantity"] = item["quantity"] - quantity
+    inventory["value"] = inventory["value"] - item["price"] * quantity
+    return True
+
+
+def price_with_discount(price, quantity, discounts):
+    best = 0
+    for threshold, rate in pairs(discounts):
+        if quantity >= threshold and rate > best:
+            best = rate
+    return price * quantity * (1 - best)
+
+
+def place_order(inventory, order, discounts):
+    total = 0
+    missing = {}
+    for item_id, quantity in pairs(order["lines"]):
+        item = inventory["items"][item_id]
+        if item == None or item["quantity"] < quantity:
+            missing[item_id] = quantity
+        else:
+            total = total + price_with_discount(item["price"], quantity, discounts)
+
+    if next(missing) != None:
+        order["status"] = "rejected"
+        order["missing"] = missing
+        return 0
+
+    for item_id, quantity in pairs(order["lines"]):
+        remove_item(inventory, item_id, quantity)
+        item = inventory["items"][item_id]
+        item["sold"] = item["sold"] + quantity
+
+    order["status"] = "placed"
+    order["total"] = total
+    return total
+
+
+def restock_plan(inventory, minimum, batch):
+    plan = {}
+    for item_id, item in pairs(inventory["items"]):
+        if item["quantity"] < minimum:
+            needed = minimum - item["quantity"]
+            batches = math.ceil(needed / batch)
+            if item["sold"] > minimum * 2:
+                batches = batches + 1
+            plan[item_id] = batches * batch
+    return plan
+
+
+def best_sellers(inventory, limit):
+    ranking = {}
+    count = 0
+    for item_id, item in pairs(inventory["items"]):
+        count = count + 1
+        ranking[count] = {"id": item_id, "sold": item["sold"]}
+
+    index = 2
+    while index <= count:
+        current = ranking[index]
+        position = index - 1
+        while position >= 1 and ranking[position]["sold"] < current["sold"]:
+            ranking[position + 1] = ranking[position]
+            position = position - 1
+        ranking[position + 1] = current
+        index = index + 1
+
+    result = {}
+    for index in range(1, min(limit, count) + 1):
+        result[index] = ranking[index]["id"]
+    return result
+
+
+def report(inventory):
+    lines = {}
+    count = 0
+    for item_id, item in pairs(inventory["items"]):
+        count = count + 1
+        status = "ok"
+        if item["quantity"] == 0:
+            status = "out of stock"
+        elif item["quantity"] < 5:
+            status = "low"
+        lines[count] = string.format("%-20s %6d %8.2f  %s", item["name"], item["quantity"], item["price"], status)
+    return table.concat(lines, "\n")
@@ -0,0 +1,168 @@
+-- A* pathfinding over a tile grid, with diagonal moves and path smoothing.
+local grid = {}
+grid.__index = grid
+
+local neighbours = {
+	{1, 0, 1}, {-1, 0, 1}, {0, 1, 1}, {0, -1, 1},
+	{1, 1, 1.41421356}, {-1, 1, 1.41421356}, {1, -1, 1.41421356}, {-1, -1, 1.41421356}
+}
+
+function grid.new(width, height, walls)
+	local self = setmetatable({width = width, height = height, cells = {}}, grid)
+	for y = 1, height, 1 do
+		local row = {}
+		for x = 1, width, 1 do
+			row[x] = 0
+		end
+		self.cells[y] = row
+	end
+	for index = 1, #(walls or {}), 1 do
+		local wall = walls[index]
+		self.cells[wall[2]][wall[1]] = 1
+	end
+	return self
+end
+
+function grid:inside(x, y)
+	return x >= 1 and y >= 1 and x <= self.width and y <= self.height
+end
+
+function grid:walkable(x, y)
+	return self:inside(x, y) and self.cells[y][x] == 0
+end
+
+function grid:key(x, y)
+	return (y - 1) * self.width + x
+end
+
+local function heuristic(ax, ay, bx, by)
+	local dx, dy = math.abs(ax - bx), math.abs(ay - by)
+	if dx > dy then
+		return dy * 1.41421356 + (dx - dy)
+	end
+	return dx * 1.41421356 + (dy - dx)
+end
+
+local function lowest(open, scores)
+	local best, best_key, best_score = nil, nil, math.huge
+	for key, node in pairs(open) do
+		local score = scores[key]
+		if score < best_score then
+			best, best_key, best_score = node, key, score
+		end
+	end
+	return best, best_key
+end
+
+function grid:find(sx, sy, tx, ty)
+	if not self:walkable(sx, sy) or not self:walkable(tx, ty) then
+		return nil
+	end
+
+	local start = self:key(sx, sy)
+	local open = {[start] = {x = sx, y = sy}}
+	local came_from = {}
+	local cost = {[start] = 0}
+	local scores = {[start] = heuristic(sx, sy, tx, ty)}
+	local closed = {}
+	local visited = 0
+
+	while next(open) do
+		local node, key = lowest(open, scores)
+		if node.x == tx and node.y == ty then
+			local path = {node}
+			while came_from[key] do
+				key = came_from[key].key
+				table.insert(path, 1, came_from[self:key(path[1].x, path[1].y)].node)
+			end
+			return path, visited
+		end
+
+		open[key] = nil
+		closed[key] = true
+		visited = visited + 1
+
+		for index = 1, #neighbours, 1 do
+			local offset = neighbours[index]
+			local nx, ny = node.x + offset[1], node.y + offset[2]
+			local next_key = self:key(nx, ny)
+			local diagonal = offset[1] ~= 0 and offset[2] ~= 0
+			local blocked = diagonal and (not self:walkable(node.x + offset[1], node.y) or not self:walkable(node.x, node.y + offset[2]))
+
+			if self:walkable(nx, ny) and not closed[next_key] and not blocked then
+				local tentative = cost[key] + offset[3]
+				if cost[next_key] == nil or tentative < cost[next_key] then
+					came_from[next_key] = {key = key, node = node}
+					cost[next_key] = tentative
+					scores[next_key] = tentative + heuristic(nx, ny, tx, ty)
+					open[next_key] = {x = nx, y = ny}
+				end
+			end
+		end
+	end
+	return nil, visited
+end
+
+function grid:line_of_sight(ax, ay, bx, by)
+	local dx, dy = math.abs(bx - ax), math.abs(by - ay)
+	local sx = ax < bx and 1 or -1
+	local sy = ay < by and 1 or -1
+	local error_term = dx - dy
+	local x, y = ax, ay
+	while x ~= bx or y ~= by do
+		if not self:walkable(x, y) then
+			return false
+		end
+		local doubled = error_term * 2
+		if doubled > -dy then
+			error_term = error_term - dy
+			x = x + sx
+		end
+		if doubled < dx then
+			error_term = error_term + dx
+			y = y + sy
+		end
+	end
+	return true
+end
+
+function grid:smooth(path)
+	if path == nil or #path < 3 then
+		return path
+	end
+	local result = {path[1]}
+	local anchor = path[1]
+	for index = 2, #path - 1, 1 do
+		local following = path[index + 1]
+		if not self:line_of_sight(anchor.x, anchor.y, following.x, following.y) then
+			result[#result + 1] = path[index]
+			anchor = path[index]
+		end
+	end
+	result[#result + 1] = path[#path]
+	return result
+end
+
+function grid:render(path)
+	local marks = {}
+	for index = 1, #(path or {}), 1 do
+		marks[self:key(path[index].x, path[index].y)] = true
+	end
+	local lines = {}
+	for y = 1, self.height, 1 do
+		local row = {}
+		for x = 1, self.width, 1 do
+			if self.cells[y][x] == 1 then
+				row[x] = "#"
+			elseif marks[self:key(x, y)] then
+				row[x] = "*"
+			else
+				row[x] = "."
+			end
+		end
+		lines[y] = table.concat(row)
+	end
+	return table.concat(lines, "\n")
+end
+
+return grid
@@ -0,0 +1,178 @@
+-- Cooperative task scheduler with timers, a priority queue and events.
+local scheduler = {}
+
+local Heap = {}
+Heap.__index = Heap
+
+function Heap.new(compare)
+	return setmetatable({items = {}, size = 0, compare = compare}, Heap)
+end
+
+function Heap:push(item)
+	self.size = self.size + 1
+	local items, index = self.items, self.size
+	items[index] = item
+	while index > 1 do
+		local parent = math.floor(index / 2)
+		if self.compare(items[index], items[parent]) then
+			items[index], items[parent] = items[parent], items[index]
+			index = parent
+		else
+			break
+		end
+	end
+end
+
+function Heap:pop()
+	if self.size == 0 then
+		return nil
+	end
+	local items = self.items
+	local top = items[1]
+	items[1] = items[self.size]
+	items[self.size] = nil
+	self.size = self.size - 1
+
+	local index = 1
+	while true do
+		local left, right = index * 2, index * 2 + 1
+		local smallest = index
+		if left <= self.size and self.compare(items[left], items[smallest]) then
+			smallest = left
+		end
+		if right <= self.size and self.compare(items[right], items[smallest]) then
+			smallest = right
+		end
+		if smallest == index then
+			break
+		end
+		items[index], items[smallest] = items[smallest], items[index]
+		index = smallest
+	end
+	return top
+end
+
+function Heap:peek()
+	return self.items[1]
+end
+
+local timers = Heap.new(function(a, b)
+	if a.time == b.time then
+		return a.order < b.order
+	end
+	return a.time < b.time
+end)
+local tasks = {}
+local waiting = {}
+local now = 0
+local order = 0
+
+function scheduler.time()
+	return now
+end
+
+function scheduler.after(delay, callback, ...)
+	order = order + 1
+	local timer = {time = now + delay, order = order, callback = callback, arguments = {...}, cancelled = false}
+	timers:push(timer)
+	return timer
+end
+
+function scheduler.every(interval, callback)
+	local timer
+	local function tick()
+		if callback(now) ~= false then
+			timer = scheduler.after(interval, tick)
+		end
+	end
+	timer = scheduler.after(interval, tick)
+	return function()
+		timer.cancelled = true
+	end
+end
+
+function scheduler.spawn(body, ...)
+	local task = {routine = coroutine.create(body), arguments = {...}, status = "ready"}
+	tasks[#tasks + 1] = task
+	return task
+end
+
+function scheduler.sleep(delay)
+	local routine = coroutine.running()
+	scheduler.after(delay, function()
+		local ok, message = coroutine.resume(routine)
+		if not ok then
+			error(message)
+		end
+	end)
+	return coroutine.yield()
+end
+
+function scheduler.wait(event)
+	local list = waiting[event]
+	if not list then
+		list = {}
+		waiting[event] = list
+	end
+	list[#list + 1] = coroutine.running()
+	return coroutine.yield()
+end
+
+function scheduler.signal(event, ...)
+	local list = waiting[event]
+	if not list then
+		return 0
+	end
+	waiting[event] = nil
+	for index = 1, #list, 1 do
+		local ok, message = coroutine.resume(list[index], ...)
+		if not ok then
+			error(message)
+		end
+	end
+	return #list
+end
+
+local function run_ready()
+	local ready = tasks
+	tasks = {}
+	for index = 1, #ready, 1 do
+		local task = ready[index]
+		local ok, message = coroutine.resume(task.routine, unpack(task.arguments))
+		if not ok then
+			task.status = "failed"
+			print("task failed: " .. tostring(message))
+		elseif coroutine.status(task.routine) == "dead" then
+			task.status = "done"
+		else
+			task.status = "suspended"
+		end
+	end
+end
+
+function scheduler.update(elapsed)
+	now = now + elapsed
+	run_ready()
+	local fired = 0
+	while timers.size > 0 and timers:peek().time <= now do
+		local timer = timers:pop()
+		if not timer.cancelled then
+			timer.callback(unpack(timer.arguments))
+			fired = fired + 1
+		end
+	end
+	run_ready()
+	return fired
+end
+
+function scheduler.run(duration, step)
+	step = step or 1 / 60
+	local frames = 0
+	repeat
+		scheduler.update(step)
+		frames = frames + 1
+	until now >= duration or (timers.size == 0 and #tasks == 0)
+	return frames
+end
+
+return scheduler
@@ -0,0 +1,211 @@
+-- Serializes lua values to a JSON-like text and reads them back.
+local serializer = {}
+
+local escapes = {
+	["\""] = "\\\"",
+	["\\"] = "\\\\",
+	["\n"] = "\\n",
+	["\r"] = "\\r",
+	["\t"] = "\\t"
+}
+
+local function escape(text)
+	return (string.gsub(text, "[\"\\\n\r\t]", escapes))
+end
+
+local function is_array(value)
+	local count = 0
+	for key in pairs(value) do
+		if type(key) ~= "number" or key <= 0 or math.floor(key) ~= key then
+			return false
+		end
+		count = count + 1
+	end
+	return count == #value
+end
+
+local encode
+
+local function encode_table(value, indent, depth, seen)
+	if seen[value] then
+		error("cycle detected while encoding")
+	end
+	seen[value] = true
+
+	local padding = string.rep(indent, depth + 1)
+	local lines = {}
+	if is_array(value) then
+		for index = 1, #value, 1 do
+			lines[#lines + 1] = padding .. encode(value[index], indent, depth + 1, seen)
+		end
+		seen[value] = nil
+		if #lines == 0 then
+			return "[]"
+		end
+		return "[\n" .. table.concat(lines, ",\n") .. "\n" .. string.rep(indent, depth) .. "]"
+	end
+
+	local keys = {}
+	for key in pairs(value) do
+		keys[#keys + 1] = tostring(key)
+	end
+	table.sort(keys)
+	for index = 1, #keys, 1 do
+		local key = keys[index]
+		local item = value[key]
+		if item == nil then
+			item = value[tonumber(key)]
+		end
+		lines[#lines + 1] = padding .. "\"" .. escape(key) .. "\": " .. encode(item, indent, depth + 1, seen)
+	end
+	seen[value] = nil
+	if #lines == 0 then
+		return "{}"
+	end
+	return "{\n" .. table.concat(lines, ",\n") .. "\n" .. string.rep(indent, depth) .. "}"
+end
+
+encode = function(value, indent, depth, seen)
+	local kind = type(value)
+	if kind == "nil" then
+		return "null"
+	elseif kind == "boolean" then
+		return value and "true" or "false"
+	elseif kind == "number" then
+		if value ~= value or value == math.huge or value == -math.huge then
+			error("can not encode " .. tostring(value))
+		end
+		return string.format("%.14g", value)
+	elseif kind == "string" then
+		return "\"" .. escape(value) .. "\""
+	elseif kind == "table" then
+		return encode_table(value, indent, depth, seen)
+	end
+	error("can not encode a " .. kind)
+end
+
+function serializer.encode(value, indent)
+	return encode(value, indent or "  ", 0, {})
+end
+
+local Reader = {}
+Reader.__index = Reader
+
+function Reader.new(text)
+	return setmetatable({text = text, position = 1}, Reader)
+end
+
+function Reader:peek()
+	return string.sub(self.text, self.position, self.position)
+end
+
+function Reader:skip()
+	local first, last = string.find(self.text, "^[ \n\r\t]*", self.position)
+	self.position = last + 1
+end
+
+function Reader:fail(message)
+	error(message .. " at character " .. self.position)
+end
+
+function Reader:expect(text)
+	if string.sub(self.text, self.position, self.position + #text - 1) ~= text then
+		self:fail("expected '" .. text .. "'")
+	end
+	self.position = self.position + #text
+end
+
+function Reader:string()
+	self:expect("\"")
+	local parts = {}
+	while true do
+		local char = self:peek()
+		if char == "" then
+			self:fail("unfinished string")
+		elseif char == "\"" then
+			self.position = self.position + 1
+			return table.concat(parts)
+		elseif char == "\\" then
+			local escaped = string.sub(self.text, self.position + 1, self.position + 1)
+			local replacements = {n = "\n", r = "\r", t = "\t"}
+			parts[#parts + 1] = replacements[escaped] or escaped
+			self.position = self.position + 2
+		else
+			parts[#parts + 1] = char
+			self.position = self.position + 1
+		end
+	end
+end
+
+function Reader:number()
+	local first, last = string.find(self.text, "^-?%d+%.?%d*[eE]?[-+]?%d*", self.position)
+	if not first then
+		self:fail("invalid number")
+	end
+	self.position = last + 1
+	return tonumber(string.sub(self.text, first, last))
+end
+
+function Reader:value()
+	self:skip()
+	local char = self:peek()
+	if char == "{" then
+		local result = {}
+		self.position = self.position + 1
+		self:skip()
+		if self:peek() == "}" then
+			self.position = self.position + 1
+			return result
+		end
+		repeat
+			self:skip()
+			local key = self:string()
+			self:skip()
+			self:expect(":")
+			result[key] = self:value()
+			self:skip()
+			local separator = self:peek()
+			self.position = self.position + 1
+		until separator ~= ","
+		return result
+	elseif char == "[" then
+		local result = {}
+		self.position = self.position + 1
+		self:skip()
+		if self:peek() == "]" then
+			self.position = self.position + 1
+			return result
+		end
+		repeat
+			result[#result + 1] = self:value()
+			self:skip()
+			local separator = self:peek()
+			self.position = self.position + 1
+		until separator ~= ","
+		return result
+	elseif char == "\"" then
+		return self:string()
+	elseif string.sub(self.text, self.position, self.position + 3) == "true" then
+		self.position = self.position + 4
+		return true
+	elseif string.sub(self.text, self.position, self.position + 4) == "false" then
+		self.position = self.position + 5
+		return false
+	elseif string.sub(self.text, self.position, self.position + 3) == "null" then
+		self.position = self.position + 4
+		return nil
+	end
+	return self:number()
+end
+
+function serializer.decode(text)
+	local reader = Reader.new(text)
+	local value = reader:value()
+	reader:skip()
+	if reader.position <= #text then
+		reader:fail("trailing characters")
+	end
+	return value
+end
+
+return serializer
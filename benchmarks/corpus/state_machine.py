@@ -0,0 +1,122 @@
+# A table driven finite state machine with guards, actions and history.
+
+def new_machine(name, initial):
+    return {
+        "name": name,
+        "state": initial,
+        "states": {},
+        "history": {},
+        "steps": 0,
+        "listeners": {},
+    }
+
+
+def add_state(machine, state, on_enter, on_leave):
+    machine["states"][state] = {
+        "transitions": {},
+        "enter": on_enter,
+        "leave": on_leave,
+        "visits": 0,
+    }
+
+
+def add_transition(machine, source, event, target, guard, action):
+    machine["states"][source]["transitions"][event] = {
+        "target": target,
+        "guard": guard,
+        "action": action,
+    }
+
+
+def listen(machine, callback):
+    count = len(machine["listeners"])
+    machine["listeners"][count + 1] = callback
+
+
+def notify(machine, source, event, target):
+    listeners = machine["listeners"]
+    for index in range(1, len(listeners) + 1):
+        listeners[index](machine, source, event, target)
+
+
+def can_fire(machine, event, payload):
+    state = machine["states"][machine["state"]]
+    transition = state["transitions"][event]
+    if transition == None:
+        return False
+    if transition["guard"] != None and not transition["guard"](machine, payload):
+        return False
+    return True
+
+
+def fire(machine, event, payload):
+    source = machine["state"]
+    if not can_fire(machine, event, payload):
+        return False
+
+    transition = machine["states"][source]["transitions"][event]
+    target = transition["target"]
+    leaving = machine["states"][source]
+    entering = machine["states"][target]
+
+    if leaving["leave"] != None:
+        leaving["leave"](machine, event, payload)
+    if transition["action"] != None:
+        transition["action"](machine, payload)
+
+    machine["state"] = target
+    machine["steps"] = machine["steps"] + 1
+    machine["history"][machine["steps"]] = {"from": source, "event": event, "to": target}
+    entering["visits"] = entering["visits"] + 1
+
+    if entering["enter"] != None:
+        entering["enter"](machine, event, payload)
+    notify(machine, source, event, target)
+    return True
+
+
+def run(machine, events, payloads):
+    fired = 0
+    for index in range(1, len(events) + 1):
+        if fire(machine, events[index], payloads[index]):
+            fired = fired + 1
+    return fired
+
+
+def rewind(machine, steps):
+    while steps > 0 and machine["steps"] > 0:
+        last = machine["history"][machine["steps"]]
+        machine["history"][machine["steps"]] = None
+        machine["steps"] = machine["steps"] - 1
+        machine["state"] = last["from"]
+        steps = steps - 1
+    return machine["state"]
+
+
+def reachable(machine, start):
+    seen = {}
+    seen[start] = True
+    queue = {}
+    queue[1] = start
+    head = 1
+    tail = 1
+    while head <= tail:
+        state = queue[head]
+        head = head + 1
+        for event, transition in pairs(machine["states"][state]["transitions"]):
+            target = transition["target"]
+            if not seen[target]:
+                seen[target] = True
+                tail = tail + 1
+                queue[tail] = target
+    return seen
+
+
+def describe(machine):
+    lines = {}
+    count = 0
+    for state, info in pairs(machine["states"]):
+        for event, transition in pairs(info["transitions"]):
+            count = count + 1
+            lines[count] = state + " --" + event + "--> " + transition["target"]
+    return table.concat(lines, "\n")
@@ -0,0 +1,117 @@
+# Descriptive statistics over 1-indexed tables of numbers.
+
+def total(values):
+    result = 0
+    for index in range(1, len(values) + 1):
+        result = result + values[index]
+    return result
+
+
+def mean(values):
+    assert len(values) > 0, "mean of an empty table"
+    return total(values) / len(values)
+
+
+def variance(values, sample):
+    average = mean(values)
+    result = 0
+    for index in range(1, len(values) + 1):
+        difference = values[index] - average
+        result = result + difference * difference
+    if sample:
+        return result / (len(values) - 1)
+    return result / len(values)
+
+
+def deviation(values, sample):
+    return math.sqrt(variance(values, sample))
+
+
+def sorted_copy(values):
+    result = {}
+    for index in range(1, len(values) + 1):
+        value = values[index]
+        position = index - 1
+        while position >= 1 and result[position] > value:
+            result[position + 1] = result[position]
+            position = position - 1
+        result[position + 1] = value
+    return result
+
+
+def median(values):
+    ordered = sorted_copy(values)
+    count = len(ordered)
+    middle = math.floor(count / 2)
+    if count % 2 == 0:
+        return (ordered[middle] + ordered[middle + 1]) / 2
+    return ordered[middle + 1]
+
+
+def percentile(values, rank):
+    ordered = sorted_copy(values)
+    position = (len(ordered) - 1) * rank / 100 + 1
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    if lower == upper:
+        return ordered[lower]
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def histogram(values, buckets):
+    lowest = math.huge
+    highest = -math.huge
+    for index in range(1, len(values) + 1):
+        lowest = math.min(lowest, values[index])
+        highest = math.max(highest, values[index])
+
+    counts = {}
+    for bucket in range(1, buckets + 1):
+        counts[bucket] = 0
+
+    width = (highest - lowest) / buckets
+    for index in range(1, len(values) + 1):
+        bucket = 1
+        if width > 0:
+            bucket = math.min(math.floor((values[index] - lowest) / width) + 1, buckets)
+        counts[bucket] = counts[bucket] + 1
+    return {"counts": counts, "lowest": lowest, "width": width}
+
+
+def correlation(xs, ys):
+    assert len(xs) == len(ys), "tables of different sizes"
+    mean_x = mean(xs)
+    mean_y = mean(ys)
+    covariance = 0
+    spread_x = 0
+    spread_y = 0
+    for index in range(1, len(xs) + 1):
+        dx = xs[index] - mean_x
+        dy = ys[index] - mean_y
+        covariance = covariance + dx * dy
+        spread_x = spread_x + dx * dx
+        spread_y = spread_y + dy * dy
+    if spread_x == 0 or spread_y == 0:
+        return 0
+    return covariance / math.sqrt(spread_x * spread_y)
+
+
+def moving_average(values, window):
+    result = {}
+    running = 0
+    for index in range(1, len(values) + 1):
+        running = running + values[index]
+        if index > window:
+            running = running - values[index - window]
+        result[index] = running / math.min(index, window)
+    return result
+
+
+def summary(values):
+    return {
+        "count": len(values),
+        "mean": mean(values),
+        "median": median(values),
+        "deviation": deviation(values, True),
+        "p90": percentile(values, 90),
+    }
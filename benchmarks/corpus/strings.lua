@@ -0,0 +1,134 @@
+-- String helpers: splitting, trimming, wrapping and templates.
+local strings = {}
+
+function strings.split(text, separator, plain)
+	local parts = {}
+	local position = 1
+	separator = separator or ","
+	while true do
+		local first, last = string.find(text, separator, position, plain)
+		if not first then
+			parts[#parts + 1] = string.sub(text, position)
+			break
+		end
+		parts[#parts + 1] = string.sub(text, position, first - 1)
+		position = last + 1
+	end
+	return parts
+end
+
+function strings.trim(text)
+	return (string.gsub(text, "^%s*(.-)%s*$", "%1"))
+end
+
+function strings.starts(text, prefix)
+	return string.sub(text, 1, #prefix) == prefix
+end
+
+function strings.ends(text, suffix)
+	return suffix == "" or string.sub(text, -#suffix) == suffix
+end
+
+function strings.pad(text, width, char, left)
+	char = char or " "
+	local missing = width - #text
+	if missing <= 0 then
+		return text
+	end
+	if left then
+		return string.rep(char, missing) .. text
+	end
+	return text .. string.rep(char, missing)
+end
+
+function strings.wrap(text, width)
+	local lines = {}
+	local line = ""
+	for word in string.gmatch(text, "%S+") do
+		if #line == 0 then
+			line = word
+		elseif #line + #word + 1 > width then
+			lines[#lines + 1] = line
+			line = word
+		else
+			line = line .. " " .. word
+		end
+	end
+	if #line > 0 then
+		lines[#lines + 1] = line
+	end
+	return table.concat(lines, "\n")
+end
+
+function strings.template(text, values)
+	return (string.gsub(text, "{(%w+)}", function(name)
+		local value = values[name]
+		if value == nil then
+			return "{" .. name .. "}"
+		end
+		return tostring(value)
+	end))
+end
+
+function strings.count(text, pattern)
+	local count = 0
+	for _ in string.gmatch(text, pattern) do
+		count = count + 1
+	end
+	return count
+end
+
+function strings.title(text)
+	return (string.gsub(text, "(%a)([%w_']*)", function(first, rest)
+		return string.upper(first) .. string.lower(rest)
+	end))
+end
+
+function strings.levenshtein(a, b)
+	if #a == 0 then
+		return #b
+	end
+	if #b == 0 then
+		return #a
+	end
+	local previous = {}
+	for j = 0, #b, 1 do
+		previous[j] = j
+	end
+	for i = 1, #a, 1 do
+		local current = {[0] = i}
+		local char = string.byte(a, i)
+		for j = 1, #b, 1 do
+			local substitution = previous[j - 1]
+			if char ~= string.byte(b, j) then
+				substitution = substitution + 1
+			end
+			current[j] = math.min(previous[j] + 1, current[j - 1] + 1, substitution)
+		end
+		previous = current
+	end
+	return previous[#b]
+end
+
+function strings.table(rows, separator)
+	local widths = {}
+	for row = 1, #rows, 1 do
+		for column = 1, #rows[row], 1 do
+			local width = #tostring(rows[row][column])
+			if widths[column] == nil or width > widths[column] then
+				widths[column] = width
+			end
+		end
+	end
+	local lines = {}
+	for row = 1, #rows, 1 do
+		local cells = {}
+		for column = 1, #rows[row], 1 do
+			cells[column] = strings.pad(tostring(rows[row][column]), widths[column])
+		end
+		lines[row] = table.concat(cells, separator or " | ")
+	end
+	return table.concat(lines, "\n")
+end
+
+return strings
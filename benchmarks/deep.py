@@ -0,0 +1,74 @@
+"""Converts trees nested thousands of levels deep, far past the python
+recursion limit.
+
+	python -m <package>.benchmarks.deep [--depth 10000]
+
+Each tree goes through LuaParser (lua to python ast), PythonParser
+(back to lua nodes) and LuaCodeGenerator (lua code). The python code is
+not generated since astor is recursive."""
+import argparse
+import sys
+import time
+
+from .. import LuaParser, PythonParser, LuaCodeGenerator
+from .. import LuaNodes as lua
+
+def concat_chain(depth):
+	# a .. (a .. (a .. ...))
+	expression = lua.Identifier("a")
+	for _ in range(depth):
+		expression = lua.BinaryExpression("..", lua.Identifier("a"), expression)
+	return [lua.AssignmentStatement(False, [lua.Identifier("x")], [expression])]
+
+def nested_tables(depth):
+	# {{{...}}}
+	expression = lua.TableConstructorExpression([])
+	for _ in range(depth):
+		expression = lua.TableConstructorExpression([lua.TableValue(expression)])
+	return [lua.AssignmentStatement(False, [lua.Identifier("x")], [expression])]
+
+def elseif_ladder(depth):
+	clauses = [lua.IfClause(
+		lua.BinaryExpression("==", lua.Identifier("x"), lua.NumericLiteral(0)),
+		[lua.BreakStatement()]
+	)]
+	for index in range(1, depth):
+		clauses.append(lua.ElseifClause(
+			lua.BinaryExpression("==", lua.Identifier("x"), lua.NumericLiteral(index)),
+			[lua.BreakStatement()]
+		))
+	clauses.append(lua.ElseClause([lua.BreakStatement()]))
+	return [lua.WhileStatement(lua.BooleanLiteral(True), [lua.IfStatement(clauses)])]
+
+def nested_blocks(depth):
+	body = [lua.BreakStatement()]
+	for _ in range(depth):
+		body = [lua.WhileStatement(lua.Identifier("x"), body)]
+	return body
+
+cases = {
+	"concat chain": concat_chain,
+	"nested tables": nested_tables,
+	"elseif ladder": elseif_ladder,
+	"nested blocks": nested_blocks
+}
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--depth", type=int, default=10000)
+	args = parser.parse_args()
+
+	print(f"depth {args.depth}, recursion limit {sys.getrecursionlimit()}")
+	for name, generate in cases.items():
+		chunk = lua.Chunk(generate(args.depth))
+
+		start = time.perf_counter()
+		py_ast = LuaParser().visit(chunk, [])
+		lua_ast = PythonParser().visit(py_ast, [])
+		code = LuaCodeGenerator().visit(lua_ast)
+		elapsed = time.perf_counter() - start
+
+		print(f"  {name}: {elapsed * 1000:.0f} ms, {len(code)} characters")
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,64 @@
+"""Compares generating lua code as a string and streaming it to a file.
+
+	python -m <package>.benchmarks.emitter [--repeat 1000] [file.lua]
+
+The program is wrapped in a do block, so all of it is one statement of
+the chunk. Peak memory is measured with tracemalloc, which slows both
+modes down. The streamed code must be the generated one, and parse to
+the same tree as the program."""
+import argparse
+import tracemalloc
+import time
+import io
+import os
+
+from .. import gen_lua_ast, gen_lua_code, lua_parser
+from .lua_parser import sample
+
+def measure(tree, output):
+	start = time.perf_counter()
+	code = gen_lua_code(tree, output=output)[1]
+	elapsed = time.perf_counter() - start
+
+	tracemalloc.start()
+	gen_lua_code(tree, output=output)
+	peak = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+	return elapsed, peak, code
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("file", nargs="?")
+	parser.add_argument("--version", default="5.1")
+	parser.add_argument("--repeat", type=int, default=1000)
+	args = parser.parse_args()
+
+	if args.file:
+		with open(args.file, encoding="utf-8") as file:
+			code = file.read()
+	else:
+		code = sample * args.repeat
+
+	code = "do\n" + code + "\nend"
+	tree = gen_lua_ast(code, args.version, parser="native", nodes=True)
+
+	stream = io.StringIO()
+	gen_lua_code(tree, output=stream)
+	expected = lua_parser.parse(code, args.version)
+	generated = lua_parser.parse(stream.getvalue(), args.version)
+	del expected["comments"], generated["comments"]
+	if generated != expected:
+		raise AssertionError("the streamed code parses differently")
+
+	elapsed, peak, code = measure(tree, None)
+	if code != stream.getvalue():
+		raise AssertionError("the streamed code differs from the generated one")
+	print(f"{len(code)} characters")
+	print(f"  string: {elapsed * 1000:.0f} ms, peak {peak / 1e6:.1f} MB")
+
+	with open(os.devnull, "w", encoding="utf-8") as output:
+		elapsed, peak, _ = measure(tree, output)
+	print(f"  stream: {elapsed * 1000:.0f} ms, peak {peak / 1e6:.1f} MB")
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,101 @@
+"""Measures the latency of converting a big file again after an edit
+to one of its functions.
+
+	python -m <package>.benchmarks.incremental [--repeat 700] [file.lua]
+
+The file is converted once with transpile, then with
+transpile_incremental after an edit in its middle, with a warm
+manifest. The lua code transpile_incremental generates for the corpus
+must be the one of transpile, at every optimization level it can be
+converted incrementally at."""
+import argparse
+import tempfile
+import time
+import os
+
+from .. import transpile, transpile_incremental
+from .lua_parser import sample
+from .suite import corpus
+
+folded = "x = 2 + 3\n" # Lua and python, folded from -O1
+
+def check(version, parser):
+	"""Raises an AssertionError if transpile_incremental doesn't
+	generate the lua code of transpile. lua2py is left out: its
+	functions are given random names."""
+	sources = {"py2lua": [folded], "lua2lua": [folded]}
+	for name in sorted(os.listdir(corpus)):
+		if name.endswith((".lua", ".py")):
+			with open(os.path.join(corpus, name), encoding="utf-8") as file:
+				code = file.read()
+			sources["py2lua" if name.endswith(".py") else "lua2lua"].append(code)
+
+	with tempfile.TemporaryDirectory() as directory:
+		manifest = os.path.join(directory, "manifest")
+		for direction, codes in sources.items():
+			for optimize in (0, 1):
+				for code in codes:
+					expected = transpile(
+						code, direction, version, parser, optimize=optimize
+					)
+					result = transpile_incremental(
+						code, direction, manifest, version, parser, optimize=optimize
+					)
+					if result.code != expected:
+						raise AssertionError(
+							f"{direction} -O{optimize}: the incremental code "
+							"differs from the one of transpile"
+						)
+
+			try:
+				transpile_incremental(folded, direction, manifest, version, parser, optimize=2)
+			except ValueError:
+				pass
+			else:
+				raise AssertionError(f"{direction} -O2 isn't hoisted incrementally")
+
+def edit(code):
+	# Changes the first number past the middle of the code.
+	middle = len(code) // 2
+	for position in range(middle, len(code)):
+		if code[position].isdigit():
+			return code[:position] + "7" + code[position + 1:]
+	return code
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("file", nargs="?")
+	parser.add_argument("--direction", default="lua2py")
+	parser.add_argument("--version", default="5.1")
+	parser.add_argument("--parser", default="native")
+	parser.add_argument("--repeat", type=int, default=700)
+	args = parser.parse_args()
+
+	check(args.version, args.parser)
+	if args.file:
+		with open(args.file, encoding="utf-8") as file:
+			code = file.read()
+	else:
+		code = sample * args.repeat
+
+	start = time.perf_counter()
+	transpile(code, args.direction, args.version, args.parser)
+	full = time.perf_counter() - start
+	print(f"{len(code.splitlines())} lines")
+	print(f"  transpile: {full * 1000:.0f} ms")
+
+	with tempfile.TemporaryDirectory() as directory:
+		manifest = os.path.join(directory, "manifest")
+		transpile_incremental(code, args.direction, manifest, args.version, args.parser)
+
+		start = time.perf_counter()
+		result = transpile_incremental(
+			edit(code), args.direction, manifest, args.version, args.parser
+		)
+		elapsed = time.perf_counter() - start
+
+	print(f"  after an edit: {elapsed * 1000:.0f} ms, "
+		  f"{result.converted} of {result.segments} segments converted")
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,79 @@
+"""Compares dict trees against LuaNodes trees.
+
+	python -m <package>.benchmarks.lua_nodes [--version 5.1] [file.lua ...]
+
+Reports the memory used per node and the throughput of the lua to python
+and lua to lua visitors on both representations."""
+import argparse
+import tracemalloc
+import time
+
+from .. import gen_lua_ast, LuaNodes, LuaParser, LuaCodeGenerator
+from .lua_parser import generated_sources
+
+def count_nodes(tree):
+	count, stack = 0, [tree]
+	while stack:
+		item = stack.pop()
+		if isinstance(item, list):
+			stack.extend(item)
+		elif isinstance(item, (dict, LuaNodes.Node)):
+			count += 1
+			stack.extend(item.values())
+	return count
+
+def tree_memory(build):
+	tracemalloc.start()
+	try:
+		tree = build()
+		return tree, tracemalloc.get_traced_memory()[0]
+	finally:
+		tracemalloc.stop()
+
+def throughput(visit, tree, nodes, rounds):
+	visit(tree)
+	start = time.perf_counter()
+	for _ in range(rounds):
+		visit(tree)
+	return nodes * rounds / (time.perf_counter() - start)
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("files", nargs="*")
+	parser.add_argument("--version", default="5.1")
+	parser.add_argument("--rounds", type=int, default=10)
+	args = parser.parse_args()
+
+	if args.files:
+		sources = []
+		for path in args.files:
+			with open(path, encoding="utf-8") as file:
+				sources.append((path, file.read()))
+	else:
+		sources = list(generated_sources())
+
+	visitors = {
+		"LuaParser": lambda tree: LuaParser().visit(tree, []),
+		"LuaCodeGenerator": lambda tree: LuaCodeGenerator().visit(tree)
+	}
+
+	for name, code in sources:
+		dicts = gen_lua_ast(code, args.version, parser="native")
+		nodes = count_nodes(dicts)
+		print(f"{name} ({nodes} nodes):")
+
+		for label, build in (
+			# Both built from the same tree, so strings are shared and
+			# only the containers are measured.
+			("dicts", lambda: LuaNodes.to_dict(dicts)),
+			("nodes", lambda: LuaNodes.from_dict(dicts))
+		):
+			tree, memory = tree_memory(build)
+			rates = ", ".join(
+				f"{visitor} {throughput(visit, tree, nodes, args.rounds) / 1000:.0f}k nodes/s"
+				for visitor, visit in visitors.items()
+			)
+			print(f"  {label}: {memory / nodes:.1f} bytes/node, {rates}")
+
+if __name__ == "__main__":
+	main()
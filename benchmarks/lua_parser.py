@@ -0,0 +1,113 @@
+"""Compares the native lua parser against luaparse through the worker pool.
+
+	python -m <package>.benchmarks.lua_parser [--version 5.1] [file.lua ...]
+
+Without files, a set of generated scripts of different sizes is used.
+The native parser must accept the valid statements below and reject the
+invalid ones first."""
+import argparse
+import time
+
+from .. import gen_lua_ast, lua_parser
+
+# Parenthesized expressions are values, not variables or calls.
+valid = ("(a).b = 1", "(f()).x = 1", "(f)()", "a[(b)] = (c)", "(a):m()", '(a)"s"')
+invalid = ("(a) = 1", "a, (b) = 1, 2", "((a.b)) = 1", "(f())", "f() = 1")
+
+sample = """
+local Player = {}
+Player.__index = Player
+
+function Player.new(name, x, y)
+	local self = setmetatable({}, Player)
+	self.name = name
+	self.position = {x = x or 0, y = y or 0}
+	self.items = {"sword", "shield", [10] = "potion"}
+	return self
+end
+
+function Player:move(dx, dy)
+	local position = self.position
+	position.x = position.x + dx * 2 ^ 1
+	position.y = position.y - dy / 3 % 5
+	if position.x > 100 then
+		position.x = 100
+	elseif position.x < 0 then
+		position.x = 0
+	else
+		print("moved " .. self.name .. " to " .. position.x .. ", " .. position.y)
+	end
+end
+
+for index = 1, #players, 2 do
+	local player = players[index]
+	while player.health > 0 and not player.dead do
+		player:move(1, -1)
+	end
+end
+"""
+
+def generated_sources():
+	for repeat in (1, 10, 100):
+		yield f"<generated x{repeat}>", sample * repeat
+
+def check(version):
+	"""Raises an AssertionError if the native parser rejects a valid
+	statement or accepts an invalid one."""
+	for code in valid:
+		lua_parser.parse(code, version)
+	for code in invalid:
+		try:
+			lua_parser.parse(code, version)
+		except SyntaxError:
+			continue
+		raise AssertionError(f"{code!r} parsed without a syntax error")
+
+def measure(sources, version, parser, rounds):
+	timings = []
+	total_bytes = 0
+
+	for name, code in sources:
+		gen_lua_ast(code, version, parser=parser) # Warm up
+		start = time.perf_counter()
+		for _ in range(rounds):
+			gen_lua_ast(code, version, parser=parser)
+		elapsed = (time.perf_counter() - start) / rounds
+
+		timings.append((name, elapsed))
+		total_bytes += len(code.encode())
+
+	return timings, total_bytes
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("files", nargs="*")
+	parser.add_argument("--version", default="5.1")
+	parser.add_argument("--rounds", type=int, default=20)
+	args = parser.parse_args()
+
+	check(args.version)
+	if args.files:
+		sources = []
+		for path in args.files:
+			with open(path, encoding="utf-8") as file:
+				sources.append((path, file.read()))
+	else:
+		sources = list(generated_sources())
+
+	for backend in ("native", "node"):
+		try:
+			timings, total_bytes = measure(sources, args.version, backend, args.rounds)
+		except (OSError, SyntaxError, RuntimeError) as error:
+			print(f"{backend}: skipped ({error})")
+			continue
+
+		total = sum(elapsed for _, elapsed in timings)
+		print(f"{backend}:")
+		for name, elapsed in timings:
+			print(f"  {name}: {elapsed * 1000:.3f} ms/file")
+		print(f"  throughput: {total_bytes / total / 1e6:.2f} MB/s, "
+			  f"{len(timings) / total:.1f} files/s")
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,78 @@
+"""Compares the size and parse time of lua code and its minified code.
+
+	python -m <package>.benchmarks.minify [--version 5.1] [--rounds 20] [file.lua ...]
+
+Every file (the corpus by default) is generated again by
+LuaCodeGenerator, and by LuaCodeMinifier without and with renamed
+locals. The minified code must parse to the same tree. The source and
+minified codes are parsed by the native lua parser, best of --rounds,
+as an estimate of the time lua takes to load them (lexing and parsing
+scale the same way); the generated code is only measured."""
+import argparse
+import time
+import os
+
+from .. import LuaCodeMinifier, gen_lua_code, lua_parser
+from .suite import corpus
+
+def best(function, rounds):
+	elapsed = float("inf")
+	for _ in range(rounds):
+		start = time.perf_counter()
+		function()
+		elapsed = min(elapsed, time.perf_counter() - start)
+	return elapsed
+
+def tree(code, version):
+	lua_ast = lua_parser.parse(code, version)
+	del lua_ast["comments"]
+	return lua_ast
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("files", nargs="*")
+	parser.add_argument("--version", default="5.1")
+	parser.add_argument("--rounds", type=int, default=20)
+	args = parser.parse_args()
+
+	files = args.files or sorted(
+		os.path.join(corpus, name) for name in os.listdir(corpus) if name.endswith(".lua")
+	)
+	totals = [0, 0, 0, 0]
+	for path in files:
+		with open(path, encoding="utf-8") as file:
+			source = file.read()
+
+		codes = [
+			source,
+			gen_lua_code(lua_parser.parse(source, args.version))[1],
+			LuaCodeMinifier().visit(lua_parser.parse(source, args.version)),
+			LuaCodeMinifier(rename=True).visit(lua_parser.parse(source, args.version))
+		]
+		if tree(codes[2], args.version) != tree(source, args.version):
+			raise AssertionError(f"{path}: the minified code parses differently")
+
+		sizes = [len(code.encode()) for code in codes]
+		for index, size in enumerate(sizes):
+			totals[index] += size
+		source_time, minified_time, renamed_time = (
+			best(lambda: lua_parser.parse(code, args.version), args.rounds)
+			for code in (codes[0], codes[2], codes[3])
+		)
+
+		print(
+			f"{os.path.basename(path)}: source {sizes[0]} B {source_time * 1000:.2f} ms, "
+			f"generated {sizes[1]} B, "
+			f"minified {sizes[2]} B ({sizes[2] / sizes[1]:.2f}x) "
+			f"{minified_time * 1000:.2f} ms ({source_time / minified_time:.2f}x faster), "
+			f"renamed {sizes[3]} B ({sizes[3] / sizes[1]:.2f}x) "
+			f"{renamed_time * 1000:.2f} ms ({source_time / renamed_time:.2f}x faster)"
+		)
+
+	print(
+		f"total: source {totals[0]} B, generated {totals[1]} B, "
+		f"minified {totals[2] / totals[1]:.2f}x, renamed {totals[3] / totals[1]:.2f}x"
+	)
+
+if __name__ == "__main__":
+	main()
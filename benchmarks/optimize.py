@@ -0,0 +1,117 @@
+"""Times converted lua scripts at every optimization level.
+
+	python -m <package>.benchmarks.optimize [--size 20000] [--rounds 5]
+		[--version 5.1 --version 5.4 ...]
+
+Every script (the ones below and the string-heavy ones of
+benchmarks.concat) is converted to python with the "call" concat mode
+at -O0, -O1 and -O2 (see optimize_py_ast and fold_lua_ast), executed, and its run(size)
+function timed, best of --rounds. The results of every level must be
+equal, for every lua version given (5.1, 5.3 and 5.4 by default, the
+integers of 5.3 being folded differently)."""
+import argparse
+import time
+
+from .. import LuaParser, fold_lua_ast, gen_py_code, lua_parser, optimize_py_ast
+from . import concat
+
+scripts = {
+	# Numeric fors, do blocks and constant expressions.
+	"loops": """
+local function run(size)
+	local total = 0
+	for i = 1, size do
+		do
+			local scale = 60 * 60 * 24
+			total = total + i % 7 * scale
+		end
+		for j = 1, 4 do
+			total = total - j
+		end
+	end
+	return total
+end
+""",
+	# Multiple assignments of constants, a repeat loop.
+	"state": """
+local function run(size)
+	local count = 0
+	repeat
+		local a, b, c, d = 1, 2, 3, 4
+		local x, y, z, w = a, b, c, d
+		count = count + x + y + z + w
+	until count > size * 10
+	return count
+end
+""",
+	# .. between strings, LUA_CONCAT calls unless inlined.
+	"names": """
+local function run(size)
+	local last = ""
+	for i = 1, size do
+		local name = "user" .. tostring(i)
+		last = name .. "@" .. "example" .. "." .. "org"
+	end
+	return last
+end
+""",
+	# Divisions of integers, which give floats from 5.3 on too.
+	"division": """
+local function run(size)
+	local total = 0
+	local n = 10
+	for i = 1, size do
+		total = total + 10 / 2 + 7 / 2 + 6 / 3 + n / 4 + 7 % 3 + i / 2
+	end
+	return total
+end
+"""
+}
+
+def convert(code, level, version="5.1"):
+	lua_ast = lua_parser.parse(code, version)
+	if level:
+		lua_ast = fold_lua_ast(lua_ast, version)
+	py_ast = LuaParser().visit(lua_ast, [])
+	return gen_py_code(optimize_py_ast(py_ast, level))
+
+def time_script(code, level, size, rounds, version="5.1"):
+	"""Returns (result, best time) of running a converted script."""
+	namespace = dict(concat.environment)
+	exec(compile(convert(code, level, version), f"<O{level}>", "exec"), namespace)
+	run = namespace["run"]
+
+	elapsed = float("inf")
+	for _ in range(rounds):
+		start = time.perf_counter()
+		result = run(size)
+		elapsed = min(elapsed, time.perf_counter() - start)
+	return result, elapsed
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--size", type=int, default=20000)
+	parser.add_argument("--rounds", type=int, default=5)
+	parser.add_argument("--version", dest="versions", action="append")
+	args = parser.parse_args()
+
+	for version in args.versions or ("5.1", "5.3", "5.4"):
+		for name, code in {**scripts, **concat.scripts}.items():
+			timings = []
+			results = set()
+			for level in (0, 1, 2):
+				result, elapsed = time_script(code, level, args.size, args.rounds, version)
+				timings.append(elapsed)
+				results.add(result)
+			if len(results) != 1:
+				raise AssertionError(
+					f"{name} ({version}): the optimization levels returned {results}"
+				)
+
+			print(f"{name} ({version}): " + ", ".join(
+				f"O{level} {elapsed * 1000:.1f} ms ({timings[0] / elapsed:.2f}x)"
+				for level, elapsed in enumerate(timings)
+			))
+
+if __name__ == "__main__":
+	main()
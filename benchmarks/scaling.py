@@ -0,0 +1,248 @@
+"""Measures how the converters scale with the size and shape of a program.
+
+	python -m <package>.benchmarks.scaling [--parameter statements ...]
+		[--scale 1] [--rounds 3] [--output results.json]
+
+For every parameter, lua and python programs are generated at growing
+values of it (see generators) and each phase is timed, best of
+--rounds, with its peak memory measured by tracemalloc in a separate
+run:
+
+	lua: parse (native), lua_to_py, to_source (astor), lua_code_gen
+	python: py_parse, py_to_lua, lua_code_gen
+
+The growth exponent of a phase is the slope of log(time) against
+log(value): about 1 for linear phases, 2 for quadratic ones. Phases
+above 1.3 are flagged. A phase that fails at some value (astor is
+recursive, python's parser limits the nesting of blocks and
+parentheses) records the error and is skipped for the larger values."""
+import tracemalloc
+import argparse
+import json
+import math
+import time
+import ast
+
+from .. import LuaParser, PythonParser, LuaCodeGenerator, gen_py_code
+from .. import lua_parser
+
+def lua_statements(count):
+	lines = ["local total = 0"]
+	for index in range(count):
+		if index % 3 == 0:
+			lines.append(f"local value{index} = total * {index} + 1")
+		elif index % 3 == 1:
+			lines.append(f"total = total + value{index - 1} % 7")
+		else:
+			lines.append(f"print(total, \"step {index}\")")
+	return "\n".join(lines)
+
+def py_statements(count):
+	lines = ["total = 0"]
+	for index in range(count):
+		if index % 3 == 0:
+			lines.append(f"value{index} = total * {index} + 1")
+		elif index % 3 == 1:
+			lines.append(f"total = total + value{index - 1} % 7")
+		else:
+			lines.append(f"print(total, 'step {index}')")
+	return "\n".join(lines)
+
+def lua_depth(depth):
+	# Alternates if, while and numeric for blocks.
+	opening, closing = [], []
+	for level in range(depth):
+		indent = "\t" * level
+		kind = level % 3
+		if kind == 0:
+			opening.append(f"{indent}if x > {level} then")
+		elif kind == 1:
+			opening.append(f"{indent}while x < {level} do")
+		else:
+			opening.append(f"{indent}for i{level} = 1, {level}, 1 do")
+		closing.append(f"{indent}end")
+	body = "\t" * depth + "x = x + 1"
+	return "\n".join(opening + [body] + closing[::-1])
+
+def py_depth(depth):
+	lines = []
+	for level in range(depth):
+		indent = "    " * level
+		kind = level % 3
+		if kind == 0:
+			lines.append(f"{indent}if x > {level}:")
+		elif kind == 1:
+			lines.append(f"{indent}while x < {level}:")
+		else:
+			lines.append(f"{indent}for i{level} in range(1, {level + 1}):")
+	lines.append("    " * depth + "x = x + 1")
+	return "\n".join(lines)
+
+def lua_width(width):
+	fields = []
+	for index in range(width):
+		if index % 2 == 0:
+			fields.append(str(index))
+		else:
+			fields.append(f"key{index} = \"value {index}\"")
+	return "local t = {" + ", ".join(fields) + "}"
+
+def py_width(width):
+	fields = [f"'key{index}': {index}" for index in range(width)]
+	return "t = {" + ", ".join(fields) + "}"
+
+def lua_concat(length):
+	return "local s = " + " .. ".join(f"a{index}" for index in range(length))
+
+def py_concat(length):
+	# LuaParser's output for a .. chain.
+	expression = f"a{length - 1}"
+	for index in range(length - 2, -1, -1):
+		expression = f"LUA_CONCAT(a{index}, {expression})"
+	return "s = " + expression
+
+def lua_clauses(count):
+	lines = ["if x == 0 then", "\ty = 0"]
+	for index in range(1, count):
+		lines.append(f"elseif x == {index} then")
+		lines.append(f"\ty = {index}")
+	lines += ["else", "\ty = -1", "end"]
+	return "\n".join(lines)
+
+def py_clauses(count):
+	lines = ["if x == 0:", "    y = 0"]
+	for index in range(1, count):
+		lines.append(f"elif x == {index}:")
+		lines.append(f"    y = {index}")
+	lines += ["else:", "    y = -1"]
+	return "\n".join(lines)
+
+# parameter: (lua generator, python generator, values)
+generators = {
+	"statements": (lua_statements, py_statements, (1000, 2000, 4000, 8000, 16000)),
+	"depth": (lua_depth, py_depth, (12, 24, 48, 96, 192)),
+	"width": (lua_width, py_width, (1000, 2000, 4000, 8000, 16000)),
+	"concat": (lua_concat, py_concat, (100, 200, 400, 800, 1600)),
+	"clauses": (lua_clauses, py_clauses, (250, 500, 1000, 2000, 4000))
+}
+
+# Every phase takes the output of the one before it.
+lua_phases = (
+	("parse", lambda code: lua_parser.parse(code)),
+	("lua_to_py", lambda tree: LuaParser().visit(tree, [])),
+	("to_source", gen_py_code)
+)
+py_phases = (
+	("py_parse", ast.parse),
+	("py_to_lua", lambda tree: PythonParser().visit(tree, []))
+)
+code_gen_phase = ("lua_code_gen", lambda tree: LuaCodeGenerator().visit(tree))
+
+def measure(function, argument, rounds):
+	"""Returns (result, best time, peak memory) of a phase."""
+	elapsed = float("inf")
+	for _ in range(rounds):
+		start = time.perf_counter()
+		result = function(argument)
+		elapsed = min(elapsed, time.perf_counter() - start)
+
+	tracemalloc.start()
+	function(argument)
+	peak = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+	return result, elapsed, peak
+
+def run_phases(phases, value, rounds, points, failed):
+	"""Runs a chain of phases, adding a point to the curve of each one.
+	Returns the outputs of the phases that ran, stopping at the first
+	one that failed (now or for a smaller value)."""
+	outputs = {}
+	for name, function in phases:
+		if name in failed:
+			break
+		try:
+			value, elapsed, peak = measure(function, value, rounds)
+		except (RecursionError, SyntaxError, MemoryError) as error:
+			failed[name] = f"{type(error).__name__}: {error}"
+			break
+		points.setdefault(name, []).append((elapsed, peak))
+		outputs[name] = value
+	return outputs
+
+def exponent(values, times):
+	"""Returns the least squares slope of log(time) against log(value)."""
+	xs = [math.log(value) for value in values]
+	ys = [math.log(max(elapsed, 1e-9)) for elapsed in times]
+	mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+	spread = sum((x - mean_x) ** 2 for x in xs)
+	if spread == 0:
+		return None
+	return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / spread
+
+def scale_parameter(name, scale, rounds):
+	"""Returns the curves of every phase along a parameter."""
+	lua_generator, py_generator, values = generators[name]
+	values = [max(int(value * scale), 2) for value in values]
+	curves = {}
+
+	for language, generator, phases, tree_phase in (
+		("lua", lua_generator, lua_phases, "parse"),
+		("python", py_generator, py_phases, "py_to_lua")
+	):
+		points, failed = {}, {}
+		for value in values:
+			outputs = run_phases(phases, generator(value), rounds, points, failed)
+			if tree_phase in outputs: # Lua code of the lua tree
+				run_phases((code_gen_phase,), outputs[tree_phase], rounds, points, failed)
+
+		for phase, _ in phases + (code_gen_phase,):
+			phase_points = points.get(phase, [])
+			curve = {
+				"values": values[:len(phase_points)],
+				"seconds": [elapsed for elapsed, _ in phase_points],
+				"peak_bytes": [peak for _, peak in phase_points],
+				"exponent": None,
+				"error": failed.get(phase)
+			}
+			if len(phase_points) >= 2:
+				curve["exponent"] = exponent(curve["values"], curve["seconds"])
+			curves[f"{language}.{phase}"] = curve
+
+	return curves
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument(
+		"--parameter", action="append", choices=list(generators),
+		help="parameters to scale, all of them by default"
+	)
+	parser.add_argument("--scale", type=float, default=1, help="multiplies the values")
+	parser.add_argument("--rounds", type=int, default=3)
+	parser.add_argument("--output", help="JSON results file")
+	args = parser.parse_args()
+
+	results = {}
+	for name in args.parameter or generators:
+		curves = results[name] = scale_parameter(name, args.scale, args.rounds)
+
+		print(f"{name}:")
+		for phase, curve in curves.items():
+			points = ", ".join(
+				f"{value}: {elapsed * 1000:.1f} ms/{peak / 1e6:.1f} MB"
+				for value, elapsed, peak in zip(
+					curve["values"], curve["seconds"], curve["peak_bytes"]
+				)
+			)
+			growth = curve["exponent"]
+			flag = " SUPERLINEAR" if growth is not None and growth > 1.3 else ""
+			growth = "-" if growth is None else f"{growth:.2f}"
+			print(f"  {phase} (exponent {growth}){flag}: {points}")
+			if curve["error"] is not None:
+				print(f"    then {curve['error']}")
+
+	if args.output is not None:
+		with open(args.output, "w", encoding="utf-8") as file:
+			json.dump(results, file, indent="\t")
+
+if __name__ == "__main__":
+	main()
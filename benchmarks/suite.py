@@ -0,0 +1,187 @@
+"""Times every conversion phase over a corpus of lua and python code.
+
+	python -m <package>.benchmarks.suite [--rounds 20] [--output results.json]
+		[--baseline baseline.json] [--threshold 0.1] [file ...]
+
+Without files, the bundled corpus (benchmarks/corpus) is used. Each
+phase is timed on its own, as the best of --rounds runs, on the output
+of the phase before it:
+
+	lua files: node_parse (luaparse through the worker pool, raw JSON),
+	json_decode, native_parse, lua_to_py (LuaParser.visit), to_source
+	(astor), py_parse, py_to_lua (PythonParser.visit), lua_code_gen
+	(LuaCodeGenerator.visit, of the parsed lua)
+
+	python files: py_parse, py_to_lua, lua_code_gen
+
+The phases following native_parse use its tree, so results don't
+depend on whether node is available. When it isn't, node_parse and
+json_decode are null.
+
+Results are written as JSON. With --baseline, the total of every phase
+is compared to the one of a saved result, and the exit status is 1 when
+a phase got slower by more than --threshold."""
+import argparse
+import platform
+import json
+import time
+import sys
+import ast
+import os
+
+from .. import LuaParser, PythonParser, LuaCodeGenerator, gen_py_code
+from .. import get_pool, luaparse_version, lua_parser
+
+corpus = os.path.join(os.path.dirname(__file__), "corpus")
+
+phases = ( # Of lua files, python ones go through the last three
+	"node_parse", "json_decode", "native_parse", "lua_to_py", "to_source",
+	"py_parse", "py_to_lua", "lua_code_gen"
+)
+
+def best(function, argument, rounds):
+	"""Returns (result, best time) of calling a function `rounds` times."""
+	elapsed = float("inf")
+	for _ in range(rounds):
+		start = time.perf_counter()
+		result = function(argument)
+		elapsed = min(elapsed, time.perf_counter() - start)
+	return result, elapsed
+
+def node_available(version):
+	try:
+		get_pool().parse_raw("local x = 1", version)
+	except (OSError, RuntimeError, SyntaxError):
+		return False
+	return True
+
+def time_lua(code, version, rounds, node):
+	timings = dict.fromkeys(phases)
+
+	if node:
+		pool = get_pool()
+		data, timings["node_parse"] = best(
+			lambda code: pool.parse_raw(code, version), code, rounds
+		)
+		_, timings["json_decode"] = best(json.loads, data, rounds)
+
+	lua_ast, timings["native_parse"] = best(
+		lambda code: lua_parser.parse(code, version), code, rounds
+	)
+	py_ast, timings["lua_to_py"] = best(
+		lambda tree: LuaParser().visit(tree, []), lua_ast, rounds
+	)
+	py_code, timings["to_source"] = best(gen_py_code, py_ast, rounds)
+	py_ast, timings["py_parse"] = best(ast.parse, py_code, rounds)
+	_, timings["py_to_lua"] = best(
+		lambda tree: PythonParser().visit(tree, []), py_ast, rounds
+	)
+	_, timings["lua_code_gen"] = best(
+		lambda tree: LuaCodeGenerator().visit(tree), lua_ast, rounds
+	)
+	return timings
+
+def time_python(code, rounds):
+	timings = {}
+
+	py_ast, timings["py_parse"] = best(ast.parse, code, rounds)
+	lua_ast, timings["py_to_lua"] = best(
+		lambda tree: PythonParser().visit(tree, []), py_ast, rounds
+	)
+	_, timings["lua_code_gen"] = best(
+		lambda tree: LuaCodeGenerator().visit(tree), lua_ast, rounds
+	)
+	return timings
+
+def run(paths, version, rounds):
+	"""Returns the results of timing every file, as saved in JSON."""
+	node = node_available(version)
+	files = {}
+	totals = dict.fromkeys(phases, 0.0)
+	if not node:
+		totals["node_parse"] = totals["json_decode"] = None
+
+	for path in paths:
+		with open(path, encoding="utf-8") as file:
+			code = file.read()
+
+		if path.endswith(".py"):
+			timings = time_python(code, rounds)
+		else:
+			timings = time_lua(code, version, rounds, node)
+
+		files[os.path.basename(path)] = {
+			"bytes": len(code.encode()), "phases": timings
+		}
+		for phase, elapsed in timings.items():
+			if elapsed is not None:
+				totals[phase] += elapsed
+
+	return {
+		"environment": {
+			"python": platform.python_version(),
+			"implementation": platform.python_implementation(),
+			"platform": platform.platform(),
+			"luaparse": luaparse_version() if node else None,
+			"native_parser": lua_parser.VERSION
+		},
+		"version": version,
+		"rounds": rounds,
+		"files": files,
+		"phases": totals
+	}
+
+def compare(results, baseline, threshold):
+	"""Prints the phase totals against a baseline to stderr. Returns
+	the phases slower by more than `threshold` (a fraction)."""
+	regressions = []
+
+	for phase in phases:
+		current, previous = results["phases"].get(phase), baseline["phases"].get(phase)
+		if current is None or not previous:
+			print(f"{phase}: skipped", file=sys.stderr)
+			continue
+
+		change = current / previous - 1
+		slower = change > threshold
+		if slower:
+			regressions.append(phase)
+		print(
+			f"{phase}: {previous * 1000:.3f} ms -> {current * 1000:.3f} ms "
+			f"({change:+.1%}){' REGRESSION' if slower else ''}",
+			file=sys.stderr
+		)
+
+	return regressions
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("files", nargs="*")
+	parser.add_argument("--version", default="5.1")
+	parser.add_argument("--rounds", type=int, default=20)
+	parser.add_argument("--output", help="JSON results file, stdout by default")
+	parser.add_argument("--baseline", help="JSON results to compare with")
+	parser.add_argument("--threshold", type=float, default=0.1)
+	args = parser.parse_args()
+
+	paths = args.files or sorted(
+		os.path.join(corpus, name) for name in os.listdir(corpus)
+		if name.endswith((".lua", ".py"))
+	)
+	results = run(paths, args.version, args.rounds)
+
+	if args.output is None:
+		json.dump(results, sys.stdout, indent="\t")
+		print()
+	else:
+		with open(args.output, "w", encoding="utf-8") as file:
+			json.dump(results, file, indent="\t")
+
+	if args.baseline is not None:
+		with open(args.baseline, encoding="utf-8") as file:
+			baseline = json.load(file)
+		if compare(results, baseline, args.threshold):
+			sys.exit(1)
+
+if __name__ == "__main__":
+	main()
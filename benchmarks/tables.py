@@ -0,0 +1,154 @@
+"""Times converted table-heavy lua scripts under every tables mode.
+
+	python -m <package>.benchmarks.tables [--size 100000] [--rounds 5]
+
+Every script is converted to python with LuaParser in the "dict" and
+"lua" tables modes (see LuaParser), executed, and its run(size)
+function timed, best of --rounds, and measured: the peak is the most
+memory traced by tracemalloc at once during a run. The results of both
+modes must be equal. LuaTable peaks lower, but indexing it is slower;
+only table.concat, which joins the array part, is faster."""
+import argparse
+import tracemalloc
+import time
+
+from .. import LuaParser, gen_py_code, lua_parser
+from ..runtime import table
+
+scripts = {
+	# Appending to an array and reading it back by index.
+	"sum": """
+local function run(size)
+	local values = {}
+	for i = 1, size, 1 do
+		values[#values + 1] = i * 2
+	end
+	local total = 0
+	for i = 1, #values, 1 do
+		total = total + values[i]
+	end
+	return total
+end
+""",
+	# table.insert, then a reversed walk.
+	"insert": """
+local function run(size)
+	local stack = {}
+	for i = 1, size, 1 do
+		table.insert(stack, i % 97)
+	end
+	local total = 0
+	for i = #stack, 1, -1 do
+		total = total + stack[i] * i
+	end
+	return total
+end
+""",
+	# Rows of a grid, filled and summed by index.
+	"matrix": """
+local function run(size)
+	local width = 100
+	local grid = {}
+	local y = 1
+	while y * width <= size do
+		local row = {}
+		for x = 1, width, 1 do
+			row[x] = x * y % 13
+		end
+		grid[y] = row
+		y = y + 1
+	end
+	local total = 0
+	for y = 1, #grid, 1 do
+		local row = grid[y]
+		for x = 1, #row, 1 do
+			total = total + row[x]
+		end
+	end
+	return total
+end
+""",
+	# An array of small records, with a constructor each.
+	"records": """
+local function run(size)
+	local items = {}
+	for i = 1, size, 1 do
+		items[i] = {i, i * 3, i % 5}
+	end
+	local total = 0
+	for i = 1, #items, 1 do
+		local item = items[i]
+		total = total + item[1] + item[2] * item[3]
+	end
+	return total
+end
+""",
+	# An array of strings joined by table.concat.
+	"join": """
+local function run(size)
+	local parts = {}
+	for i = 1, size, 1 do
+		parts[#parts + 1] = i % 3 == 0 and "fizz" or "item"
+	end
+	local total = 0
+	for round = 1, 10, 1 do
+		total = total + #table.concat(parts, ",")
+	end
+	return total
+end
+"""
+}
+
+environment = {"table": table}
+
+def convert(code, tables):
+	lua_ast = lua_parser.parse(code, "5.3")
+	return gen_py_code(LuaParser(tables=tables).visit(lua_ast, []))
+
+def time_script(code, tables, size, rounds):
+	"""Returns (result, best time, peak memory) of running a converted
+	script."""
+	namespace = dict(environment)
+	exec(compile(convert(code, tables), "<" + tables + ">", "exec"), namespace)
+	run = namespace["run"]
+
+	elapsed = float("inf")
+	for _ in range(rounds):
+		start = time.perf_counter()
+		result = run(size)
+		elapsed = min(elapsed, time.perf_counter() - start)
+
+	tracemalloc.start()
+	try:
+		run(size)
+		peak = tracemalloc.get_traced_memory()[1]
+	finally:
+		tracemalloc.stop()
+	return result, elapsed, peak
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--size", type=int, default=100000)
+	parser.add_argument("--rounds", type=int, default=5)
+	args = parser.parse_args()
+
+	for name, code in scripts.items():
+		timings, peaks = {}, {}
+		results = set()
+		for tables in ("dict", "lua"):
+			result, timings[tables], peaks[tables] = time_script(
+				code, tables, args.size, args.rounds
+			)
+			results.add(result)
+		if len(results) != 1:
+			raise AssertionError(f"{name}: the tables modes returned {results}")
+
+		print(
+			f"{name}: dict {timings['dict'] * 1000:.1f} ms {peaks['dict'] / 1e6:.1f} MB, "
+			f"lua {timings['lua'] * 1000:.1f} ms {peaks['lua'] / 1e6:.1f} MB "
+			f"(lua/dict: time {timings['lua'] / timings['dict']:.2f}x, "
+			f"peak {peaks['lua'] / peaks['dict']:.2f}x)"
+		)
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,58 @@
+"""Measures the per-node visit cost of the three visitors on a large tree.
+
+	python -m <package>.benchmarks.visitors [--repeat 200] [file.lua]
+
+LuaParser (lua to python), PythonParser (python to lua) and
+LuaCodeGenerator (lua to code) each visit the same program."""
+import argparse
+import time
+import ast
+
+from .. import (
+	gen_lua_ast, gen_py_code, LuaParser, PythonParser, LuaCodeGenerator
+)
+from .lua_nodes import count_nodes
+from .lua_parser import sample
+
+def count_py_nodes(tree):
+	return sum(1 for _ in ast.walk(tree))
+
+def per_node(visit, tree, nodes, rounds):
+	best = float("inf")
+	for _ in range(rounds):
+		start = time.perf_counter()
+		visit(tree)
+		best = min(best, time.perf_counter() - start)
+	return best / nodes
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("file", nargs="?")
+	parser.add_argument("--version", default="5.1")
+	parser.add_argument("--repeat", type=int, default=200)
+	parser.add_argument("--rounds", type=int, default=5)
+	args = parser.parse_args()
+
+	if args.file:
+		with open(args.file, encoding="utf-8") as file:
+			code = file.read()
+	else:
+		code = sample * args.repeat
+
+	lua_ast = gen_lua_ast(code, args.version, parser="native")
+	py_ast = LuaParser().visit(lua_ast, [])
+	py_ast = ast.parse(gen_py_code(py_ast))
+
+	lua_nodes, py_nodes = count_nodes(lua_ast), count_py_nodes(py_ast)
+	print(f"{lua_nodes} lua nodes, {py_nodes} python nodes")
+
+	for name, visit, tree, nodes in (
+		("LuaParser", lambda tree: LuaParser().visit(tree, []), lua_ast, lua_nodes),
+		("PythonParser", lambda tree: PythonParser().visit(tree, []), py_ast, py_nodes),
+		("LuaCodeGenerator", lambda tree: LuaCodeGenerator().visit(tree), lua_ast, lua_nodes)
+	):
+		cost = per_node(visit, tree, nodes, args.rounds)
+		print(f"  {name}: {cost * 1e9:.0f} ns/node")
+
+if __name__ == "__main__":
+	main()
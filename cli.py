@@ -0,0 +1,204 @@
+"""Converts code between lua and python.
+
+	python -m <package> lua2py file.lua -o file.py
+	python -m <package> py2lua < file.py > file.lua
+	python -m <package> lua2lua src/ -o dst/ --jobs 8
+
+A file (or stdin, when the source is missing or "-") is converted to a
+file or stdout. A directory is converted into another one, keeping its
+layout, with --jobs processes (see transpile_tree), or kept converted
+with --watch (see Watcher). With --source-map, a converted file gets a
+.map file, mapping it back to the source (see source_map)."""
+import argparse
+import time
+import sys
+import os
+
+def convert(code, args, output, source_map=None):
+	"""Converts a code into a text stream with transpile. With
+	`source_map`, the generated code is mapped in it."""
+	from . import transpile
+
+	transpile(
+		code, args.direction, args.lua_version, args.parser, args.indent, output,
+		args.concat, args.optimize, args.tables, source_map, args.minify
+	)
+
+def convert_file(args):
+	from . import Profile, SourceMap, get_profile, set_profile
+
+	# The phases of transpile, timed by a profile (see Profile).
+	stats = []
+	def record(kind, name, elapsed):
+		if kind == "phase":
+			stats.append((name, elapsed))
+
+	profile = get_profile()
+	if args.stats:
+		if profile is None:
+			set_profile(Profile(record, node_stats=False))
+		else:
+			profile.callback = record
+
+	start = time.perf_counter()
+	if args.source is None or args.source == "-":
+		code = sys.stdin.read()
+	else:
+		with open(args.source, encoding="utf-8") as file:
+			code = file.read()
+	stats.append(("read", time.perf_counter() - start))
+
+	try:
+		if args.output is None or args.output == "-":
+			convert(code, args, sys.stdout)
+			sys.stdout.flush()
+		else:
+			source_map = SourceMap(args.source, args.output) if args.source_map else None
+			with open(args.output, "w", encoding="utf-8") as file:
+				convert(code, args, file, source_map)
+			if source_map is not None:
+				source_map.save(args.output + ".map")
+	finally:
+		if args.stats and profile is None:
+			set_profile(None)
+
+	if args.profile or args.memory:
+		print(profile.report(20 if args.profile else 0), file=sys.stderr)
+	if args.stats:
+		# transpile runs the other phases.
+		for name, elapsed in stats:
+			if name != "transpile":
+				print(f"{name}: {elapsed * 1000:.1f} ms", file=sys.stderr)
+		total = sum(elapsed for name, elapsed in stats if name in ("read", "transpile"))
+		print(f"total: {total * 1000:.1f} ms", file=sys.stderr)
+	return 0
+
+def print_result(result):
+	if result.error is not None:
+		print(f"{result.source}: {result.error}", file=sys.stderr)
+
+def convert_tree(args):
+	from . import transpile_tree
+
+	start = time.perf_counter()
+	results = transpile_tree(
+		args.source, args.output, args.direction, args.jobs,
+		args.lua_version, args.parser, args.indent, print_result,
+		args.memory_budget, args.concat, args.optimize, args.tables, args.minify
+	)
+	elapsed = time.perf_counter() - start
+
+	failed = sum(1 for result in results if result.error is not None)
+	if args.stats:
+		work = sum(result.elapsed for result in results)
+		print(
+			f"{len(results)} files, {failed} failed, {elapsed * 1000:.0f} ms "
+			f"({work * 1000:.0f} ms of conversion)",
+			file=sys.stderr
+		)
+		for result in sorted(results, key=lambda result: -result.elapsed)[:5]:
+			print(f"  {result.source}: {result.elapsed * 1000:.1f} ms", file=sys.stderr)
+	return 1 if failed else 0
+
+def watch_tree(args):
+	from . import Watcher
+
+	def report(result, written):
+		print_result(result)
+		if args.stats and result.error is None:
+			state = "written" if written else "unchanged"
+			print(
+				f"{result.source}: {result.elapsed * 1000:.1f} ms, {state}",
+				file=sys.stderr
+			)
+
+	Watcher(
+		args.source, args.output, args.direction, args.lua_version,
+		args.parser, args.indent, report=report, concat=args.concat,
+		optimize=args.optimize, tables=args.tables
+	).run()
+	return 0
+
+def main(argv=None):
+	from . import Profile, directions, set_cache, set_profile
+
+	parser = argparse.ArgumentParser(
+		prog=f"python -m {__package__}", description=__doc__.splitlines()[0]
+	)
+	parser.add_argument("direction", choices=list(directions))
+	parser.add_argument("source", nargs="?", help="file or directory, stdin by default")
+	parser.add_argument("-o", "--output", help="file or directory, stdout by default")
+	parser.add_argument("--lua-version", default="5.1")
+	parser.add_argument("--parser", choices=("node", "native"), default="node")
+	parser.add_argument("--indent", default="  ", help="lua indentation")
+	parser.add_argument(
+		"--concat", choices=("call", "join"), default="call",
+		help="python code of lua .. chains, see LuaParser"
+	)
+	parser.add_argument(
+		"--tables", choices=("dict", "lua"), default="dict",
+		help="python objects of lua tables: dicts, or LuaTables with lua "
+			"lengths and less memory but slower indexing, see LuaParser"
+	)
+	parser.add_argument(
+		"-O", dest="optimize", type=int, choices=(0, 1, 2), default=0,
+		help="optimization level, see optimize_py_ast, fold_lua_ast and hoist_lua_globals"
+	)
+	parser.add_argument(
+		"--minify", type=int, choices=(0, 1, 2), nargs="?", const=1, default=0,
+		help="minify lua code, renaming locals at level 2, see LuaMinifier"
+	)
+	parser.add_argument("-j", "--jobs", type=int, help="processes for directories")
+	parser.add_argument("--cache-dir", help="cache parsed lua trees in a directory")
+	parser.add_argument("--watch", action="store_true", help="keep a directory converted")
+	parser.add_argument(
+		"--source-map", action="store_true",
+		help="write the source map of a file to OUTPUT.map, see remap"
+	)
+	parser.add_argument("--stats", action="store_true", help="print timings to stderr")
+	parser.add_argument(
+		"--profile", action="store_true",
+		help="print the time spent per phase and node type to stderr"
+	)
+	parser.add_argument(
+		"--memory", action="store_true",
+		help="print the memory peak and retained per phase to stderr"
+	)
+	parser.add_argument(
+		"--memory-budget", type=float, metavar="MB",
+		help="fail files whose conversion allocates more memory"
+	)
+	args = parser.parse_intermixed_args(argv)
+
+	if args.cache_dir is not None:
+		set_cache(args.cache_dir)
+
+	directory = args.source is not None and os.path.isdir(args.source)
+	if (directory or args.watch) and args.output is None:
+		parser.error("converting a directory needs an --output directory")
+	if args.watch and not directory:
+		parser.error("--watch needs a source directory")
+	if (args.profile or args.memory) and directory:
+		parser.error("--profile and --memory need a source file")
+	if args.source_map and (directory or args.output in (None, "-")):
+		parser.error("--source-map needs a source file and an --output file")
+	if args.minify and (args.source_map or args.watch):
+		parser.error("--minify can't be used with --source-map or --watch")
+	budget = None if args.memory_budget is None else int(args.memory_budget * 1e6)
+	if args.profile or args.memory or (budget is not None and not directory):
+		set_profile(Profile(memory=args.memory, budget=budget))
+	args.memory_budget = budget
+
+	try:
+		if args.watch:
+			return watch_tree(args)
+		if directory:
+			return convert_tree(args)
+		return convert_file(args)
+	except BrokenPipeError:
+		# The reader went away (| head), silence the flush at exit.
+		os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+		return 1
+	except (OSError, SyntaxError, ValueError, TypeError, RuntimeError, MemoryError) as error:
+		print(f"{type(error).__name__}: {error}", file=sys.stderr)
+		return 1
@@ -0,0 +1,201 @@
+"""Imports of lua modules, converted to python on the fly.
+
+Once install_import_hook() is called, `import name` finds name.lua (or
+name/init.lua, a package) in the directories of sys.path, or of the
+package being imported from. A python module found in an earlier
+directory, or the same one, is imported instead: the directories are
+searched by LuaFinders, the FileFinders of the path hook installed,
+which list them once like the python ones. The
+code is converted and compiled by compile_lua, and its code object is
+written to __pycache__/name.lua.<cache tag>.pyc, a hash-based pyc: it
+is used while the hash of the lua code and the conversion options is
+the same, so later imports neither parse lua nor convert trees.
+
+The fields of the table a module returns are its attributes, and the
+table itself is its LUA_RETURN attribute. Modules are converted with
+LuaTables by default, which their functions can be assigned to, like
+`function M.add(a, b)`."""
+import importlib.machinery
+import importlib.abc
+import importlib.util
+import tempfile
+import functools
+import marshal
+import sys
+import os
+
+pyc_flags = 0b11 # Hash-based, checked against the source
+
+class LuaLoader(importlib.abc.Loader):
+	"""Loads a lua file as a module (see the module docstring)."""
+
+	def __init__(self, fullname, path, options):
+		self.name = fullname
+		self.path = path
+		self.options = options
+
+	def get_filename(self, fullname=None):
+		return self.path
+
+	def get_source(self, fullname=None):
+		with open(self.path, encoding="utf-8") as file:
+			return file.read()
+
+	def cache_path(self):
+		directory, name = os.path.split(self.path)
+		return os.path.join(
+			directory, "__pycache__",
+			f"{name[:-len('.lua')]}.lua.{sys.implementation.cache_tag}.pyc"
+		)
+
+	def source_hash(self, source):
+		from . import code_version, get_parser_version
+
+		options = self.options + (get_parser_version(self.options[1]), code_version)
+		options = "\0".join(str(option) for option in options).encode()
+		return importlib.util.source_hash(source + b"\0" + options)
+
+	def read_cache(self, path, source_hash):
+		"""Returns the code object of a pyc written for this source hash,
+		or None."""
+		try:
+			with open(path, "rb") as file:
+				data = file.read()
+		except OSError:
+			return None
+
+		magic = importlib.util.MAGIC_NUMBER
+		if (data[:4] != magic or int.from_bytes(data[4:8], "little") != pyc_flags or
+			data[8:16] != source_hash):
+			return None
+		try:
+			return marshal.loads(data[16:])
+		except (ValueError, EOFError, TypeError):
+			return None
+
+	def write_cache(self, path, source_hash, code):
+		data = (
+			importlib.util.MAGIC_NUMBER + pyc_flags.to_bytes(4, "little") +
+			source_hash + marshal.dumps(code)
+		)
+		try:
+			mode = os.stat(self.path).st_mode
+		except OSError:
+			mode = 0o666
+		# Like importlib, the cache keeps the mode of its source, writable
+		# so it can be replaced, where mkstemp would make it private.
+		mode = (mode | 0o200) & 0o666
+
+		try:
+			directory = os.path.dirname(path)
+			os.makedirs(directory, exist_ok=True)
+			descriptor, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+		except OSError:
+			return # Read-only directories are imported without cache
+
+		try:
+			with os.fdopen(descriptor, "wb") as file:
+				file.write(data)
+			os.chmod(temporary, mode)
+			os.replace(temporary, path)
+		except OSError:
+			try:
+				os.unlink(temporary)
+			except OSError:
+				pass
+
+	def get_code(self, fullname=None):
+		from . import compile_lua
+
+		with open(self.path, "rb") as file:
+			source = file.read()
+
+		path = self.cache_path()
+		source_hash = self.source_hash(source)
+		code = self.read_cache(path, source_hash)
+		if code is None:
+			version, parser, concat, optimize, tables = self.options
+			code = compile_lua(
+				source, self.path, version, parser, concat, optimize, tables
+			)
+			if not sys.dont_write_bytecode:
+				self.write_cache(path, source_hash, code)
+		return code
+
+	def exec_module(self, module):
+		namespace = module.__dict__
+		exec(self.get_code(), namespace)
+
+		result = namespace.get("LUA_RETURN")
+		if result is not None:
+			# LuaTable fields, or the keys of a dict table.
+			fields = result.items() if isinstance(result, dict) else (
+				vars(result).items() if hasattr(result, "__dict__") else ()
+			)
+			for key, value in fields:
+				if key.__class__ is str and value is not None:
+					namespace[key] = value
+
+class LuaFinder(importlib.machinery.FileFinder):
+	"""Finds the python modules of a directory, and the lua ones
+	converted with the given options (see transpile)."""
+
+	def __init__(self, path, version="5.1", parser="node", concat="call", optimize=0,
+				 tables="lua"):
+		self.options = (str(version), parser, concat, optimize, tables)
+		loader = functools.partial(LuaLoader, options=self.options)
+		# After the python loaders, whose modules are found first.
+		super().__init__(
+			path,
+			(importlib.machinery.ExtensionFileLoader, importlib.machinery.EXTENSION_SUFFIXES),
+			(importlib.machinery.SourceFileLoader, importlib.machinery.SOURCE_SUFFIXES),
+			(importlib.machinery.SourcelessFileLoader, importlib.machinery.BYTECODE_SUFFIXES),
+			(loader, [".lua"])
+		)
+
+	def find_spec(self, fullname, target=None):
+		spec = super().find_spec(fullname, target)
+		if spec is None or spec.loader is not None:
+			return spec
+
+		# A directory without __init__, a lua package with an init.lua
+		# or a portion of a namespace package.
+		package = spec.submodule_search_locations[0]
+		init = os.path.join(package, "init.lua")
+		if os.path.isfile(init):
+			return importlib.util.spec_from_file_location(
+				fullname, init, loader=LuaLoader(fullname, init, self.options),
+				submodule_search_locations=[package]
+			)
+		return spec
+
+class LuaPathHook:
+	"""The path hook making the LuaFinders of directories."""
+
+	def __init__(self, *options):
+		self.options = options
+
+	def __call__(self, path):
+		if not os.path.isdir(path or "."):
+			raise ImportError("only directories are supported", path=path)
+		return LuaFinder(path, *self.options)
+
+def install_import_hook(version="5.1", parser="node", concat="call", optimize=0,
+						tables="lua"):
+	"""Makes lua modules importable (see importer), replacing the hook
+	installed before, if any. Returns the new LuaPathHook."""
+	uninstall_import_hook()
+	hook = LuaPathHook(version, parser, concat, optimize, tables)
+	sys.path_hooks.insert(0, hook)
+	# The directories searched already have the finders of other hooks.
+	sys.path_importer_cache.clear()
+	return hook
+
+def uninstall_import_hook():
+	"""Removes the installed path hooks, and their LuaFinders."""
+	sys.path_hooks[:] = [
+		hook for hook in sys.path_hooks if not isinstance(hook, LuaPathHook)
+	]
+	for path, finder in list(sys.path_importer_cache.items()):
+		if isinstance(finder, LuaFinder):
+			del sys.path_importer_cache[path]
@@ -0,0 +1,331 @@
+from collections import namedtuple
+import tempfile
+import hashlib
+import marshal
+import bisect
+import ast
+import os
+
+from . import lua_parser
+
+magic = b"HLM\x01"
+
+IncrementalResult = namedtuple(
+	"IncrementalResult", ("code", "segments", "converted")
+)
+
+# Keywords starting a statement, see split_lua.
+statement_keywords = frozenset((
+	"local", "function", "if", "while", "for", "repeat", "do", "return", "goto"
+))
+# Tokens a statement can end with.
+statement_ends = frozenset((
+	")", "]", "}", "end", "...", "true", "false", "nil", "break", ";"
+))
+block_openers = frozenset(("function", "if", "do", "repeat", "(", "[", "{"))
+block_closers = frozenset(("end", "until", ")", "]", "}"))
+
+def scan_tokens(tokens):
+	"""Returns the start offsets of the segments following the first one
+	in a list of tokens starting a segment, and whether the tokens end at
+	the top level, where a statement keyword would start a new segment.
+
+	A segment starts at each top-level statement keyword (local,
+	function, if, ...) following the end of a statement, so functions
+	and blocks get a segment of their own while runs of assignments and
+	calls share one. Only the tokens are read, the code isn't parsed."""
+	starts = []
+	depth = 0
+	loop = False # A while or for whose do is still to come
+	previous = None
+
+	for kind, value, start, _ in tokens:
+		if kind == lua_parser.EOF:
+			break
+
+		if kind == lua_parser.SYMBOL:
+			if depth == 0 and value in statement_keywords and previous is not None and (
+				previous[0] != lua_parser.SYMBOL or previous[1] in statement_ends
+			) and not (value == "do" and loop):
+				starts.append(start)
+
+			if depth == 0:
+				if value == "return":
+					return starts, False # Must be the last statement
+				if value == "while" or value == "for":
+					loop = True
+				elif value == "do":
+					loop = False
+
+			if value in block_openers:
+				depth += 1
+			elif value in block_closers:
+				depth -= 1
+
+		previous = kind, value
+
+	return starts, depth == 0 and not loop and previous is not None and (
+		previous[0] != lua_parser.SYMBOL or previous[1] in statement_ends
+	)
+
+def split_lua(code, version="5.1"):
+	"""Returns the start offsets of the top-level segments of a lua code
+	(see scan_tokens)."""
+	return [0] + scan_tokens(lua_parser.Lexer(code, version).tokenize())[0]
+
+def common_prefix(a, b):
+	"""Returns the length of the common prefix of two strings."""
+	low, high = 0, min(len(a), len(b))
+	while low < high: # Compares slices, to stay in C
+		middle = (low + high + 1) // 2
+		if a[low:middle] == b[low:middle]:
+			low = middle
+		else:
+			high = middle - 1
+	return low
+
+def common_suffix(a, b, limit):
+	"""Returns the length of the common suffix of two strings,
+	at most `limit`."""
+	low, high = 0, limit
+	while low < high:
+		middle = (low + high + 1) // 2
+		if a[len(a) - middle:len(a) - low] == b[len(b) - middle:len(b) - low]:
+			low = middle
+		else:
+			high = middle - 1
+	return low
+
+def update_split_lua(old_code, old_starts, code, version="5.1"):
+	"""Returns the start offsets of the top-level segments of a lua code,
+	given the ones of a previous version of it. Only the tokens from the
+	segment before the change to the first unchanged segment after it
+	are read, unless the change affects the segments past it (an `end`
+	removed, ...), in which case the code is split again."""
+	prefix = common_prefix(old_code, code)
+	if prefix == len(old_code) == len(code):
+		return old_starts
+	suffix = common_suffix(old_code, code, min(len(old_code), len(code)) - prefix)
+	shift = len(code) - len(old_code)
+
+	# The previous segment starts with a token entirely before the change.
+	first = max(bisect.bisect_right(old_starts, prefix) - 2, 0)
+	last = max(bisect.bisect_left(old_starts, len(old_code) - suffix), first + 1)
+	if first == 0 and last == len(old_starts):
+		return split_lua(code, version)
+
+	start = old_starts[first]
+	stop = old_starts[last] + shift if last < len(old_starts) else None
+	tokens = lua_parser.Lexer(code, version).tokenize(start, stop)
+	starts, ended = scan_tokens(tokens)
+
+	if stop is not None and not (ended and tokens[-1][2] == stop):
+		return split_lua(code, version)
+	return (
+		old_starts[:first + 1] + starts +
+		[old_start + shift for old_start in old_starts[last:]]
+	)
+
+def split_python(tree):
+	"""Returns the (start line, statements) of the top-level segments of
+	a python code, one per statement. A hybridpython_var_ function shares
+	the segment of the statement using it, since PythonParser needs both."""
+	segments = []
+	merge = False
+
+	for statement in tree.body:
+		if merge:
+			segments[-1][1].append(statement)
+		else:
+			line = min(
+				[statement.lineno] +
+				[decorator.lineno for decorator in getattr(statement, "decorator_list", ())]
+			)
+			segments.append((1 if not segments else line, [statement]))
+
+		merge = (not merge and isinstance(statement, ast.FunctionDef) and
+				 statement.name.startswith("hybridpython_var_"))
+
+	return segments
+
+def fingerprint(text):
+	return hashlib.sha256(text.encode()).digest()
+
+def load_manifest(path, config):
+	"""Returns the (code, segment starts, segments) stored in a manifest,
+	or (None, None, {}) if it is missing, unreadable or was written with
+	another configuration."""
+	try:
+		with open(path, "rb") as file:
+			data = file.read()
+	except OSError:
+		return None, None, {}
+
+	if not data.startswith(magic):
+		return None, None, {}
+	try:
+		stored_config, code, starts, segments = marshal.loads(data[len(magic):])
+	except (ValueError, EOFError, TypeError):
+		return None, None, {}
+
+	if stored_config != config:
+		return None, None, {}
+	return code, starts, segments
+
+def save_manifest(path, config, code, starts, segments):
+	data = magic + marshal.dumps((config, code, starts, segments))
+	directory = os.path.dirname(path) or "."
+	os.makedirs(directory, exist_ok=True)
+
+	descriptor, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+	try:
+		with os.fdopen(descriptor, "wb") as file:
+			file.write(data)
+		os.replace(temporary, path)
+	except BaseException:
+		try:
+			os.unlink(temporary)
+		except OSError:
+			pass
+		raise
+
+def python_prelude(concat="call", tables="dict"):
+	"""Returns the python code every converted chunk starts with (see
+	LuaParser.prelude)."""
+	from . import LuaParser, gen_py_code
+
+	return gen_py_code(ast.Module(LuaParser(concat=concat, tables=tables).prelude(), []))
+
+def lua_segment_to_code(code, direction, version, parser, indent, concat, optimize,
+						tables):
+	from . import (
+		LuaParser, fold_lua_ast, gen_lua_ast, gen_lua_code, gen_py_code,
+		lua_to_py_ast, optimize_py_ast
+	)
+
+	lua_ast = gen_lua_ast(code, version, parser=parser)
+	if not lua_ast["body"]:
+		return ""
+	if optimize:
+		# The locals of a segment can be assigned in the following ones.
+		lua_ast = fold_lua_ast(lua_ast, version, propagate=False)
+	if direction == "lua2lua":
+		return gen_lua_code(lua_ast, indent)[1]
+
+	generator = LuaParser(concat=concat, tables=tables)
+	py_ast = lua_to_py_ast(lua_ast, generator)[1]
+	if optimize:
+		py_ast = optimize_py_ast(py_ast, optimize)
+	# Without the prelude, written once.
+	return gen_py_code(ast.Module(py_ast.body[len(generator.prelude()):], []))
+
+def python_segment_to_code(statements, version, indent, optimize):
+	from . import fold_lua_ast, gen_lua_code, py_to_lua_ast
+
+	lua_ast = py_to_lua_ast(ast.Module(statements, []))[1]
+	if not lua_ast["body"]:
+		return ""
+	if optimize:
+		lua_ast = fold_lua_ast(lua_ast, version, propagate=False)
+	return gen_lua_code(lua_ast, indent)[1]
+
+def check_options(direction, optimize):
+	"""Raises a ValueError for the options transpile_incremental can't
+	convert segments with: hoist_lua_globals (lua code from -O2) needs
+	the locals and globals of the whole chunk."""
+	if direction != "lua2py" and optimize > 1:
+		raise ValueError(
+			f"{direction} can't be converted incrementally from optimization "
+			"level 2, which hoists the globals of whole lua chunks"
+		)
+
+def transpile_incremental(code, direction, manifest, version="5.1",
+						  parser="node", indent="  ", concat="call", optimize=0,
+						  tables="dict"):
+	"""Returns the IncrementalResult of converting a code in a direction
+	(see transpile), reusing the code generated by the last conversion
+	for the top-level segments (see split_lua and split_python) that
+	didn't change. That code is kept, per segment, in the `manifest`
+	file, with the code it was generated from.
+
+	Only the changed segments are parsed and converted, so an edit costs
+	about the conversion of the function it is in. Lua segments are
+	parsed on their own, with their line numbers kept, and the code is
+	only split again around the change (see update_split_lua). Since the segments
+	are converted separately, the blank lines between them may differ
+	from the ones transpile would generate. `concat`, `optimize`
+	and `tables` are the ones of transpile, applied to every segment:
+	the locals of a segment aren't propagated into the following ones,
+	and the lua code, hoisted from level 2, is rejected there (see
+	check_options)."""
+	from . import directions, get_parser_version
+
+	if direction not in directions:
+		raise ValueError(f"Unknown direction: {direction}")
+	check_options(direction, optimize)
+	if isinstance(code, bytes):
+		code = code.decode()
+	version = str(version)
+
+	parser_version = None if direction == "py2lua" else get_parser_version(parser)
+
+	config = (direction, version, parser_version, indent, concat, optimize, tables)
+	stored_code, stored_starts, stored = load_manifest(manifest, config)
+	segments = {}
+	codes = []
+	converted = 0
+
+	if direction == "py2lua":
+		tree = ast.parse(code)
+		lines = code.splitlines(True)
+		split = split_python(tree)
+
+		for index, (line, statements) in enumerate(split):
+			end = split[index + 1][0] - 1 if index + 1 < len(split) else len(lines)
+			key = fingerprint("".join(lines[line - 1:end]))
+
+			segment = segments.get(key, stored.get(key))
+			if segment is None:
+				segment = python_segment_to_code(statements, version, indent, optimize)
+				converted += 1
+			segments[key] = segment
+			codes.append(segment)
+	else:
+		if stored_starts is None:
+			starts = split_lua(code, version)
+		else:
+			starts = update_split_lua(stored_code, stored_starts, code, version)
+
+		for index, start in enumerate(starts):
+			end = starts[index + 1] if index + 1 < len(starts) else len(code)
+			text = code[start:end]
+			key = fingerprint(text)
+
+			segment = segments.get(key, stored.get(key))
+			if segment is None:
+				# Padded so errors are reported at the right line.
+				segment = lua_segment_to_code(
+					"\n" * code.count("\n", 0, start) + text,
+					direction, version, parser, indent, concat, optimize, tables
+				)
+				converted += 1
+			segments[key] = segment
+			codes.append(segment)
+
+	if code != stored_code:
+		save_manifest(
+			manifest, config, code,
+			starts if direction != "py2lua" else None, segments
+		)
+
+	if direction == "lua2py":
+		# Two blank lines around the functions, as astor would write them.
+		result = [python_prelude(concat, tables)]
+		for segment in codes:
+			if segment.startswith(("def ", "class ", "@")) or len(result) == 1:
+				result.append("\n\n")
+			result.append(segment)
+		result = "".join(result)
+	else:
+		result = "\n".join(segment for segment in codes if segment)
+	return IncrementalResult(result, len(codes), converted)
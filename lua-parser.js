@@ -4,13 +4,214 @@ const fs = require("fs");
 
 const args = process.argv.slice(2);
 
-if (args.length == 0) {
+function parse(code, version, locations) {
+	return parser.parse(code, {luaVersion: version, locations: !!locations});
+}
+
+/*
+Serializes a tree in CPython's marshal format (version 4), decoded on the
+python side by marshal.loads. Strings are written once with the ref flag
+and referenced by index afterwards; short ASCII ones are interned.
+*/
+class MarshalWriter {
+	constructor() {
+		this.buffer = Buffer.alloc(1 << 16);
+		this.length = 0;
+		this.strings = new Map();
+	}
+
+	reserve(size) {
+		if (this.length + size <= this.buffer.length) {
+			return;
+		}
+
+		let capacity = this.buffer.length * 2;
+		while (capacity < this.length + size) {
+			capacity *= 2;
+		}
+		const buffer = Buffer.alloc(capacity);
+		this.buffer.copy(buffer, 0, 0, this.length);
+		this.buffer = buffer;
+	}
+
+	byte(value) {
+		this.reserve(1);
+		this.buffer[this.length++] = value;
+	}
+
+	int32(value) {
+		this.reserve(4);
+		this.buffer.writeInt32LE(value, this.length);
+		this.length += 4;
+	}
+
+	string(value) {
+		const index = this.strings.get(value);
+		if (index !== undefined) {
+			this.byte(0x72); // r
+			this.int32(index);
+			return;
+		}
+		this.strings.set(value, this.strings.size);
+
+		const bytes = Buffer.from(value, "utf8");
+		if (bytes.length < 256 && bytes.length == value.length) {
+			this.byte(0x5A | 0x80); // Z (short ascii interned) | FLAG_REF
+			this.byte(bytes.length);
+		} else {
+			this.byte(0x75 | 0x80); // u (unicode) | FLAG_REF
+			this.int32(bytes.length);
+		}
+		this.reserve(bytes.length);
+		bytes.copy(this.buffer, this.length);
+		this.length += bytes.length;
+	}
+
+	number(value) {
+		if (Number.isInteger(value) && Math.abs(value) < 1e21) {
+			if (value >= -0x80000000 && value <= 0x7FFFFFFF) {
+				this.byte(0x69); // i
+				this.int32(value);
+				return;
+			}
+
+			const digits = [];
+			let magnitude = Math.abs(value);
+			while (magnitude > 0) {
+				digits.push(magnitude % 32768);
+				magnitude = Math.floor(magnitude / 32768);
+			}
+			this.byte(0x6C); // l
+			this.int32(value < 0 ? -digits.length : digits.length);
+			this.reserve(digits.length * 2);
+			for (const digit of digits) {
+				this.buffer.writeUInt16LE(digit, this.length);
+				this.length += 2;
+			}
+			return;
+		}
+
+		this.byte(0x67); // g
+		this.reserve(8);
+		this.buffer.writeDoubleLE(value, this.length);
+		this.length += 8;
+	}
+
+	value(value) {
+		if (value === null || value === undefined) {
+			this.byte(0x4E); // N
+		} else if (value === true) {
+			this.byte(0x54); // T
+		} else if (value === false) {
+			this.byte(0x46); // F
+		} else if (typeof value == "number") {
+			this.number(value);
+		} else if (typeof value == "string") {
+			this.string(value);
+		} else if (Array.isArray(value)) {
+			this.byte(0x5B); // [
+			this.int32(value.length);
+			for (const item of value) {
+				this.value(item);
+			}
+		} else {
+			this.byte(0x7B); // {
+			for (const key of Object.keys(value)) {
+				if (value[key] !== undefined) {
+					this.string(key);
+					this.value(value[key]);
+				}
+			}
+			this.byte(0x30); // 0 (end of dict)
+		}
+	}
+
+	result() {
+		return this.buffer.subarray(0, this.length);
+	}
+}
+
+function marshal(ast) {
+	const writer = new MarshalWriter();
+	writer.value(ast);
+	return writer.result();
+}
+
+/*
+Server mode (node lua-parser.js --server) keeps the parser loaded and
+answers framed requests on stdin.
+
+Request:  kind (1 byte) | payload length (uint32 BE) | payload
+	"P": ping, empty payload. Answered with the luaparse version.
+	"Q": parse, payload is "<version>\n<utf-8 lua source>".
+	"B": same as "Q", but the AST is marshal encoded.
+Response: status (1 byte) | payload length (uint32 BE) | payload
+	"O": ok, payload is the encoded AST (or the ping answer).
+	"E": error, payload is the error message.
+*/
+function reply(status, text) {
+	const body = Buffer.isBuffer(text) ? text : Buffer.from(text, "utf8");
+	const header = Buffer.alloc(5);
+	header.write(status, 0, "ascii");
+	header.writeUInt32BE(body.length, 1);
+	process.stdout.write(Buffer.concat([header, body]));
+}
+
+function handle(kind, payload) {
+	if (kind == "P") {
+		reply("O", parser.version || "");
+		return;
+	}
+
+	if (kind != "Q" && kind != "B") {
+		reply("E", "Unknown request kind: " + kind);
+		return;
+	}
+
+	// The version line can be followed by " locations".
+	const separator = payload.indexOf(10); // \n
+	const options = payload.toString("ascii", 0, separator).split(" ");
+	const code = payload.toString("utf8", separator + 1);
+
+	let ast;
+	try {
+		ast = parse(code, options[0], options.includes("locations"));
+		ast = kind == "B" ? marshal(ast) : JSON.stringify(ast);
+	} catch (error) {
+		reply("E", error.message);
+		return;
+	}
+	reply("O", ast);
+}
+
+function serve() {
+	let buffer = Buffer.alloc(0);
+
+	process.stdin.on("data", (chunk) => {
+		buffer = buffer.length == 0 ? chunk : Buffer.concat([buffer, chunk]);
+
+		while (buffer.length >= 5) {
+			const length = buffer.readUInt32BE(1);
+			if (buffer.length < 5 + length) {
+				break;
+			}
+
+			const kind = String.fromCharCode(buffer[0]);
+			const payload = buffer.subarray(5, 5 + length);
+			buffer = buffer.subarray(5 + length);
+			handle(kind, payload);
+		}
+	});
+	process.stdin.on("end", () => process.exit(0));
+}
+
+if (args[0] == "--server") {
+	serve();
+} else if (args.length == 0) {
 	throw new Error("You need to give the file to parse to the parser.");
 } else if (args.length == 1) {
 	throw new Error("You need to give the expected lua version to the parser.");
+} else {
+	const code = fs.readFileSync(args[0], "utf8");
+	console.log(JSON.stringify(parse(code, args[1])));
 }
-
-parser.luaVersion = args[1];
-const code = fs.readFileSync(args[0], "utf8");
-const ast = parser.parse(code);
-console.log(JSON.stringify(ast));
\ No newline at end of file
@@ -1,56 +1,105 @@
-def body_to_code(body, indent, add_indent):
-	if isinstance(body, tuple):
-		body = list(body)
+import string
+import re
+
+from .visitor import LuaVisitor
+from .lua_nodes import Node
+from .lua_parser import keywords
+
+# Expressions that can be called or indexed without parentheses.
+prefix_types = frozenset((
+	"Identifier", "MemberExpression", "IndexExpression", "CallExpression",
+	"TableCallExpression", "StringCallExpression"
+))
+# Statements ending with an expression, that a statement starting with
+# a parenthesis would call: they are separated by a semicolon.
+expression_statements = frozenset(("CallStatement", "AssignmentStatement", "LocalStatement"))
+# The other ones LuaParser doesn't already parenthesize.
+literal_types = frozenset((
+	"StringLiteral", "NumericLiteral", "BooleanLiteral", "NilLiteral",
+	"VarargLiteral"
+))
 
-	for index, block in enumerate(body):
-		if isinstance(block, str):
-			body[index] = f"{indent}{block}"
+def body_to_code(body, indent, add_indent):
+	# Nested blocks are walked with a stack of iterators, so deeply
+	# nested code doesn't recurse.
+	lines = []
+	stack = [(iter(body), indent)]
+
+	while stack:
+		blocks, indent = stack[-1]
+		for block in blocks:
+			if isinstance(block, str):
+				lines.append(f"{indent}{block}")
+			elif block:
+				stack.append((iter(block), indent + add_indent))
+				break
+			else:
+				lines.append("")
 		else:
-			body[index] = body_to_code(block, indent + add_indent, add_indent)
+			stack.pop()
 
-	return "\n".join(body)
+	return "\n".join(lines)
 
-class LuaParser:
+class LuaParser(LuaVisitor):
 	def __init__(self, indent="  "):
 		self.indent = indent
 
-	def visit(self, node):
-		parser = getattr(self, f"visit_{node['type']}", None)
-		if parser is None:
-			raise TypeError(f"Unknown Lua AST node: {node['type']}")
-
-		return parser(node)
-
-	def visit_expr(self, node):
-		value = self.visit(node)
+	def visit_name(self, node):
+		# lua_nodes uses plain strings for names, luaparse uses identifiers.
+		if isinstance(node, str):
+			return node
+		return (yield node)
 
+	def expr(self, value):
+		# Statements used as expressions (function bodies) become code.
 		if isinstance(value, (list, tuple)):
 			return "(" + body_to_code(value, "", self.indent).strip("\n") + ")"
 		return value
 
+	def prefix(self, node):
+		"""Returns the code of an expression that is called or indexed,
+		"a":rep(2) and ...[1] not being valid lua."""
+		code = self.expr((yield node))
+		if node["type"] in literal_types:
+			return "(" + code + ")"
+		return code
+
+	def join(self, nodes, expressions=False):
+		values = []
+		for node in nodes:
+			if expressions:
+				values.append(self.expr((yield node)))
+			else:
+				values.append((yield node))
+		return ", ".join(values)
+
 	def visit_LuaBody(self, body):
 		new = []
+		previous = None
 
 		for child in body:
-			obj = self.visit(child)
+			obj = yield child
 			if obj is not None:
 				if isinstance(obj, tuple):
 					new.extend(obj)
 				else:
+					if obj.startswith("(") and previous in expression_statements:
+						obj = ";" + obj
 					new.append(obj)
+				previous = child["type"]
 
 		return new
 
 	def visit_Chunk(self, node):
-		return body_to_code(self.visit_LuaBody(node["body"]), "", self.indent)
+		return body_to_code((yield from self.visit_LuaBody(node["body"])), "", self.indent)
 
 	# Statements
 
 	def visit_LabelStatement(self, node):
-		return "::" + node["label"] + "::"
+		return "::" + (yield from self.visit_name(node["label"])) + "::"
 
 	def visit_GotoStatement(self, node):
-		return "goto " + node["label"]
+		return "goto " + (yield from self.visit_name(node["label"]))
 
 	def visit_BreakStatement(self, node):
 		return "break"
@@ -58,95 +107,94 @@ class LuaParser:
 	def visit_ReturnStatement(self, node):
 		if len(node["arguments"]) == 0:
 			return "return"
-		return "return " + (", ".join(map(self.visit_expr, node["arguments"])))
+		return "return " + (yield from self.join(node["arguments"], True))
 
 	def visit_AssignmentStatement(self, node):
-		return ((", ".join(map(self.visit, node["variables"]))) + " = " +
-				(", ".join(map(self.visit_expr, node["init"]))))
+		return ((yield from self.join(node["variables"])) + " = " +
+				(yield from self.join(node["init"], True)))
 
 	def visit_LocalStatement(self, node):
-		return "local " + self.visit_AssignmentStatement(node)
+		attributes = node.get("attributes") or ()
+		names = []
+		for index, variable in enumerate(node["variables"]):
+			name = yield variable
+			if index < len(attributes) and attributes[index] is not None:
+				name += " <" + attributes[index] + ">"
+			names.append(name)
+
+		code = "local " + ", ".join(names)
+		if node["init"]:
+			code += " = " + (yield from self.join(node["init"], True))
+		return code
+
+	def block(self, header, body, footer):
+		"""Returns a statement made of a header line, an indented body
+		and a footer line."""
+		return header, (yield from self.visit_LuaBody(body)), footer
 
 	def visit_IfStatement(self, node):
 		retval = []
+		last = len(node["clauses"]) - 1
 
-		for clause in node["clauses"]:
+		for index, clause in enumerate(node["clauses"]):
 			if clause["type"] == "IfClause":
-				retval.append(
-					"if " + self.visit(clause["condition"]) + " then"
-				)
+				header = "if " + self.expr((yield clause["condition"])) + " then"
 
 			elif clause["type"] == "ElseifClause":
-				retval.append("")
-				retval.append(
-					"elseif " + self.visit(clause["condition"]) + " then"
-				)
+				header = "elseif " + self.expr((yield clause["condition"])) + " then"
 
 			else:
-				retval.append("")
-				retval.append("else")
+				header = "else"
 
-			retval.append(self.visit_LuaBody(clause["body"]))
+			retval.extend((yield from self.block(
+				header, clause["body"], "end\n" if index == last else ""
+			)))
 
-		retval.append("end\n")
 		return tuple(retval) # Tuple so it extends to the body
 
 	def visit_WhileStatement(self, node):
-		return (
-			"while " + self.visit(node["condition"]) + " do",
-			self.visit_LuaBody(node["body"]),
-			"end\n"
-		)
+		return (yield from self.block(
+			"while " + self.expr((yield node["condition"])) + " do", node["body"], "end\n"
+		))
 
 	def visit_DoStatement(self, node):
-		return (
-			"do",
-			self.visit_LuaBody(node["body"]),
-			"end\n"
-		)
+		return (yield from self.block("do", node["body"], "end\n"))
 
 	def visit_RepeatStatement(self, node):
-		return (
-			"repeat",
-			self.visit_LuaBody(node["body"]),
-			"until " + self.visit(node["condition"]) + "\n"
-		)
+		return (yield from self.block(
+			"repeat", node["body"], "until " + self.expr((yield node["condition"])) + "\n"
+		))
 
 	def visit_CallStatement(self, node):
-		return self.visit(node["expression"])
+		return (yield node["expression"])
 
 	def visit_ForNumericStatement(self, node):
-		return (
-			("for " + self.visit(node["variable"]) + " = " +
-			self.visit(node["start"]) + ", " + self.visit(node["end"]) + ", " +
-			self.visit(node["step"]) + " do"),
-
-			self.visit_LuaBody(node["body"]),
-			"end\n"
-		)
+		limits = [self.expr((yield node["start"])), self.expr((yield node["end"]))]
+		if node["step"] is not None:
+			limits.append(self.expr((yield node["step"])))
+		return (yield from self.block(
+			"for " + (yield node["variable"]) + " = " + ", ".join(limits) + " do",
+			node["body"], "end\n"
+		))
 
 	def visit_ForGenericStatement(self, node):
-		return (
-			"for " + (", ".join(map(self.visit, node["variables"]))) +
-			" in " + (", ".join(map(self.visit_expr, node["iterators"]))) +
+		return (yield from self.block(
+			"for " + (yield from self.join(node["variables"])) +
+			" in " + (yield from self.join(node["iterators"], True)) +
 			" do",
-
-			self.visit_LuaBody(node["body"]),
-			"end\n"
-		)
+			node["body"], "end\n"
+		))
 
 	def visit_FunctionDeclaration(self, node):
-		return (
-			(("local " if node["isLocal"] else "") +
+		return (yield from self.block(
+			("local " if node["isLocal"] else "") +
 			"function" +
-			(" " + node["identifier"]
+			(" " + (yield from self.visit_name(node["identifier"]))
 			if node["identifier"] is not None else
 			"") + "(" +
-			(", ".join(map(self.visit, node["parameters"]))) + ")"),
-
-			self.visit_LuaBody(node["body"]),
-			"end\n"
-		)
+			(yield from self.join(node["parameters"])) + ")",
+			node["body"], "end\n"
+		))
 
 	# Expressions
 
@@ -173,51 +221,491 @@ class LuaParser:
 
 		for field in node["fields"]:
 			if field["type"] == "TableValue":
-				table.append(self.visit_expr(field["value"]))
+				table.append(self.expr((yield field["value"])))
 
 			elif field["type"] == "TableKey":
 				table.append((
-					"[" + self.visit(field["key"]) + "] = " +
-					self.visit_expr(field["value"])
+					"[" + self.expr((yield field["key"])) + "] = " +
+					self.expr((yield field["value"]))
 				))
 
 			elif field["type"] == "TableKeyString":
 				table.append((
-					self.visit(field["key"]) + " = " +
-					self.visit_expr(field["value"])
+					(yield field["key"]) + " = " +
+					self.expr((yield field["value"]))
 				))
 
 		return "({" + (", ".join(table)) + "})"
 
 	def visit_LogicalExpression(self, node):
-		return ("(" + self.visit_expr(node["left"]) + " " +
-				node["operator"] + " " + self.visit_expr(node["right"]) + ")")
+		return ("(" + self.expr((yield node["left"])) + " " +
+				node["operator"] + " " + self.expr((yield node["right"])) + ")")
 
 	def visit_UnaryExpression(self, node):
 		return ("(" + node["operator"] +
 				(" " if node["operator"] == "not" else "") +
-				self.visit(node["argument"]) + ")")
+				self.expr((yield node["argument"])) + ")")
 
 	def visit_BinaryExpression(self, node):
-		return ("(" + self.visit(node["left"]) + " " +
-				node["operator"] + " " + self.visit(node["right"]) + ")")
+		return ("(" + self.expr((yield node["left"])) + " " +
+				node["operator"] + " " + self.expr((yield node["right"])) + ")")
 
 	def visit_MemberExpression(self, node):
-		return (self.visit(node["base"]) + node["indexer"] +
-				node["identifier"])
+		identifier = node["identifier"]
+		if not isinstance(identifier, str):
+			identifier = yield identifier
+		return (yield from self.prefix(node["base"])) + node["indexer"] + identifier
 
 	def visit_IndexExpression(self, node):
-		return self.visit(node["base"]) + "[" + self.visit(node["index"]) + "]"
+		return ((yield from self.prefix(node["base"])) + "[" +
+				self.expr((yield node["index"])) + "]")
 
 	def visit_CallExpression(self, node):
-		return (self.visit_expr(node["base"]) + "(" +
-				(", ".join(map(self.visit_expr, node["arguments"]))) +
+		return ((yield from self.prefix(node["base"])) + "(" +
+				(yield from self.join(node["arguments"], True)) +
 				")")
 
 	def visit_TableCallExpression(self, node):
-		# node["arguments"] must be a TableConstructorExpression
-		return self.visit_expr(node["base"]) + self.visit(node["arguments"])
+		# node["arguments"] must be a TableConstructorExpression, whose
+		# code is parenthesized.
+		return (yield from self.prefix(node["base"])) + (yield node["arguments"])[1:-1]
 
 	def visit_StringCallExpression(self, node):
 		# node["argument"] must be a StringLiteral
-		return self.visit_expr(node["base"]) + self.visit(node["argument"])
\ No newline at end of file
+		return (yield from self.prefix(node["base"])) + (yield node["argument"])
+
+class LuaEmitter(LuaParser):
+	"""A LuaParser that writes the code of a chunk to a text stream
+	instead of returning it. Statements are written as they are visited,
+	a few hundred lines at a time, and the indentation is tracked while
+	entering and leaving blocks, so the code is never held in memory as
+	a whole.
+
+	The written code is the same as the one LuaParser returns. Function
+	expressions are still built as strings, since they are part of a
+	line.
+
+	With `source_map`, a SourceMap, the line every statement with a
+	"loc" key starts at is mapped to its source line (the statements of
+	function expressions are left to the line of theirs)."""
+	flush_lines = 512
+
+	def __init__(self, output, indent="  ", source_map=None):
+		super().__init__(indent)
+		self.output = output
+		self.pending = [] # Lines not written yet
+		self.separator = ""
+		self.level = ""
+		self.lines = 0 # Lines generated, pending or written
+		self.statement = None
+		self.source_map = source_map
+
+	def flush(self):
+		if self.pending:
+			self.output.write(self.separator + "\n".join(self.pending))
+			self.separator = "\n"
+			self.pending.clear()
+
+	def line(self, text):
+		self.pending.append(text)
+		self.lines += text.count("\n") + 1
+
+	def visit_LuaBody(self, body):
+		previous = None
+		for child in body:
+			# Lets visit_FunctionDeclaration tell statements from expressions.
+			self.statement = child
+			if self.source_map is not None:
+				location = child.get("loc")
+				if location is not None:
+					self.source_map.add(self.lines + 1, location["start"]["line"])
+
+			obj = yield child
+			if obj.__class__ is str:
+				if obj.startswith("(") and previous in expression_statements:
+					obj = ";" + obj
+				self.line(self.level + obj)
+			previous = child["type"]
+
+			if len(self.pending) >= self.flush_lines and self.output is not None:
+				self.flush()
+
+		return ()
+
+	def visit_Chunk(self, node):
+		yield from self.visit_LuaBody(node["body"])
+		self.flush()
+
+	def block(self, header, body, footer):
+		level = self.level
+
+		self.line(level + header)
+		lines = self.lines
+		self.level = level + self.indent
+		yield from self.visit_LuaBody(body)
+		self.level = level
+		if self.lines == lines:
+			self.line("") # Empty body
+		self.line(level + footer)
+		return ()
+
+	def visit_FunctionDeclaration(self, node):
+		if node is self.statement:
+			return (yield from super().visit_FunctionDeclaration(node))
+
+		# A function expression: its lines are kept apart, starting
+		# unindented, and returned as code like LuaParser.expr would.
+		state = self.output, self.pending, self.level, self.lines, self.source_map
+		self.output, self.pending, self.level, self.source_map = None, [], "", None
+		yield from super().visit_FunctionDeclaration(node)
+		code = "\n".join(self.pending)
+		self.output, self.pending, self.level, self.lines, self.source_map = state
+		return "(" + code.strip("\n") + ")"
+
+# Binary operators by precedence, see LuaMinifier.
+precedence = {
+	"or": 1, "and": 2,
+	"<": 3, ">": 3, "<=": 3, ">=": 3, "~=": 3, "==": 3,
+	"|": 4, "~": 5, "^^": 5, "&": 6, "<<": 7, ">>": 7,
+	"..": 8, "+": 9, "-": 9,
+	"*": 10, "/": 10, "//": 10, "%": 10,
+	"^": 12
+}
+unary_precedence = 11
+right_associative = frozenset(("..", "^"))
+# Expressions that can be called or indexed without parentheses.
+reserved_words = keywords | {"goto"}
+name_start = string.ascii_letters + "_"
+name_chars = name_start + string.digits
+number_end = re.compile(r"(?:\.[0-9]|(?<![\w.])[0-9])[\w.]*$")
+
+def needs_space(left, right):
+	"""Returns whether two pieces of code would merge into other tokens
+	once joined."""
+	last, first = left[-1], right[0]
+	if first == ".":
+		# .., ... or a number, after a number (1, 0x1e, 1.5, ...) or a dot.
+		return last == "." or (
+			last in name_chars and number_end.search(left) is not None
+		)
+	return (
+		(last in name_chars and first in name_chars) or
+		(last == "-" and first == "-") or # A comment
+		(last == "." and first in string.digits) or
+		(last == "[" and first in "[=") # A long string
+	)
+
+def glue(*pieces):
+	"""Joins pieces of code, with spaces only where they are needed."""
+	code = pieces[0]
+	for piece in pieces[1:]:
+		if piece:
+			if code and needs_space(code, piece):
+				code += " "
+			code += piece
+	return code
+
+def short_name(index):
+	"""Returns the index-th shortest lua name: a to _, then aa, ba..."""
+	name = name_start[index % len(name_start)]
+	index //= len(name_start)
+	while index:
+		index -= 1
+		name += name_chars[index % len(name_chars)]
+		index //= len(name_chars)
+	return name
+
+def used_names(node):
+	"""Returns the names of every identifier, label and field in a tree."""
+	names = set()
+	stack = [node]
+	while stack:
+		value = stack.pop()
+		if isinstance(value, list):
+			stack.extend(value)
+		elif isinstance(value, (dict, Node)):
+			for key in value.keys():
+				field = value[key]
+				if field.__class__ is str:
+					if key in ("name", "identifier", "label"):
+						names.add(field)
+				elif key != "loc":
+					stack.append(field)
+	return names
+
+class LuaMinifier(LuaParser):
+	"""A LuaParser returning the code of a chunk in as few bytes as it
+	can: expressions are only parenthesized where the precedence and
+	associativity of their operators require it, table constructors
+	and function expressions only when they are called or indexed, and
+	whitespace is only kept between tokens that would merge. Statements
+	are all on one line, with a semicolon before those starting with a
+	parenthesis. Comments are dropped, like LuaParser does.
+
+	With `rename`, local variables, parameters and loop variables get
+	the shortest names that aren't used in the chunk: the ones visible
+	at once never share a name, and names found anywhere in the chunk
+	(globals, fields, ...) are never given, so no variable is captured.
+	Code reading locals by name (debug.getlocal, ...) would break."""
+
+	def __init__(self, rename=False):
+		super().__init__("")
+		self.rename = rename
+		self.scopes = [] # [{lua name: new name}, locals declared]
+		self.visible = 0 # Locals of every scope
+		self.names = [] # New names, by number of visible locals
+		self.reserved = frozenset()
+		self.short = 0 # Short names tried
+
+	def new_name(self, index):
+		while len(self.names) <= index:
+			name = short_name(self.short)
+			self.short += 1
+			if name not in self.reserved and name not in reserved_words:
+				self.names.append(name)
+		return self.names[index]
+
+	def enter(self):
+		self.scopes.append([{}, 0])
+
+	def leave(self):
+		self.visible -= self.scopes.pop()[1]
+
+	def declare(self, name):
+		"""Returns the new name of a local declared in the current
+		scope, visible from the next statement or block on."""
+		if not self.rename:
+			return name
+		scope = self.scopes[-1]
+		new = scope[0][name] = self.new_name(self.visible)
+		scope[1] += 1
+		self.visible += 1
+		return new
+
+	def variable(self, name):
+		if self.rename:
+			for scope in reversed(self.scopes):
+				new = scope[0].get(name)
+				if new is not None:
+					return new
+		return name
+
+	def raw_name(self, node):
+		return node if isinstance(node, str) else node["name"]
+
+	def join(self, nodes, expressions=False):
+		values = []
+		for node in nodes:
+			values.append((yield node))
+		return ",".join(values)
+
+	def visit_LuaBody(self, body):
+		parts = []
+		last = ""
+		for child in body:
+			statement = yield child
+			if statement:
+				if last:
+					if statement[0] == "(":
+						parts.append(";") # Not a call of the last statement
+					elif needs_space(last, statement):
+						parts.append(" ")
+				parts.append(statement)
+				last = statement
+		return "".join(parts)
+
+	def block(self, body, names=()):
+		"""Returns the code of a body, in a scope of its own declaring
+		`names` first, and their new names."""
+		self.enter()
+		names = [self.declare(name) for name in names]
+		code = yield from self.visit_LuaBody(body)
+		self.leave()
+		return code, names
+
+	def visit_Chunk(self, node):
+		if self.rename:
+			self.reserved = used_names(node)
+			self.short = 0
+			self.names.clear()
+		return (yield from self.block(node["body"]))[0]
+
+	# Statements
+
+	def visit_LabelStatement(self, node):
+		return "::" + self.raw_name(node["label"]) + "::"
+
+	def visit_GotoStatement(self, node):
+		return glue("goto", self.raw_name(node["label"]))
+
+	def visit_ReturnStatement(self, node):
+		return glue("return", (yield from self.join(node["arguments"])))
+
+	def visit_AssignmentStatement(self, node):
+		return ((yield from self.join(node["variables"])) + "=" +
+				(yield from self.join(node["init"])))
+
+	def visit_LocalStatement(self, node):
+		# The values are evaluated before the variables are declared.
+		init = yield from self.join(node["init"])
+		attributes = node.get("attributes") or [None] * len(node["variables"])
+		names = ",".join(
+			self.declare(self.raw_name(variable)) +
+			("" if attribute is None else "<" + attribute + ">")
+			for variable, attribute in zip(node["variables"], attributes)
+		)
+		return glue("local", names) + ("=" + init if init else "")
+
+	def visit_IfStatement(self, node):
+		code = ""
+		for clause in node["clauses"]:
+			if clause["type"] == "ElseClause":
+				header = "else"
+			else:
+				header = glue(
+					"if" if clause["type"] == "IfClause" else "elseif",
+					(yield clause["condition"]), "then"
+				)
+			code = glue(code, header, (yield from self.block(clause["body"]))[0])
+		return glue(code, "end")
+
+	def visit_WhileStatement(self, node):
+		return glue(
+			"while", (yield node["condition"]), "do",
+			(yield from self.block(node["body"]))[0], "end"
+		)
+
+	def visit_DoStatement(self, node):
+		return glue("do", (yield from self.block(node["body"]))[0], "end")
+
+	def visit_RepeatStatement(self, node):
+		# The condition sees the locals of the body.
+		self.enter()
+		body = yield from self.visit_LuaBody(node["body"])
+		code = glue("repeat", body, "until", (yield node["condition"]))
+		self.leave()
+		return code
+
+	def visit_CallStatement(self, node):
+		return (yield node["expression"])
+
+	def visit_ForNumericStatement(self, node):
+		limits = [(yield node["start"]), (yield node["end"])]
+		if node["step"] is not None:
+			limits.append((yield node["step"]))
+		body, names = yield from self.block(
+			node["body"], [self.raw_name(node["variable"])]
+		)
+		return glue("for", names[0] + "=" + ",".join(limits), "do", body, "end")
+
+	def visit_ForGenericStatement(self, node):
+		iterators = yield from self.join(node["iterators"])
+		body, names = yield from self.block(
+			node["body"], [self.raw_name(variable) for variable in node["variables"]]
+		)
+		return glue("for", ",".join(names), "in", iterators, "do", body, "end")
+
+	def visit_FunctionDeclaration(self, node):
+		identifier = node["identifier"]
+		if identifier is None:
+			name = ""
+		elif node["isLocal"]:
+			# Visible in its own body.
+			name = glue("local", "function", self.declare(self.raw_name(identifier)))
+		elif isinstance(identifier, str) or identifier["type"] == "Identifier":
+			name = glue("function", self.variable(self.raw_name(identifier)))
+		else:
+			name = glue("function", (yield identifier))
+
+		parameters = [
+			"..." if parameter["type"] == "VarargLiteral" else self.raw_name(parameter)
+			for parameter in node["parameters"]
+		]
+		self.enter()
+		if isinstance(identifier, (dict, Node)) and identifier.get("indexer") == ":":
+			self.scopes[-1][0]["self"] = "self" # Implicit, never renamed
+		parameters = [
+			name if name == "..." else self.declare(name) for name in parameters
+		]
+		body = yield from self.visit_LuaBody(node["body"])
+		self.leave()
+		return glue(name or "function", "(" + ",".join(parameters) + ")", body, "end")
+
+	# Expressions
+
+	def visit_Identifier(self, node):
+		return self.variable(node["name"])
+
+	def operand(self, node, parent, wrap_equal):
+		"""Returns the code of an operand of an operator of precedence
+		`parent`, parenthesized if it binds less tightly (or as
+		tightly, with `wrap_equal`)."""
+		code = yield node
+		kind = node["type"]
+		if kind == "BinaryExpression" or kind == "LogicalExpression":
+			own = precedence[node["operator"]]
+		elif kind == "UnaryExpression":
+			own = unary_precedence
+		else:
+			return code
+		if own < parent or (own == parent and wrap_equal):
+			return "(" + code + ")"
+		return code
+
+	def prefix(self, node):
+		"""Returns the code of an expression that is called or indexed."""
+		code = yield node
+		if node["type"] in prefix_types:
+			return code
+		return "(" + code + ")"
+
+	def visit_TableConstructorExpression(self, node):
+		fields = []
+		for field in node["fields"]:
+			value = yield field["value"]
+			if field["type"] == "TableValue":
+				fields.append(value)
+			elif field["type"] == "TableKey":
+				fields.append(glue("[", (yield field["key"])) + "]=" + value)
+			else:
+				fields.append(self.raw_name(field["key"]) + "=" + value)
+		return "{" + ",".join(fields) + "}"
+
+	def visit_LogicalExpression(self, node):
+		operator = node["operator"]
+		own = precedence[operator]
+		right = operator in right_associative
+		return glue(
+			(yield from self.operand(node["left"], own, right)),
+			operator,
+			(yield from self.operand(node["right"], own, not right))
+		)
+
+	visit_BinaryExpression = visit_LogicalExpression
+
+	def visit_UnaryExpression(self, node):
+		return glue(
+			node["operator"],
+			(yield from self.operand(node["argument"], unary_precedence, False))
+		)
+
+	def visit_MemberExpression(self, node):
+		return (
+			(yield from self.prefix(node["base"])) + node["indexer"] +
+			self.raw_name(node["identifier"])
+		)
+
+	def visit_IndexExpression(self, node):
+		return glue((yield from self.prefix(node["base"])) + "[", (yield node["index"])) + "]"
+
+	def visit_CallExpression(self, node):
+		return (
+			(yield from self.prefix(node["base"])) + "(" +
+			(yield from self.join(node["arguments"])) + ")"
+		)
+
+	def visit_TableCallExpression(self, node):
+		return (yield from self.prefix(node["base"])) + (yield node["arguments"])
+
+	def visit_StringCallExpression(self, node):
+		return (yield from self.prefix(node["base"])) + (yield node["argument"])
@@ -0,0 +1,590 @@
+"""Constant folding and propagation over lua abstract syntax trees.
+
+fold_lua_ast evaluates the operators whose operands are constants, and
+replaces the locals that are never assigned after their declaration
+(in their scope and the functions in it) and hold a constant by that
+constant. Values follow the semantics of the lua version: numbers are
+floats, or 64 bit integers and floats from 5.3 on; strings are coerced
+to numbers by arithmetic and numbers to strings by `..`. Operations
+that would raise an error or give a value a literal can't hold (nan,
+inf, ...) are left to run.
+
+Only the strings of ASCII characters are folded, since the values of
+the others mix characters and bytes. luaparse trees, whose strings have
+no value, only get their numbers folded."""
+import math
+import re
+
+from .profiling import phase
+from .visitor import LuaVisitor
+from . import lua_nodes
+
+unknown = object() # Value of the expressions that aren't constant
+
+integer_literal_re = re.compile(r"0[xX][0-9a-fA-F]+|[0-9]+")
+# What lua_stringtonumber accepts.
+string_number_re = re.compile(
+	r"\s*[-+]?(0[xX]([0-9a-fA-F]+\.?[0-9a-fA-F]*|\.[0-9a-fA-F]+)([pP][-+]?[0-9]+)?|"
+	r"([0-9]+\.?[0-9]*|\.[0-9]+)([eE][-+]?[0-9]+)?)\s*"
+)
+escapes = {
+	"\\": "\\\\", "\"": "\\\"", "\n": "\\n", "\r": "\\r", "\t": "\\t",
+	"\a": "\\a", "\b": "\\b", "\f": "\\f", "\v": "\\v"
+}
+
+max_propagated_length = 40 # Of strings copied to every use of a local
+max_folded_length = 4096
+
+integer_versions = frozenset(("5.3", "5.4"))
+
+def wrap(value):
+	"""Returns an integer wrapped around like a lua 64 bit one."""
+	value &= 0xFFFFFFFFFFFFFFFF
+	return value - 0x10000000000000000 if value >= 0x8000000000000000 else value
+
+def is_ascii(value):
+	return value.isascii()
+
+def number_literal(raw, integers):
+	"""Returns the value of a numeric literal, an int when it is an
+	integer one and the version has them."""
+	from .lua_parser import number_value
+
+	if integers and integer_literal_re.fullmatch(raw):
+		if raw[:2] in ("0x", "0X"):
+			return wrap(int(raw, 16)) # Hexadecimal integers wrap around
+		value = int(raw)
+		if value < 0x8000000000000000:
+			return value
+	value = number_value(raw)
+	return float(value)
+
+def to_number(value, integers):
+	"""Returns a constant converted to a number like lua arithmetic
+	does, or unknown."""
+	if value.__class__ is int or value.__class__ is float:
+		return value
+	if value.__class__ is str and string_number_re.fullmatch(value):
+		raw = value.strip()
+		sign = -1 if raw.startswith("-") else 1
+		number = number_literal(raw.lstrip("+-"), integers)
+		return wrap(sign * number) if number.__class__ is int else sign * number
+	return unknown
+
+def to_integer(value, integers):
+	"""Returns a constant converted to an integer like lua bitwise
+	operators do, or unknown."""
+	value = to_number(value, integers)
+	if value.__class__ is float:
+		if not value.is_integer() or not -2 ** 63 <= value < 2 ** 63:
+			return unknown
+		return int(value)
+	return value
+
+def to_string(value, integers):
+	"""Returns a constant converted to a string like `..` does,
+	or unknown."""
+	if value.__class__ is str:
+		return value
+	if value.__class__ is int:
+		return str(value)
+	if value.__class__ is float:
+		if not math.isfinite(value):
+			return unknown
+		text = "%.14g" % value
+		if integers and re.fullmatch(r"-?[0-9]+", text):
+			text += ".0" # Floats look like floats from 5.3 on
+		return text
+	return unknown
+
+def truthy(value):
+	return value is not None and value is not False
+
+def arithmetic(operator, left, right, integers):
+	left, right = to_number(left, integers), to_number(right, integers)
+	if left is unknown or right is unknown:
+		return unknown
+
+	# `/` always divides floats.
+	if left.__class__ is int and right.__class__ is int and (
+		operator in ("+", "-", "*", "%", "//")
+	):
+		if operator == "+":
+			return wrap(left + right)
+		if operator == "-":
+			return wrap(left - right)
+		if operator == "*":
+			return wrap(left * right)
+		if right == 0:
+			return unknown # Error
+		# Python's // and % floor like lua's.
+		return wrap(left // right) if operator == "//" else left % right
+
+	left, right = float(left), float(right)
+	try:
+		if operator == "+":
+			value = left + right
+		elif operator == "-":
+			value = left - right
+		elif operator == "*":
+			value = left * right
+		elif operator == "/":
+			value = left / right
+		elif operator == "%":
+			value = left % right
+		elif operator == "//":
+			value = float(math.floor(left / right))
+		elif operator == "^":
+			value = left ** right
+		else:
+			return unknown
+	except (ArithmeticError, ValueError):
+		return unknown
+
+	if value.__class__ is not float or not math.isfinite(value):
+		return unknown
+	return value
+
+def bitwise(operator, left, right, integers):
+	left, right = to_integer(left, integers), to_integer(right, integers)
+	if left is unknown or right is unknown:
+		return unknown
+
+	if operator == "&":
+		return wrap(left & right)
+	if operator == "|":
+		return wrap(left | right)
+	if operator == "~":
+		return wrap(left ^ right)
+
+	# Logical shifts, a negative shift goes the other way.
+	if operator == ">>":
+		right = -right
+	if right <= -64 or right >= 64:
+		return 0
+	unsigned = left & 0xFFFFFFFFFFFFFFFF
+	return wrap(unsigned << right if right >= 0 else unsigned >> -right)
+
+def compare(operator, left, right):
+	numbers = (int, float)
+	if operator == "==" or operator == "~=":
+		if left.__class__ in numbers and right.__class__ in numbers:
+			equal = left == right
+		else:
+			equal = left.__class__ is right.__class__ and left == right
+		return equal if operator == "==" else not equal
+
+	# Strings compare with the locale of the interpreter, they are left.
+	if left.__class__ not in numbers or right.__class__ not in numbers:
+		return unknown
+	if operator == "<":
+		return left < right
+	if operator == "<=":
+		return left <= right
+	if operator == ">":
+		return left > right
+	return left >= right
+
+def quote(value):
+	"""Returns a lua string literal of an ASCII string."""
+	pieces = ['"']
+	for char in value:
+		escaped = escapes.get(char)
+		if escaped is None and (char < " " or char == "\x7f"):
+			escaped = "\\%03d" % ord(char)
+		pieces.append(escaped or char)
+	pieces.append('"')
+	return "".join(pieces)
+
+class ScopedVisitor(LuaVisitor):
+	"""Visits every node of a lua tree, tracking the locals in scope.
+
+	Every visit function returns the node that replaces the one it
+	visited, expressions being replaced through reference(). Locals are
+	keyed by the id of the Identifier declaring them."""
+
+	def __init__(self):
+		self.scopes = [{}]
+
+	@classmethod
+	def dispatch_keys(cls, name):
+		# visit_Node visits the children of the nodes without a visit
+		# function of their own.
+		if name == "Node":
+			return tuple(
+				kind for kind in lua_nodes.node_classes
+				if not hasattr(cls, "visit_" + kind)
+			)
+		return (name,)
+
+	def declare(self, identifier):
+		self.scopes[-1][identifier["name"]] = id(identifier)
+		return id(identifier)
+
+	def resolve(self, name):
+		"""Returns the key of the local a name refers to, or None
+		for a global."""
+		for scope in reversed(self.scopes):
+			key = scope.get(name)
+			if key is not None:
+				return key
+		return None
+
+	def reference(self, node, key):
+		return node
+
+	def assign(self, key):
+		pass
+
+	def is_node(self, value):
+		return isinstance(value, lua_nodes.Node) or (
+			isinstance(value, dict) and "type" in value
+		)
+
+	def visit_Node(self, node):
+		for key in node.keys():
+			value = node[key]
+			if isinstance(value, list):
+				for index, item in enumerate(value):
+					if self.is_node(item):
+						value[index] = yield item
+			elif key != "type" and self.is_node(value):
+				node[key] = yield value
+		return node
+
+	def block(self, body, scope=True):
+		if scope:
+			self.scopes.append({})
+		for index, statement in enumerate(body):
+			body[index] = yield statement
+		if scope:
+			self.scopes.pop()
+
+	def visit_Chunk(self, node):
+		yield from self.block(node["body"])
+		return node
+
+	def visit_LabelStatement(self, node):
+		return node
+
+	def visit_GotoStatement(self, node):
+		return node
+
+	def visit_Identifier(self, node):
+		return self.reference(node, self.resolve(node["name"]))
+
+	def visit_MemberExpression(self, node):
+		node["base"] = yield node["base"] # The identifier is a name
+		return node
+
+	def visit_TableKeyString(self, node):
+		node["value"] = yield node["value"]
+		return node
+
+	def visit_LocalStatement(self, node):
+		init = node["init"]
+		for index, value in enumerate(init):
+			init[index] = yield value
+		for variable in node["variables"]:
+			self.declare(variable)
+		return node
+
+	def visit_AssignmentStatement(self, node):
+		init = node["init"]
+		for index, value in enumerate(init):
+			init[index] = yield value
+
+		variables = node["variables"]
+		for index, variable in enumerate(variables):
+			if variable["type"] == "Identifier":
+				self.assign(self.resolve(variable["name"]))
+			else:
+				variables[index] = yield variable
+		return node
+
+	def visit_DoStatement(self, node):
+		yield from self.block(node["body"])
+		return node
+
+	def visit_WhileStatement(self, node):
+		node["condition"] = yield node["condition"]
+		yield from self.block(node["body"])
+		return node
+
+	def visit_RepeatStatement(self, node):
+		# The condition sees the locals of the body.
+		self.scopes.append({})
+		yield from self.block(node["body"], False)
+		node["condition"] = yield node["condition"]
+		self.scopes.pop()
+		return node
+
+	def visit_IfStatement(self, node):
+		for clause in node["clauses"]:
+			if clause["type"] != "ElseClause":
+				clause["condition"] = yield clause["condition"]
+			yield from self.block(clause["body"])
+		return node
+
+	def visit_ForNumericStatement(self, node):
+		for key in ("start", "end", "step"):
+			if node[key] is not None:
+				node[key] = yield node[key]
+
+		self.scopes.append({})
+		self.declare(node["variable"])
+		yield from self.block(node["body"], False)
+		self.scopes.pop()
+		return node
+
+	def visit_ForGenericStatement(self, node):
+		iterators = node["iterators"]
+		for index, iterator in enumerate(iterators):
+			iterators[index] = yield iterator
+
+		self.scopes.append({})
+		for variable in node["variables"]:
+			self.declare(variable)
+		yield from self.block(node["body"], False)
+		self.scopes.pop()
+		return node
+
+	def visit_FunctionDeclaration(self, node):
+		identifier = node["identifier"]
+		if identifier.__class__ is str:
+			# lua_nodes of PythonParser name global functions with strings.
+			self.assign(self.resolve(identifier))
+		elif identifier is not None:
+			if identifier["type"] != "Identifier":
+				node["identifier"] = yield identifier # a.b.c, a:b
+			elif node["isLocal"]:
+				self.declare(identifier) # Before the body, for recursion
+			else:
+				self.assign(self.resolve(identifier["name"]))
+
+		self.scopes.append({})
+		for parameter in node["parameters"]:
+			if parameter["type"] == "Identifier":
+				self.declare(parameter)
+		yield from self.block(node["body"], False)
+		self.scopes.pop()
+		return node
+
+class AssignmentScanner(ScopedVisitor):
+	"""Collects the keys of the locals assigned after their declaration."""
+
+	def __init__(self):
+		super().__init__()
+		self.assigned = set()
+
+	def assign(self, key):
+		if key is not None:
+			self.assigned.add(key)
+
+class ConstantFolder(ScopedVisitor):
+	"""Folds the constant expressions of a tree, and replaces the locals
+	that aren't in `assigned` and hold a constant (when propagating)."""
+
+	def __init__(self, version="5.1", assigned=None, propagate=True):
+		super().__init__()
+		self.integers = str(version) in integer_versions
+		self.assigned = assigned or set()
+		self.propagate = propagate
+		self.constants = {} # key: value of the constant locals
+
+	def value(self, node):
+		"""Returns the value of a constant expression, or unknown."""
+		kind = node["type"]
+		if kind == "NumericLiteral":
+			return number_literal(node["raw"], self.integers)
+		if kind == "StringLiteral":
+			value = node["value"]
+			return value if value.__class__ is str and is_ascii(value) else unknown
+		if kind == "BooleanLiteral":
+			return node["value"]
+		if kind == "NilLiteral":
+			return None
+		if (kind == "UnaryExpression" and node["operator"] == "-" and
+			node["argument"]["type"] == "NumericLiteral"):
+			value = number_literal(node["argument"]["raw"], self.integers)
+			return wrap(-value) if value.__class__ is int else -value
+		return unknown
+
+	def literal(self, value, like):
+		"""Returns a literal of a constant, a dict or a lua_nodes node
+		like the node it replaces."""
+		if value is None:
+			node = {"type": "NilLiteral", "value": None, "raw": "nil"}
+		elif value is True or value is False:
+			node = {"type": "BooleanLiteral", "value": value, "raw": str(value).lower()}
+		elif value.__class__ is str:
+			node = {"type": "StringLiteral", "value": value, "raw": quote(value)}
+		elif value.__class__ is int and value == -2 ** 63:
+			# math.mininteger, its magnitude wraps around to it.
+			node = {"type": "NumericLiteral", "value": 2 ** 63, "raw": "0x8000000000000000"}
+		else:
+			negative = math.copysign(1, value) < 0
+			magnitude = -value if negative else value
+			if magnitude.__class__ is float and not self.integers and (
+				magnitude.is_integer() and magnitude < 2 ** 53
+			):
+				raw = str(int(magnitude)) # Every number is a float
+			else:
+				raw = repr(magnitude)
+			from .lua_parser import number_value
+
+			node = {"type": "NumericLiteral", "value": number_value(raw), "raw": raw}
+			if negative:
+				node = {"type": "UnaryExpression", "operator": "-", "argument": node}
+
+		if isinstance(like, lua_nodes.Node):
+			return lua_nodes.from_dict(node)
+		return node
+
+	def fold(self, node, value):
+		if value is unknown:
+			return node
+		if value.__class__ is str and len(value) > max_folded_length:
+			return node
+		return self.literal(value, node)
+
+	def reference(self, node, key):
+		if key is None or key not in self.constants:
+			return node
+		return self.literal(self.constants[key], node)
+
+	def visit_LocalStatement(self, node):
+		node = yield from super().visit_LocalStatement(node)
+		if not self.propagate:
+			return node
+
+		init = node["init"]
+		attributes = node.get("attributes") or ()
+		for index, variable in enumerate(node["variables"]):
+			key = id(variable)
+			if key in self.assigned:
+				continue
+			if index < len(attributes) and attributes[index] == "close":
+				continue # Closed when leaving the scope
+			if index < len(init):
+				value = self.value(init[index])
+			elif init and init[-1]["type"] in (
+				"CallExpression", "TableCallExpression", "StringCallExpression",
+				"VarargLiteral"
+			):
+				value = unknown # One of the values of the last expression
+			else:
+				value = None
+
+			if value is not unknown and not (
+				value.__class__ is str and len(value) > max_propagated_length
+			):
+				self.constants[key] = value
+		return node
+
+	def prefix(self, node):
+		"""Visits the base of an index or call, which is kept when it
+		would become a literal: "a":len() isn't valid lua."""
+		base = yield node["base"]
+		if self.value(base) is unknown or self.value(node["base"]) is not unknown:
+			node["base"] = base
+
+	def visit_MemberExpression(self, node):
+		yield from self.prefix(node)
+		return node
+
+	def visit_IndexExpression(self, node):
+		yield from self.prefix(node)
+		node["index"] = yield node["index"]
+		return node
+
+	def visit_CallExpression(self, node):
+		yield from self.prefix(node)
+		arguments = node["arguments"]
+		for index, argument in enumerate(arguments):
+			arguments[index] = yield argument
+		return node
+
+	def visit_TableCallExpression(self, node):
+		yield from self.prefix(node)
+		node["arguments"] = yield node["arguments"]
+		return node
+
+	def visit_StringCallExpression(self, node):
+		yield from self.prefix(node)
+		node["argument"] = yield node["argument"]
+		return node
+
+	def visit_UnaryExpression(self, node):
+		node["argument"] = yield node["argument"]
+		operator = node["operator"]
+		value = self.value(node["argument"])
+		if value is unknown:
+			return node
+
+		if operator == "not":
+			return self.fold(node, not truthy(value))
+		if operator == "-":
+			if node["argument"]["type"] == "NumericLiteral":
+				return node # Already a constant
+			number = to_number(value, self.integers)
+			if number is unknown:
+				return node
+			return self.fold(node, wrap(-number) if number.__class__ is int else -number)
+		if operator == "#":
+			return self.fold(node, len(value) if value.__class__ is str else unknown)
+		if operator == "~" and self.integers:
+			number = to_integer(value, self.integers)
+			return self.fold(node, unknown if number is unknown else wrap(~number))
+		return node
+
+	def visit_BinaryExpression(self, node):
+		node["left"] = yield node["left"]
+		node["right"] = yield node["right"]
+		left, right = self.value(node["left"]), self.value(node["right"])
+		if left is unknown or right is unknown:
+			return node
+
+		operator = node["operator"]
+		if operator == "..":
+			left, right = to_string(left, self.integers), to_string(right, self.integers)
+			if left is unknown or right is unknown:
+				return node
+			return self.fold(node, left + right)
+		if operator in ("==", "~=", "<", "<=", ">", ">="):
+			return self.fold(node, compare(operator, left, right))
+		if operator in ("&", "|", "~", "<<", ">>"):
+			if not self.integers:
+				return node
+			return self.fold(node, bitwise(operator, left, right, self.integers))
+		return self.fold(node, arithmetic(operator, left, right, self.integers))
+
+	def visit_LogicalExpression(self, node):
+		node["left"] = yield node["left"]
+		node["right"] = yield node["right"]
+		left = self.value(node["left"])
+		if left is unknown:
+			return node
+
+		decided = truthy(left) == (node["operator"] == "or")
+		if decided:
+			return node["left"]
+		# Calls and varargs keep their single value.
+		if node["right"]["type"] in (
+			"CallExpression", "TableCallExpression", "StringCallExpression",
+			"VarargLiteral"
+		):
+			return node
+		return node["right"]
+
+@phase("fold_lua_ast")
+def fold_lua_ast(lua_ast, version="5.1", propagate=True):
+	"""Folds the constant expressions of a lua tree (see lua_fold) in
+	place, and returns it. With `propagate`, the locals holding a
+	constant that are never assigned are replaced by it."""
+	assigned = None
+	if propagate:
+		scanner = AssignmentScanner()
+		scanner.visit(lua_ast)
+		assigned = scanner.assigned
+	return ConstantFolder(version, assigned, propagate).visit(lua_ast)
@@ -0,0 +1,374 @@
+"""Hoisting of the global lookups of lua trees into locals.
+
+Every read of a global (or of a field of a library table, like
+math.floor) is a hash lookup in the environment, where a local is a
+register. hoist_lua_globals declares the frequently read ones as locals
+at the top of the chunk or function reading them:
+
+	local print = print
+	local math_floor = math.floor
+
+The functions of the base library and the fields of the library tables
+are hoisted to the top of the chunk, as they don't change once it is
+loaded; the functions reading them get them as upvalues. The other
+globals are read again at the top of every function call, and only
+hoisted when the functions nested in it don't read them. Globals the
+chunk assigns (directly, or a field of a library) are never hoisted,
+and neither is anything in the chunks that change their environment
+(_ENV, setfenv, module, or fields of _G, assigned or rawset).
+
+A read counts once, or loop_weight times in a loop (or in a function,
+for the chunk); the names read at least min_weight times are hoisted,
+the most read first, while the function stays under the lua limits
+of locals and upvalues."""
+from .profiling import phase
+from .lua_fold import ScopedVisitor
+from . import lua_nodes
+
+standard_globals = frozenset((
+	"assert", "collectgarbage", "dofile", "error", "getmetatable", "ipairs",
+	"load", "loadfile", "loadstring", "next", "pairs", "pcall", "print",
+	"rawequal", "rawget", "rawlen", "rawset", "require", "select",
+	"setmetatable", "tonumber", "tostring", "type", "unpack", "xpcall"
+))
+libraries = frozenset(("coroutine", "math", "string", "table"))
+# Libraries a sandbox can leave out, read as `io and io.write`.
+optional_libraries = frozenset(("bit32", "debug", "io", "os", "package", "utf8"))
+environment_names = frozenset(("_ENV", "getfenv", "module", "setfenv"))
+
+loop_weight = 10
+max_locals = 200
+max_upvalues = {"5.1": 60, "LuaJIT": 60} # 255 from 5.2 on
+hidden_locals = {"ForNumericStatement": 3, "ForGenericStatement": 4} # 5.4's
+
+class Function:
+	"""The chunk or a function of a tree, as hoist_lua_globals sees it."""
+
+	def __init__(self, node, start):
+		self.node = node
+		self.start = start # Index of its first scope
+		self.self = {"type": "Identifier", "name": "self"} # Of methods
+		self.hidden = 0 # Locals of the loops running
+		self.peak = 0 # Most locals active at once
+		self.loops = 0
+		self.upvalues = set()
+		self.uses = {} # name: weight of the reads of globals in it
+		self.nested = set() # Globals read by its nested functions
+		self.shared = set() # Library names and fields read by it or its nested functions
+
+class HoistVisitor(ScopedVisitor):
+	"""Tracks the functions of a tree, and the locals declared in them."""
+
+	def __init__(self):
+		super().__init__()
+		self.functions = [] # Running ones, the chunk first
+		self.all = [] # Every one, the chunk first
+		self.owners = {} # key of a local: Function declaring it
+
+	def enter(self, node):
+		function = Function(node, len(self.scopes))
+		self.functions.append(function)
+		self.all.append(function)
+		return function
+
+	def owner(self):
+		"""Returns the function the innermost scope belongs to."""
+		depth = len(self.scopes) - 1
+		for function in reversed(self.functions):
+			if function.start <= depth:
+				return function
+		return self.functions[0]
+
+	def declare(self, identifier):
+		key = super().declare(identifier)
+		scope = self.scopes[-1]
+		scope[None] = scope.get(None, 0) + 1 # Locals declared, with duplicates
+
+		function = self.owner()
+		self.owners[key] = function
+		active = function.hidden + sum(
+			scope.get(None, 0) for scope in self.scopes[function.start:]
+		)
+		function.peak = max(function.peak, active)
+		return key
+
+	def global_name(self, node):
+		"""Returns the name of the global a node reads, or None."""
+		if node["type"] == "Identifier" and self.resolve(node["name"]) is None:
+			return node["name"]
+		return None
+
+	def field_name(self, node):
+		"""Returns the name of the field of a member expression (a string
+		in the lua_nodes of PythonParser)."""
+		identifier = node["identifier"]
+		return identifier if identifier.__class__ is str else identifier["name"]
+
+	def visit_Chunk(self, node):
+		self.enter(node)
+		yield from self.block(node["body"])
+		self.functions.pop()
+		return node
+
+	def loop(self, node, visit):
+		function = self.functions[-1]
+		hidden = hidden_locals.get(node["type"], 0)
+		function.loops += 1
+		function.hidden += hidden
+		node = yield from visit(node)
+		function.loops -= 1
+		function.hidden -= hidden
+		return node
+
+	def visit_WhileStatement(self, node):
+		return (yield from self.loop(node, super().visit_WhileStatement))
+
+	def visit_RepeatStatement(self, node):
+		return (yield from self.loop(node, super().visit_RepeatStatement))
+
+	def visit_ForNumericStatement(self, node):
+		return (yield from self.loop(node, super().visit_ForNumericStatement))
+
+	def visit_ForGenericStatement(self, node):
+		return (yield from self.loop(node, super().visit_ForGenericStatement))
+
+	def visit_FunctionDeclaration(self, node):
+		identifier = node["identifier"]
+		if identifier is not None and identifier.__class__ is not str:
+			if identifier["type"] != "Identifier":
+				node["identifier"] = yield identifier # a.b.c, a:b
+			elif node["isLocal"]:
+				self.declare(identifier) # Before the body, for recursion
+
+		function = self.enter(node)
+		self.scopes.append({})
+		if isinstance(identifier, (dict, lua_nodes.Node)) and identifier.get("indexer") == ":":
+			self.declare(function.self)
+		for parameter in node["parameters"]:
+			if parameter["type"] == "Identifier":
+				self.declare(parameter)
+		yield from self.block(node["body"], False)
+		self.scopes.pop()
+		self.functions.pop()
+		return node
+
+class GlobalCounter(HoistVisitor):
+	"""Counts the reads of the globals and library fields of a tree,
+	and collects the ones it assigns."""
+
+	def __init__(self):
+		super().__init__()
+		self.uses = {} # name or (library, field): weight of its reads
+		self.assigned = set() # Names and (library, field) pairs
+		self.indexed = set() # Libraries assigned unknown keys
+		self.unsafe = False # Whether the environment is changed
+
+	def weight(self, nested):
+		"""Returns the weight of a read, one in a function counting as a
+		loop when `nested` (for the chunk)."""
+		if self.functions[-1].loops or (nested and len(self.functions) > 1):
+			return loop_weight
+		return 1
+
+	def read(self, key):
+		"""Counts a read of a base library function or library field."""
+		self.uses[key] = self.uses.get(key, 0) + self.weight(True)
+		for function in self.functions[1:]:
+			function.shared.add(key)
+
+	def reference(self, node, key):
+		if key is not None:
+			owner = self.owners[key]
+			for function in reversed(self.functions):
+				if function is owner:
+					break
+				function.upvalues.add(key)
+			return node
+
+		name = node["name"]
+		if name in environment_names:
+			self.unsafe = True
+		elif name in standard_globals:
+			self.read(name)
+		else:
+			function = self.functions[-1]
+			function.uses[name] = function.uses.get(name, 0) + self.weight(False)
+			for outer in self.functions[:-1]:
+				outer.nested.add(name)
+		return node
+
+	def target(self, node):
+		"""Collects an assigned global or library field."""
+		if node.__class__ is str: # Function of PythonParser
+			if self.resolve(node) is None:
+				self.assigned.add(node)
+			return
+		if node["type"] == "Identifier":
+			name = self.global_name(node)
+			if name is not None:
+				self.assigned.add(name)
+			return
+
+		base = self.global_name(node["base"])
+		if base == "_G":
+			self.unsafe = True
+		elif base is not None:
+			if node["type"] == "MemberExpression":
+				self.assigned.add((base, self.field_name(node)))
+			else:
+				self.indexed.add(base)
+
+	def visit_AssignmentStatement(self, node):
+		for variable in node["variables"]:
+			self.target(variable)
+		return (yield from super().visit_AssignmentStatement(node))
+
+	def visit_FunctionDeclaration(self, node):
+		if node["identifier"] is not None and not node["isLocal"]:
+			self.target(node["identifier"])
+		return (yield from super().visit_FunctionDeclaration(node))
+
+	def visit_CallExpression(self, node):
+		arguments = node["arguments"]
+		if (self.global_name(node["base"]) == "rawset" and arguments and
+			self.global_name(arguments[0]) == "_G"):
+			self.unsafe = True # Like assigning a field of _G
+		return (yield from self.visit_Node(node))
+
+	def visit_MemberExpression(self, node):
+		base = self.global_name(node["base"])
+		if node["indexer"] == "." and (base in libraries or base in optional_libraries):
+			self.read((base, self.field_name(node)))
+			return node
+		return (yield from super().visit_MemberExpression(node))
+
+class FieldReplacer(HoistVisitor):
+	"""Replaces the library fields read by the locals they are hoisted
+	into."""
+
+	def __init__(self, aliases):
+		super().__init__()
+		self.aliases = aliases # (library, field): name of the local
+
+	def visit_MemberExpression(self, node):
+		base = self.global_name(node["base"])
+		if node["indexer"] == ".":
+			alias = self.aliases.get((base, self.field_name(node)))
+			if alias is not None:
+				identifier = {"type": "Identifier", "name": alias}
+				if isinstance(node, lua_nodes.Node):
+					return lua_nodes.from_dict(identifier)
+				return identifier
+		return (yield from super().visit_MemberExpression(node))
+
+def select(counter, version, min_weight, local_limit):
+	"""Returns {Function: names and library fields hoisted into it}."""
+	if counter.unsafe:
+		return {}
+	upvalue_limit = max_upvalues.get(str(version), 255)
+
+	def allowed(key, weight):
+		if weight < min_weight or key in counter.assigned:
+			return False
+		if key.__class__ is tuple:
+			return key[0] not in counter.assigned and key[0] not in counter.indexed
+		return True
+
+	def ranked(uses):
+		return sorted(
+			(key for key, weight in uses.items() if allowed(key, weight)),
+			key=lambda key: (-uses[key], str(key))
+		)
+
+	hoisted = {}
+	functions = counter.all[1:]
+	added = dict.fromkeys(functions, 0) # Upvalues of hoisted names
+	chunk = counter.all[0]
+	uses = dict(counter.uses)
+	for name, weight in chunk.uses.items():
+		if name not in chunk.nested:
+			uses[name] = weight
+
+	selected = []
+	for key in ranked(uses):
+		if chunk.peak + len(selected) >= local_limit:
+			break
+		users = [function for function in functions if key in function.shared]
+		if all(len(user.upvalues) + added[user] < upvalue_limit for user in users):
+			for user in users:
+				added[user] += 1
+			selected.append(key)
+	if selected:
+		hoisted[chunk] = selected
+
+	for function in functions:
+		uses = {
+			name: weight for name, weight in function.uses.items()
+			if name not in function.nested
+		}
+		selected = ranked(uses)[:max(local_limit - function.peak, 0)]
+		if selected:
+			hoisted[function] = selected
+	return hoisted
+
+def alias_statement(key, alias, like):
+	"""Returns the local statement declaring a hoisted name, a dict or
+	a lua_nodes node like the tree."""
+	def identifier(name):
+		return {"type": "Identifier", "name": name}
+
+	if key.__class__ is tuple:
+		library, field = key
+		value = {
+			"type": "MemberExpression", "indexer": ".",
+			"identifier": identifier(field), "base": identifier(library)
+		}
+		if library in optional_libraries:
+			value = {
+				"type": "LogicalExpression", "operator": "and",
+				"left": identifier(library), "right": value
+			}
+	else:
+		value = identifier(key)
+
+	statement = {"type": "LocalStatement", "variables": [identifier(alias)], "init": [value]}
+	if isinstance(like, lua_nodes.Node):
+		return lua_nodes.from_dict(statement)
+	return statement
+
+@phase("hoist_lua_globals")
+def hoist_lua_globals(lua_ast, version="5.1", min_weight=2, local_limit=max_locals):
+	"""Declares the globals and library fields a lua tree reads often as
+	locals (see lua_hoist) in place, and returns it. The functions keep
+	at most `local_limit` locals active at once."""
+	from .lua_code_gen import used_names
+
+	counter = GlobalCounter()
+	counter.visit(lua_ast)
+	hoisted = select(counter, version, min_weight, local_limit)
+	if not hoisted:
+		return lua_ast
+
+	names = used_names(lua_ast)
+	aliases = {}
+	for keys in hoisted.values():
+		for key in keys:
+			if key.__class__ is tuple:
+				alias = "_".join(key)
+				index = 1
+				while alias in names:
+					index += 1
+					alias = f"{key[0]}_{key[1]}_{index}"
+				names.add(alias)
+				aliases[key] = alias
+	if aliases:
+		FieldReplacer(aliases).visit(lua_ast)
+
+	for function, keys in hoisted.items():
+		statements = sorted(
+			(aliases.get(key, key), key) for key in keys
+		)
+		function.node["body"][:0] = [
+			alias_statement(key, alias, lua_ast) for alias, key in statements
+		]
+	return lua_ast
@@ -1,90 +1,358 @@
-def Chunk(body):
-	return {"type": "Chunk", "body": body, "comments": []}
+class Node:
+	"""Base class of the lua abstract syntax tree nodes.
 
-def BreakStatement():
-	return {"type": "BreakStatement"}
+	Nodes keep their fields in __slots__ and support the same read and
+	write access as the luaparse dicts (node["type"], node["body"], ...),
+	so every visitor works with both.
 
-def ReturnStatement(arguments):
-	return {"type": "ReturnStatement", "arguments": arguments}
+	Like in luaparse trees parsed with locations, nodes can have a "loc"
+	key, {"start": {"line", "column"}, "end": {...}}, which is only one
+	of their keys once assigned."""
+	__slots__ = ("loc",)
+	type = None
+	_fields = ()
+	_keyset = frozenset(("type",))
 
-def IfStatement(clauses):
-	return {"type": "IfStatement", "clauses": clauses}
+	def __init_subclass__(cls, **kwargs):
+		super().__init_subclass__(**kwargs)
+		cls.type = cls.__name__
+		cls._keyset = frozenset(cls._fields + ("type",))
 
-def IfClause(condition, body):
-	return {"type": "IfClause", "condition": condition, "body": body}
+	def __getitem__(self, key):
+		if key in self._keyset:
+			return getattr(self, key)
+		if key == "loc":
+			try:
+				return self.loc
+			except AttributeError:
+				pass
+		raise KeyError(key)
 
-def ElseifClause(condition, body):
-	return {"type": "ElseifClause", "condition": condition, "body": body}
+	def __setitem__(self, key, value):
+		if key == "type" or (key not in self._keyset and key != "loc"):
+			raise KeyError(key)
+		setattr(self, key, value)
 
-def ElseClause(body):
-	return {"type": "ElseClause", "body": body}
+	def __contains__(self, key):
+		return key in self._keyset or (key == "loc" and hasattr(self, "loc"))
 
-def WhileStatement(condition, body):
-	return {"type": "WhileStatement", "condition": condition, "body": body}
+	def __iter__(self):
+		return iter(self.keys())
 
-def DoStatement(body):
-	return {"type": "DoStatement", "body": body}
+	def __len__(self):
+		return len(self.keys())
 
-def RepeatStatement(condition, body):
-	return {"type": "RepeatStatement", "condition": condition, "body": body}
+	def get(self, key, default=None):
+		if key in self._keyset:
+			return getattr(self, key)
+		if key == "loc":
+			return getattr(self, "loc", default)
+		return default
 
-def AssignmentStatement(local, variables, init):
-	return {
-		"type": "LocalStatement" if local else "AssignmentStatement",
-		"variables": variables,
-		"init": init
-	}
+	def keys(self):
+		if hasattr(self, "loc"):
+			return ("type",) + self._fields + ("loc",)
+		return ("type",) + self._fields
 
-def CallStatement(expression):
-	return {"type": "CallStatement", "expression": expression}
+	def values(self):
+		return [self[key] for key in self.keys()]
 
-def CallExpression(base, arguments):
-	return {"type": "CallExpression", "base": base, "arguments": arguments}
+	def items(self):
+		return [(key, self[key]) for key in self.keys()]
 
-def FunctionStatement(id, params, body):
-	return {
-		"type": "FunctionDeclaration",
-		"identifier": id,
-		"isLocal": False,
-		"parameters": params,
-		"body": body
-	}
+	def __eq__(self, other):
+		if not isinstance(other, (Node, dict)):
+			return NotImplemented
+		return (
+			len(self) == len(other) and
+			all(key in other and other[key] == self[key] for key in self.keys())
+		)
 
-def ForNumericStatement(variable, start, end, step, body):
-	return {
-		"type": "ForNumericStatement",
-		"variable": variable,
-		"start": start,
-		"end": end,
-		"step": step,
-		"body": body
-	}
+	__hash__ = None
 
-def ForGenericStatement(variables, iterators, body):
-	return {
-		"type": "ForGenericStatement",
-		"variables": variables,
-		"iterators": iterators,
-		"body": body
-	}
+	def __repr__(self):
+		return "{}({})".format(
+			self.type,
+			", ".join(f"{field}={getattr(self, field)!r}" for field in self._fields)
+		)
+
+	def to_dict(self):
+		"""Returns the node as a luaparse dict, recursively."""
+		return to_dict(self)
+
+class Chunk(Node):
+	__slots__ = _fields = ("body", "comments")
+
+	def __init__(self, body, comments=None):
+		self.body = body
+		self.comments = [] if comments is None else comments
+
+class Comment(Node):
+	__slots__ = _fields = ("value", "raw")
+
+	def __init__(self, value, raw):
+		self.value = value
+		self.raw = raw
+
+class LabelStatement(Node):
+	__slots__ = _fields = ("label",)
+
+	def __init__(self, label):
+		self.label = label
+
+class GotoStatement(Node):
+	__slots__ = _fields = ("label",)
+
+	def __init__(self, label):
+		self.label = label
+
+class BreakStatement(Node):
+	__slots__ = ()
+
+class ReturnStatement(Node):
+	__slots__ = _fields = ("arguments",)
+
+	def __init__(self, arguments):
+		self.arguments = arguments
+
+class IfStatement(Node):
+	__slots__ = _fields = ("clauses",)
+
+	def __init__(self, clauses):
+		self.clauses = clauses
+
+class IfClause(Node):
+	__slots__ = _fields = ("condition", "body")
+
+	def __init__(self, condition, body):
+		self.condition = condition
+		self.body = body
+
+class ElseifClause(Node):
+	__slots__ = _fields = ("condition", "body")
+
+	def __init__(self, condition, body):
+		self.condition = condition
+		self.body = body
+
+class ElseClause(Node):
+	__slots__ = _fields = ("body",)
+
+	def __init__(self, body):
+		self.body = body
+
+class WhileStatement(Node):
+	__slots__ = _fields = ("condition", "body")
+
+	def __init__(self, condition, body):
+		self.condition = condition
+		self.body = body
+
+class DoStatement(Node):
+	__slots__ = _fields = ("body",)
+
+	def __init__(self, body):
+		self.body = body
+
+class RepeatStatement(Node):
+	__slots__ = _fields = ("condition", "body")
+
+	def __init__(self, condition, body):
+		self.condition = condition
+		self.body = body
+
+class AssignmentStatement(Node):
+	__slots__ = _fields = ("variables", "init")
+
+	def __new__(cls, local=False, variables=None, init=None):
+		if local and cls is AssignmentStatement:
+			cls = LocalStatement
+		return Node.__new__(cls)
+
+	def __init__(self, local, variables, init):
+		self.variables = variables
+		self.init = init
+
+class LocalStatement(AssignmentStatement):
+	__slots__ = ()
+
+class CallStatement(Node):
+	__slots__ = _fields = ("expression",)
+
+	def __init__(self, expression):
+		self.expression = expression
+
+class FunctionDeclaration(Node):
+	__slots__ = _fields = ("identifier", "isLocal", "parameters", "body")
+
+	def __init__(self, identifier, isLocal, parameters, body):
+		self.identifier = identifier
+		self.isLocal = isLocal
+		self.parameters = parameters
+		self.body = body
+
+class ForNumericStatement(Node):
+	__slots__ = _fields = ("variable", "start", "end", "step", "body")
+
+	def __init__(self, variable, start, end, step, body):
+		self.variable = variable
+		self.start = start
+		self.end = end
+		self.step = step
+		self.body = body
+
+class ForGenericStatement(Node):
+	__slots__ = _fields = ("variables", "iterators", "body")
+
+	def __init__(self, variables, iterators, body):
+		self.variables = variables
+		self.iterators = iterators
+		self.body = body
 
-def Identifier(name):
-	return {"type": "Identifier", "name": name}
+class Identifier(Node):
+	__slots__ = _fields = ("name",)
 
-def StringLiteral(s):
-	return {"type": "StringLiteral", "value": s, "raw": repr(s)}
+	def __init__(self, name):
+		self.name = name
 
-def NumericLiteral(n):
-	return {"type": "NumericLiteral", "value": n, "raw": str(n)}
+class StringLiteral(Node):
+	__slots__ = _fields = ("value", "raw")
 
-def BooleanLiteral(b):
-	return {"type": "BooleanLiteral", "value": b, "raw": str(b).lower()}
+	def __init__(self, value, raw=None):
+		self.value = value
+		self.raw = repr(value) if raw is None else raw
 
-def NilLiteral():
-	return {"type": "NilLiteral", "value": None, "raw": "nil"}
+class NumericLiteral(Node):
+	__slots__ = _fields = ("value", "raw")
 
-def VarargLiteral():
-	return {"type": "VarargLiteral", "value": "...", "raw": "..."}
+	def __init__(self, value, raw=None):
+		self.value = value
+		self.raw = str(value) if raw is None else raw
+
+class BooleanLiteral(Node):
+	__slots__ = _fields = ("value", "raw")
+
+	def __init__(self, value, raw=None):
+		self.value = value
+		self.raw = str(value).lower() if raw is None else raw
+
+class NilLiteral(Node):
+	__slots__ = _fields = ("value", "raw")
+
+	def __init__(self):
+		self.value = None
+		self.raw = "nil"
+
+class VarargLiteral(Node):
+	__slots__ = _fields = ("value", "raw")
+
+	def __init__(self):
+		self.value = "..."
+		self.raw = "..."
+
+class TableKey(Node):
+	__slots__ = _fields = ("key", "value")
+
+	def __init__(self, key, value):
+		self.key = key
+		self.value = value
+
+class TableKeyString(Node):
+	__slots__ = _fields = ("key", "value")
+
+	def __init__(self, key, value):
+		self.key = key
+		self.value = value
+
+class TableValue(Node):
+	__slots__ = _fields = ("value",)
+
+	def __init__(self, value):
+		self.value = value
+
+class TableConstructorExpression(Node):
+	__slots__ = _fields = ("fields",)
+
+	def __init__(self, fields):
+		self.fields = fields
+
+class LogicalExpression(Node):
+	__slots__ = _fields = ("operator", "left", "right")
+
+	def __init__(self, operator, left, right):
+		self.operator = operator
+		self.left = left
+		self.right = right
+
+class BinaryExpression(Node):
+	__slots__ = _fields = ("operator", "left", "right")
+
+	def __init__(self, operator, left, right):
+		self.operator = operator
+		self.left = left
+		self.right = right
+
+class UnaryExpression(Node):
+	__slots__ = _fields = ("operator", "argument")
+
+	def __init__(self, operator, argument):
+		self.operator = operator
+		self.argument = argument
+
+class MemberExpression(Node):
+	__slots__ = _fields = ("indexer", "identifier", "base")
+
+	def __init__(self, base, indexer, identifier):
+		self.base = base
+		self.indexer = indexer
+		self.identifier = identifier
+
+class IndexExpression(Node):
+	__slots__ = _fields = ("base", "index")
+
+	def __init__(self, base, index):
+		self.base = base
+		self.index = index
+
+class CallExpression(Node):
+	__slots__ = _fields = ("base", "arguments")
+
+	def __init__(self, base, arguments):
+		self.base = base
+		self.arguments = arguments
+
+class TableCallExpression(Node):
+	__slots__ = _fields = ("base", "arguments")
+
+	def __init__(self, base, arguments):
+		self.base = base
+		self.arguments = arguments
+
+class StringCallExpression(Node):
+	__slots__ = _fields = ("base", "argument")
+
+	def __init__(self, base, argument):
+		self.base = base
+		self.argument = argument
+
+node_classes = {
+	cls.type: cls
+	for cls in (
+		Chunk, Comment, LabelStatement, GotoStatement, BreakStatement,
+		ReturnStatement, IfStatement, IfClause, ElseifClause, ElseClause,
+		WhileStatement, DoStatement, RepeatStatement, AssignmentStatement,
+		LocalStatement, CallStatement, FunctionDeclaration,
+		ForNumericStatement, ForGenericStatement, Identifier, StringLiteral,
+		NumericLiteral, BooleanLiteral, NilLiteral, VarargLiteral, TableKey,
+		TableKeyString, TableValue, TableConstructorExpression,
+		LogicalExpression, BinaryExpression, UnaryExpression,
+		MemberExpression, IndexExpression, CallExpression,
+		TableCallExpression, StringCallExpression
+	)
+}
+
+def FunctionStatement(id, params, body):
+	return FunctionDeclaration(id, False, params, body)
 
 def Literal(value):
 	if isinstance(value, str):
@@ -97,66 +365,52 @@ def Literal(value):
 		return NilLiteral()
 	return VarargLiteral()
 
-def TableKey(key, value):
-	return {
-		"type": "TableKey",
-		"key": key,
-		"value": value
-	}
-
-def TableKeyString(key, value):
-	return {
-		"type": "TableKeyString",
-		"key": key,
-		"value": value
-	}
-
-def TableValue(value):
-	return {
-		"type": "TableValue",
-		"value": value
-	}
+def from_dict(data):
+	"""Converts a luaparse dict tree into nodes, recursively. Dicts that
+	do not match a node class (unknown type or extra keys) are kept."""
+	if isinstance(data, list):
+		return [from_dict(item) for item in data]
+	if not isinstance(data, dict):
+		return data
 
-def TableConstructorExpression(fields):
-	return {
-		"type": "TableConstructorExpression",
-		"fields": fields
-	}
+	cls = node_classes.get(data.get("type"))
+	keys = data.keys()
+	location = data.get("loc")
+	if location is not None:
+		keys = keys - {"loc"}
+	if cls is None or keys != cls._keyset:
+		return {key: from_dict(value) for key, value in data.items()}
 
-def LogicalExpression(operator, left, right):
-	return {
-		"type": "LogicalExpression",
-		"operator": operator,
-		"left": left,
-		"right": right
-	}
+	node = object.__new__(cls)
+	for field in cls._fields:
+		setattr(node, field, from_dict(data[field]))
+	if location is not None:
+		node.loc = location
+	return node
 
-def BinaryExpression(operator, left, right):
-	return {
-		"type": "BinaryExpression",
-		"operator": operator,
-		"left": left,
-		"right": right
-	}
-
-def UnaryExpression(operator, argument):
-	return {
-		"type": "UnaryExpression",
-		"operator": operator,
-		"argument": argument
-	}
+def line(node):
+	"""Returns the line a node, or a dict of a luaparse tree, starts at,
+	or None if it has no location."""
+	location = node.get("loc")
+	if location is None:
+		return None
+	return location["start"]["line"]
 
-def MemberExpression(base, indexer, identifier):
-	return {
-		"type": "MemberExpression",
-		"indexer": indexer,
-		"identifier": identifier,
-		"base": base
+def locate(node, start, end=None):
+	"""Gives a node the location of the lines `start` to `end`, returns
+	the node."""
+	node["loc"] = {
+		"start": {"line": start, "column": 0},
+		"end": {"line": start if end is None else end, "column": 0}
 	}
+	return node
 
-def IndexExpression(base, index):
-	return {
-		"type": "IndexExpression",
-		"base": base,
-		"index": index
-	}
\ No newline at end of file
+def to_dict(data):
+	"""Converts a node tree into luaparse dicts, recursively."""
+	if isinstance(data, list):
+		return [to_dict(item) for item in data]
+	if isinstance(data, Node):
+		return {key: to_dict(data[key]) for key in data.keys()}
+	if isinstance(data, dict):
+		return {key: to_dict(value) for key, value in data.items()}
+	return data
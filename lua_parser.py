@@ -0,0 +1,874 @@
+from bisect import bisect_left
+import re
+
+# Bumped whenever the produced abstract syntax tree changes.
+VERSION = "1"
+
+NAME, SYMBOL, STRING, NUMBER, EOF = range(5)
+
+features = {
+	"5.1": frozenset(),
+	"5.2": frozenset((
+		"labels", "hexEscapes", "skipWhitespaceEscape"
+	)),
+	"5.3": frozenset((
+		"labels", "hexEscapes", "skipWhitespaceEscape",
+		"unicodeEscapes", "bitwiseOperators", "integerDivision"
+	)),
+	"5.4": frozenset((
+		"labels", "hexEscapes", "skipWhitespaceEscape",
+		"unicodeEscapes", "bitwiseOperators", "integerDivision",
+		"attributes"
+	)),
+	"LuaJIT": frozenset((
+		"labels", "hexEscapes", "skipWhitespaceEscape", "unicodeEscapes"
+	))
+}
+
+keywords = frozenset((
+	"and", "break", "do", "else", "elseif", "end", "false", "for",
+	"function", "if", "in", "local", "nil", "not", "or", "repeat",
+	"return", "then", "true", "until", "while"
+))
+block_end = frozenset(("end", "else", "elseif", "until"))
+binary_precedence = {
+	"or": 1, "and": 2,
+	"<": 3, ">": 3, "<=": 3, ">=": 3, "~=": 3, "==": 3,
+	"|": 4, "~": 5, "&": 6, "<<": 7, ">>": 7,
+	"..": 8, "+": 9, "-": 9,
+	"*": 10, "/": 10, "//": 10, "%": 10,
+	"^": 12
+}
+bitwise_operators = frozenset(("|", "~", "&", "<<", ">>"))
+unary_operators = frozenset(("not", "-", "#", "~"))
+unary_precedence = 11
+digits = frozenset("0123456789")
+call_types = frozenset((
+	"CallExpression", "TableCallExpression", "StringCallExpression"
+))
+assignable_types = frozenset((
+	"Identifier", "MemberExpression", "IndexExpression"
+))
+# Symbols following a prefix expression to index or call it.
+suffix_symbols = frozenset((".", "[", ":", "(", "{"))
+
+gated_symbols = frozenset(("//", "<<", ">>", "::"))
+bitwise_symbols = frozenset(("&", "|", "~"))
+number_tail = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_0123456789.")
+
+escapes = {
+	"a": "\a", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t",
+	"v": "\v", "\\": "\\", "\"": "\"", "'": "'", "\n": "\n", "\r": "\n"
+}
+
+whitespace_re = re.compile(r"[ \t\r\n\f\v]*")
+token_re = re.compile(
+	r"[ \t\r\n\f\v]*(?:"
+	r"([A-Za-z_][A-Za-z0-9_]*)|"
+	r"(0[xX](?:[0-9a-fA-F]+(?:\.[0-9a-fA-F]*)?|\.[0-9a-fA-F]+)(?:[pP][+-]?[0-9]+)?|"
+	r"(?:[0-9]+(?:\.[0-9]*)?|\.[0-9]+)(?:[eE][+-]?[0-9]+)?)|"
+	r"(--|[\"']|\[=*\[)|"
+	r"(\.\.\.|\.\.|==|~=|<=|>=|::|//|<<|>>|[-+*/%^#&~|<>=(){}\[\];:,.])"
+	r")?"
+)
+long_open_re = re.compile(r"\[(=*)\[")
+short_string_re = {
+	"\"": re.compile(r"[^\"\\\n\r]*"),
+	"'": re.compile(r"[^'\\\n\r]*")
+}
+decimal_escape_re = re.compile(r"[0-9]{1,3}")
+hex_escape_re = re.compile(r"[0-9a-fA-F]{2}")
+unicode_escape_re = re.compile(r"\{([0-9a-fA-F]+)\}")
+
+def number_value(raw):
+	"""Returns the value of a numeric literal the way luaparse
+	serializes it (integral values are integers)."""
+	if raw[:2] in ("0x", "0X"):
+		mantissa, _, exponent = raw[2:].lower().partition("p")
+		whole, _, fraction = mantissa.partition(".")
+		value = float(int(whole or "0", 16))
+		if fraction:
+			value += int(fraction, 16) / (16 ** len(fraction))
+		if exponent:
+			value *= 2.0 ** int(exponent)
+	else:
+		value = float(raw)
+
+	if value.is_integer() and abs(value) < 1e21:
+		return int(value)
+	return value
+
+class Lexer:
+	def __init__(self, code, version="5.1"):
+		if version not in features:
+			raise ValueError(f"Lua version '{version}' is not supported.")
+
+		self.code = code
+		self.features = features[version]
+		self.keywords = keywords | {"goto"} if "labels" in self.features else keywords
+		self.comments = []
+
+	def error(self, position, message):
+		line = self.code.count("\n", 0, position) + 1
+		column = position - (self.code.rfind("\n", 0, position) + 1)
+		raise SyntaxError(f"[{line}:{column}] {message}")
+
+	def tokenize(self, position=0, stop=None):
+		"""Returns a list of (kind, value, start, end) tuples, from a token
+		starting at `position`. With `stop`, tokenizing ends at the first
+		token or comment starting at or past it, and the EOF token is at
+		its start."""
+		code = self.code
+		length = len(code)
+		if stop is None or stop > length:
+			stop = length
+		tokens = []
+		append = tokens.append
+		kw = self.keywords
+		bitwise = "bitwiseOperators" in self.features
+		division = "integerDivision" in self.features
+		labels = "labels" in self.features
+
+		if position == 0 and code.startswith("#"): # Shebang
+			position = code.find("\n")
+			if position == -1:
+				position = length
+
+		match = token_re.match
+		while True:
+			token = match(code, position)
+			kind = token.lastindex
+			start = token.start(kind) if kind else token.end()
+			if start >= stop:
+				break
+
+			if kind == 1: # Name
+				end = token.end()
+				word = token.group(1)
+				append((SYMBOL if word in kw else NAME, word, start, end))
+
+			elif kind == 2: # Number
+				end = token.end()
+				if end < length and code[end] in number_tail:
+					self.error(
+						start,
+						f"malformed number near '{code[start:end + 1]}'"
+					)
+				append((NUMBER, token.group(2), start, end))
+
+			elif kind == 4: # Punctuator
+				symbol = token.group(4)
+				if symbol in gated_symbols and (
+					((symbol == "//") and not division) or
+					((symbol == "<<" or symbol == ">>") and not bitwise) or
+					(symbol == "::" and not labels)
+				):
+					symbol = symbol[0]
+				if symbol in bitwise_symbols and not bitwise:
+					self.error(start, f"unexpected symbol '{symbol}'")
+
+				end = start + len(symbol)
+				append((SYMBOL, symbol, start, end))
+
+			elif kind == 3: # Strings and comments
+				char = code[start]
+				if char == "-":
+					position = self.read_comment(start)
+					continue
+
+				if char == "[":
+					value, end = self.read_long_string(start)
+				else:
+					value, end = self.read_string(start, char)
+				append((STRING, value, start, end))
+
+			else:
+				self.error(start, f"unexpected symbol '{code[start]}'")
+
+			position = end
+
+		start = min(start, length)
+		append((EOF, "<eof>", start, start))
+		return tokens
+
+	def read_long_string(self, position):
+		code = self.code
+		level = long_open_re.match(code, position).group(1)
+		start = position + len(level) + 2
+		end = code.find("]" + level + "]", start)
+		if end == -1:
+			self.error(position, "unfinished long string")
+
+		value = code[start:end]
+		if value.startswith("\r\n") or value.startswith("\n\r"):
+			value = value[2:]
+		elif value.startswith("\n") or value.startswith("\r"):
+			value = value[1:]
+		return value, end + len(level) + 2
+
+	def read_comment(self, position):
+		code = self.code
+		start = position + 2
+
+		if long_open_re.match(code, start):
+			value, end = self.read_long_string(start)
+		else:
+			end = code.find("\n", start)
+			if end == -1:
+				end = len(code)
+			value = code[start:end]
+
+		self.comments.append({
+			"type": "Comment",
+			"value": value,
+			"raw": code[position:end]
+		})
+		return end
+
+	def read_string(self, position, quote):
+		code = self.code
+		pattern = short_string_re[quote]
+		pieces = []
+		index = position + 1
+
+		while True:
+			end = pattern.match(code, index).end()
+			pieces.append(code[index:end])
+			if end >= len(code) or code[end] in "\n\r":
+				self.error(position, f"unfinished string near '{code[position:end]}'")
+
+			if code[end] == quote:
+				return "".join(pieces), end + 1
+
+			# Escape sequence
+			index = end + 1
+			char = code[index:index + 1]
+
+			if char in escapes:
+				pieces.append(escapes[char])
+				index += 1
+				if char == "\r" and code[index:index + 1] == "\n":
+					index += 1
+
+			elif char in digits:
+				match = decimal_escape_re.match(code, index)
+				number = int(match.group())
+				if number > 255:
+					self.error(end, "decimal escape too large")
+				pieces.append(chr(number))
+				index = match.end()
+
+			elif char == "x" and "hexEscapes" in self.features:
+				match = hex_escape_re.match(code, index + 1)
+				if match is None:
+					self.error(end, "hexadecimal digit expected")
+				pieces.append(chr(int(match.group(), 16)))
+				index = match.end()
+
+			elif char == "z" and "skipWhitespaceEscape" in self.features:
+				index = whitespace_re.match(code, index + 1).end()
+
+			elif char == "u" and "unicodeEscapes" in self.features:
+				match = unicode_escape_re.match(code, index + 1)
+				if match is None:
+					self.error(end, "invalid UTF-8 escape sequence")
+				pieces.append(chr(int(match.group(1), 16)))
+				index = match.end()
+
+			else:
+				# Lua 5.1 keeps unknown escaped characters as is.
+				pieces.append(char)
+				index += 1
+
+class Parser:
+	"""Lua parser emitting the same abstract syntax tree as luaparse.
+	`progress`, if given, is called once the code is tokenized and then
+	every `progress_interval` statements of a block, and may raise to
+	abort the parse.
+
+	With `locations`, statements and functions get a "loc" key like
+	the nodes of luaparse's locations option (lines start at 1, columns
+	at 0); the other nodes don't."""
+	progress_interval = 256
+
+	def __init__(self, code, version="5.1", progress=None, locations=False):
+		if isinstance(code, bytes):
+			code = code.decode()
+		version = str(version)
+
+		self.lexer = Lexer(code, version)
+		self.features = self.lexer.features
+		self.tokens = self.lexer.tokenize()
+		self.index = 0
+		self.token = self.tokens[0]
+		self.progress = progress
+		self.locations = locations
+		self.newlines = None # Offsets of the line ends, once needed
+		self.parenthesized = False # See parse_prefix_expression
+		if progress is not None:
+			progress()
+
+	# Token helpers
+
+	def next(self):
+		self.index += 1
+		self.token = self.tokens[self.index]
+
+	def peek(self):
+		return self.tokens[self.index + 1]
+
+	def check(self, symbol):
+		return self.token[0] == SYMBOL and self.token[1] == symbol
+
+	def consume(self, symbol):
+		if self.token[0] == SYMBOL and self.token[1] == symbol:
+			self.next()
+			return True
+		return False
+
+	def expect(self, symbol):
+		if not self.consume(symbol):
+			self.error(f"'{symbol}' expected near '{self.raw()}'")
+
+	def raw(self, token=None):
+		token = token or self.token
+		return self.lexer.code[token[2]:token[3]] or token[1]
+
+	def error(self, message):
+		self.lexer.error(self.token[2], message)
+
+	def position(self, offset):
+		if self.newlines is None:
+			self.newlines = [match.start() for match in re.finditer("\n", self.lexer.code)]
+		line = bisect_left(self.newlines, offset)
+		column = offset - (self.newlines[line - 1] + 1 if line else 0)
+		return {"line": line + 1, "column": column}
+
+	def locate(self, node, start):
+		"""Gives a node the location from the offset `start` to the end
+		of the last token."""
+		node["loc"] = {
+			"start": self.position(start),
+			"end": self.position(self.tokens[self.index - 1][3])
+		}
+		return node
+
+	def unexpected(self):
+		self.error(f"unexpected symbol near '{self.raw()}'")
+
+	def identifier(self):
+		if self.token[0] != NAME:
+			self.error(f"<name> expected near '{self.raw()}'")
+		name = self.token[1]
+		self.next()
+		return {"type": "Identifier", "name": name}
+
+	def block_follows(self):
+		kind, value = self.token[0], self.token[1]
+		return kind == EOF or (kind == SYMBOL and value in block_end)
+
+	# Statements
+
+	def parse_chunk(self):
+		body = self.parse_block()
+		if self.token[0] != EOF:
+			self.error(f"'<eof>' expected near '{self.raw()}'")
+		return {"type": "Chunk", "body": body, "comments": self.lexer.comments}
+
+	def parse_block(self):
+		body = []
+
+		while not self.block_follows():
+			start = self.token[2]
+			if self.check("return"):
+				statement = self.parse_return()
+				body.append(self.locate(statement, start) if self.locations else statement)
+				break
+
+			statement = self.parse_statement()
+			if statement is not None:
+				if self.locations:
+					self.locate(statement, start)
+				body.append(statement)
+				if self.progress is not None and len(body) % self.progress_interval == 0:
+					self.progress()
+
+		return body
+
+	def parse_statement(self):
+		kind, value = self.token[0], self.token[1]
+
+		if kind == SYMBOL:
+			parser = self.statements.get(value)
+			if parser is not None:
+				self.next()
+				return parser(self)
+
+		return self.parse_assignment_or_call()
+
+	def parse_empty(self):
+		return None
+
+	def parse_label(self):
+		label = self.identifier()
+		self.expect("::")
+		return {"type": "LabelStatement", "label": label}
+
+	def parse_goto(self):
+		return {"type": "GotoStatement", "label": self.identifier()}
+
+	def parse_break(self):
+		return {"type": "BreakStatement"}
+
+	def parse_return(self):
+		self.next()
+		arguments = []
+
+		if not self.block_follows() and not self.check(";"):
+			arguments = self.parse_expression_list()
+		self.consume(";")
+
+		if not self.block_follows():
+			self.error(f"'<eof>' expected near '{self.raw()}'")
+		return {"type": "ReturnStatement", "arguments": arguments}
+
+	def parse_if(self):
+		condition = self.parse_expression()
+		self.expect("then")
+		clauses = [{
+			"type": "IfClause",
+			"condition": condition,
+			"body": self.parse_block()
+		}]
+
+		while self.consume("elseif"):
+			condition = self.parse_expression()
+			self.expect("then")
+			clauses.append({
+				"type": "ElseifClause",
+				"condition": condition,
+				"body": self.parse_block()
+			})
+
+		if self.consume("else"):
+			clauses.append({"type": "ElseClause", "body": self.parse_block()})
+
+		self.expect("end")
+		return {"type": "IfStatement", "clauses": clauses}
+
+	def parse_while(self):
+		condition = self.parse_expression()
+		self.expect("do")
+		body = self.parse_block()
+		self.expect("end")
+		return {"type": "WhileStatement", "condition": condition, "body": body}
+
+	def parse_do(self):
+		body = self.parse_block()
+		self.expect("end")
+		return {"type": "DoStatement", "body": body}
+
+	def parse_repeat(self):
+		body = self.parse_block()
+		self.expect("until")
+		condition = self.parse_expression()
+		return {"type": "RepeatStatement", "condition": condition, "body": body}
+
+	def parse_for(self):
+		variable = self.identifier()
+
+		if self.consume("="):
+			start = self.parse_expression()
+			self.expect(",")
+			end = self.parse_expression()
+			step = self.parse_expression() if self.consume(",") else None
+			self.expect("do")
+			body = self.parse_block()
+			self.expect("end")
+
+			return {
+				"type": "ForNumericStatement",
+				"variable": variable,
+				"start": start,
+				"end": end,
+				"step": step,
+				"body": body
+			}
+
+		variables = [variable]
+		while self.consume(","):
+			variables.append(self.identifier())
+		self.expect("in")
+		iterators = self.parse_expression_list()
+		self.expect("do")
+		body = self.parse_block()
+		self.expect("end")
+
+		return {
+			"type": "ForGenericStatement",
+			"variables": variables,
+			"iterators": iterators,
+			"body": body
+		}
+
+	def parse_local(self):
+		if self.consume("function"):
+			return self.parse_function_body(self.identifier(), True)
+
+		variables, attributes = [], []
+		while True:
+			variables.append(self.identifier())
+
+			if "attributes" in self.features and self.consume("<"):
+				attributes.append(self.identifier()["name"])
+				self.expect(">")
+			else:
+				attributes.append(None)
+
+			if not self.consume(","):
+				break
+
+		init = self.parse_expression_list() if self.consume("=") else []
+		node = {"type": "LocalStatement", "variables": variables, "init": init}
+		if any(attributes):
+			node["attributes"] = attributes
+		return node
+
+	def parse_function(self):
+		identifier = self.identifier()
+
+		while self.check(".") or self.check(":"):
+			indexer = self.token[1]
+			self.next()
+			identifier = {
+				"type": "MemberExpression",
+				"indexer": indexer,
+				"identifier": self.identifier(),
+				"base": identifier
+			}
+			if indexer == ":":
+				break
+
+		return self.parse_function_body(identifier, False)
+
+	def parse_function_body(self, identifier, is_local):
+		self.expect("(")
+		parameters = []
+
+		if not self.check(")"):
+			while True:
+				if self.consume("..."):
+					parameters.append({
+						"type": "VarargLiteral", "value": "...", "raw": "..."
+					})
+					break
+
+				parameters.append(self.identifier())
+				if not self.consume(","):
+					break
+
+		self.expect(")")
+		body = self.parse_block()
+		self.expect("end")
+
+		return {
+			"type": "FunctionDeclaration",
+			"identifier": identifier,
+			"isLocal": is_local,
+			"parameters": parameters,
+			"body": body
+		}
+
+	def parse_assignment_or_call(self):
+		expression = self.parse_prefix_expression()
+		if expression is None:
+			self.unexpected()
+
+		if expression["type"] in call_types and not (
+			self.check(",") or self.check("=") or self.parenthesized
+		):
+			return {"type": "CallStatement", "expression": expression}
+
+		variables = [expression]
+		while True:
+			# (a) = 1 and (f()) aren't statements, (a).b = 1 is.
+			if variables[-1]["type"] not in assignable_types or self.parenthesized:
+				self.error(f"syntax error near '{self.raw()}'")
+			if not self.consume(","):
+				break
+
+			expression = self.parse_prefix_expression()
+			if expression is None:
+				self.unexpected()
+			variables.append(expression)
+
+		self.expect("=")
+		return {
+			"type": "AssignmentStatement",
+			"variables": variables,
+			"init": self.parse_expression_list()
+		}
+
+	statements = {
+		"local": parse_local,
+		"if": parse_if,
+		"function": parse_function,
+		"while": parse_while,
+		"for": parse_for,
+		"repeat": parse_repeat,
+		"break": parse_break,
+		"do": parse_do,
+		"goto": parse_goto,
+		"::": parse_label,
+		";": parse_empty
+	}
+
+	# Expressions
+
+	def parse_expression_list(self):
+		expressions = [self.parse_expression()]
+		while self.consume(","):
+			expressions.append(self.parse_expression())
+		return expressions
+
+	def binary_operator(self):
+		if self.token[0] != SYMBOL:
+			return None
+
+		operator = self.token[1]
+		if operator not in binary_precedence:
+			return None
+		if (operator in bitwise_operators and
+			"bitwiseOperators" not in self.features):
+			return None
+		return operator
+
+	def parse_expression(self):
+		# Operator precedence parsing with explicit stacks, so long
+		# operator chains do not recurse.
+		operands, operators = [], []
+
+		while True:
+			while self.token[0] == SYMBOL and self.token[1] in unary_operators:
+				operators.append((unary_precedence, self.token[1], True))
+				self.next()
+
+			operand = self.parse_simple_expression()
+			if operand is None:
+				self.unexpected()
+			operands.append(operand)
+
+			operator = self.binary_operator()
+			if operator is None:
+				break
+			precedence = binary_precedence[operator]
+			right = operator == "^" or operator == ".."
+
+			while operators:
+				top = operators[-1][0]
+				if top > precedence or (top == precedence and not right):
+					self.reduce(operands, operators)
+				else:
+					break
+
+			operators.append((precedence, operator, False))
+			self.next()
+
+		while operators:
+			self.reduce(operands, operators)
+		return operands[0]
+
+	def reduce(self, operands, operators):
+		_, operator, unary = operators.pop()
+
+		if unary:
+			operands.append({
+				"type": "UnaryExpression",
+				"operator": operator,
+				"argument": operands.pop()
+			})
+			return
+
+		right = operands.pop()
+		operands.append({
+			"type": "LogicalExpression"
+			if operator == "and" or operator == "or" else
+			"BinaryExpression",
+			"operator": operator,
+			"left": operands.pop(),
+			"right": right
+		})
+
+	def parse_simple_expression(self):
+		kind, value = self.token[0], self.token[1]
+
+		if kind == NUMBER:
+			self.next()
+			return {
+				"type": "NumericLiteral",
+				"value": number_value(value),
+				"raw": value
+			}
+
+		if kind == STRING:
+			raw = self.raw()
+			self.next()
+			return {"type": "StringLiteral", "value": value, "raw": raw}
+
+		if kind == SYMBOL:
+			if value == "nil":
+				self.next()
+				return {"type": "NilLiteral", "value": None, "raw": "nil"}
+			if value == "true" or value == "false":
+				self.next()
+				return {
+					"type": "BooleanLiteral",
+					"value": value == "true",
+					"raw": value
+				}
+			if value == "...":
+				self.next()
+				return {"type": "VarargLiteral", "value": "...", "raw": "..."}
+			if value == "function":
+				start = self.token[2]
+				self.next()
+				function = self.parse_function_body(None, False)
+				return self.locate(function, start) if self.locations else function
+			if value == "{":
+				return self.parse_table()
+
+		return self.parse_prefix_expression()
+
+	def parse_table(self):
+		self.expect("{")
+		fields = []
+
+		while not self.check("}"):
+			if self.consume("["):
+				key = self.parse_expression()
+				self.expect("]")
+				self.expect("=")
+				fields.append({
+					"type": "TableKey",
+					"key": key,
+					"value": self.parse_expression()
+				})
+
+			elif (self.token[0] == NAME and self.peek()[0] == SYMBOL and
+				  self.peek()[1] == "="):
+				key = self.identifier()
+				self.next()
+				fields.append({
+					"type": "TableKeyString",
+					"key": key,
+					"value": self.parse_expression()
+				})
+
+			else:
+				fields.append({
+					"type": "TableValue",
+					"value": self.parse_expression()
+				})
+
+			if not (self.consume(",") or self.consume(";")):
+				break
+
+		self.expect("}")
+		return {"type": "TableConstructorExpression", "fields": fields}
+
+	def parse_prefix_expression(self):
+		# The tree drops the parentheses, self.parenthesized tells whether
+		# the expression returned is in parentheses.
+		kind, value = self.token[0], self.token[1]
+		parenthesized = False
+
+		if kind == NAME:
+			self.next()
+			base = {"type": "Identifier", "name": value}
+		elif kind == SYMBOL and value == "(":
+			self.next()
+			base = self.parse_expression()
+			self.expect(")")
+			parenthesized = True
+		else:
+			return None
+
+		while True:
+			kind, value = self.token[0], self.token[1]
+
+			if kind == STRING:
+				parenthesized = False
+				base = {
+					"type": "StringCallExpression",
+					"base": base,
+					"argument": self.parse_simple_expression()
+				}
+				continue
+
+			if kind != SYMBOL or value not in suffix_symbols:
+				self.parenthesized = parenthesized
+				return base
+			parenthesized = False
+
+			if value == ".":
+				self.next()
+				base = {
+					"type": "MemberExpression",
+					"indexer": ".",
+					"identifier": self.identifier(),
+					"base": base
+				}
+
+			elif value == "[":
+				self.next()
+				index = self.parse_expression()
+				self.expect("]")
+				base = {"type": "IndexExpression", "base": base, "index": index}
+
+			elif value == ":":
+				self.next()
+				base = {
+					"type": "MemberExpression",
+					"indexer": ":",
+					"identifier": self.identifier(),
+					"base": base
+				}
+				base = self.parse_call(base)
+				if base is None:
+					self.error(f"function arguments expected near '{self.raw()}'")
+
+			else: # ( or {
+				base = self.parse_call(base)
+
+	def parse_call(self, base):
+		kind, value = self.token[0], self.token[1]
+
+		if kind == STRING:
+			return {
+				"type": "StringCallExpression",
+				"base": base,
+				"argument": self.parse_simple_expression()
+			}
+
+		if kind != SYMBOL:
+			return None
+
+		if value == "{":
+			return {
+				"type": "TableCallExpression",
+				"base": base,
+				"arguments": self.parse_table()
+			}
+
+		if value == "(":
+			self.next()
+			arguments = [] if self.check(")") else self.parse_expression_list()
+			self.expect(")")
+			return {"type": "CallExpression", "base": base, "arguments": arguments}
+
+		return None
+
+def parse(lua_code, version="5.1", progress=None, locations=False):
+	"""Returns the lua abstract syntax tree of a given code,
+	in the same format as luaparse (see Parser for `locations`)."""
+	return Parser(lua_code, version, progress, locations).parse_chunk()
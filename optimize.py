@@ -0,0 +1,262 @@
+"""Optimization passes over the python trees LuaParser generates.
+
+Every pass is an ast.NodeTransformer, run in order by optimize_py_ast;
+`levels` maps the -O levels to their passes and can be given other
+ones. The passes keep the behaviour of the generated python code:
+
+	1: FoldConstants, RemoveDeadCode (constant branches, do blocks,
+	   code after return/break), SimplifyRange (step of numeric fors)
+	2: InlineConcat (LUA_CONCAT(x, y) calls) before the passes of
+	   level 1, SplitAssignments (tuple packing of multiple
+	   assignments) after folding
+
+From level 1, transpile also folds the lua trees (see fold_lua_ast)
+before they are converted, and from level 2 hoists the globals the lua
+code it generates reads often into locals (see hoist_lua_globals).
+
+Like astor, the passes are recursive, so they are limited by the
+python recursion limit."""
+import operator
+import ast
+
+from .profiling import phase
+
+binary_operators = {
+	ast.Add: operator.add, ast.Sub: operator.sub,
+	ast.Mult: operator.mul, ast.Div: operator.truediv,
+	ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod,
+	ast.Pow: operator.pow, ast.LShift: operator.lshift,
+	ast.RShift: operator.rshift, ast.BitOr: operator.or_,
+	ast.BitXor: operator.xor, ast.BitAnd: operator.and_
+}
+unary_operators = {
+	ast.USub: operator.neg, ast.UAdd: operator.pos,
+	ast.Invert: operator.invert, ast.Not: operator.not_
+}
+compare_operators = {
+	ast.Eq: operator.eq, ast.NotEq: operator.ne,
+	ast.Lt: operator.lt, ast.LtE: operator.le,
+	ast.Gt: operator.gt, ast.GtE: operator.ge
+}
+# Statements the code following them in a block never runs after.
+terminators = (ast.Return, ast.Break, ast.Continue, ast.Raise)
+
+max_folded_length = 4096 # Of folded strings
+max_folded_bits = 64 # Of folded integers
+
+def is_constant(node, types=None):
+	if not isinstance(node, ast.Constant):
+		return False
+	# bool is an int, but True + 1 is better left alone.
+	return types is None or (node.value.__class__ in types)
+
+def fill(statements):
+	"""Returns a block, with a pass if it is empty."""
+	return statements or [ast.Pass()]
+
+class FoldConstants(ast.NodeTransformer):
+	"""Evaluates the operations of number and string constants, the
+	comparisons of constants and the and/or/not of them."""
+
+	def fold(self, node, function, *values):
+		try:
+			value = function(*values)
+		except (ArithmeticError, ValueError, TypeError):
+			return node
+
+		if value.__class__ is int and value.bit_length() > max_folded_bits:
+			return node
+		if value.__class__ is str and len(value) > max_folded_length:
+			return node
+		return ast.copy_location(ast.Constant(value), node)
+
+	def visit_BinOp(self, node):
+		self.generic_visit(node)
+		function = binary_operators.get(node.op.__class__)
+		if function is None:
+			return node
+
+		if is_constant(node.left, (int, float)) and is_constant(node.right, (int, float)):
+			left, right = node.left.value, node.right.value
+			if isinstance(node.op, ast.Pow) and right.__class__ is int and abs(right) > max_folded_bits:
+				return node
+			if isinstance(node.op, ast.LShift) and right > max_folded_bits:
+				return node
+			return self.fold(node, function, left, right)
+
+		if (isinstance(node.op, ast.Add) and
+			is_constant(node.left, (str,)) and is_constant(node.right, (str,))):
+			return self.fold(node, function, node.left.value, node.right.value)
+		return node
+
+	def visit_UnaryOp(self, node):
+		self.generic_visit(node)
+		if isinstance(node.op, ast.Not) and is_constant(node.operand):
+			return ast.copy_location(ast.Constant(not node.operand.value), node)
+		if is_constant(node.operand, (int, float)):
+			return self.fold(node, unary_operators[node.op.__class__], node.operand.value)
+		return node
+
+	def visit_Compare(self, node):
+		self.generic_visit(node)
+		if (len(node.ops) != 1 or node.ops[0].__class__ not in compare_operators or
+			not is_constant(node.left) or not is_constant(node.comparators[0])):
+			return node
+
+		left, right = node.left.value, node.comparators[0].value
+		numbers = (int, float)
+		if not (left.__class__ is right.__class__ or (
+			left.__class__ in numbers and right.__class__ in numbers
+		)):
+			return node
+		return self.fold(node, compare_operators[node.ops[0].__class__], left, right)
+
+	def visit_BoolOp(self, node):
+		self.generic_visit(node)
+		values = list(node.values)
+		# Leading constants decide or are skipped: 1 and x is x, 0 and x is 0.
+		while len(values) > 1 and is_constant(values[0]):
+			if bool(values[0].value) == isinstance(node.op, ast.Or):
+				return values[0]
+			values.pop(0)
+
+		if len(values) == 1:
+			return values[0]
+		node.values = values
+		return node
+
+class RemoveDeadCode(ast.NodeTransformer):
+	"""Replaces the ifs with a constant test (the do blocks) by their
+	taken branch, removes the while loops never entered and the
+	statements following a return, break, continue or raise."""
+
+	def block(self, statements):
+		new = []
+		for statement in statements:
+			result = self.visit(statement)
+			if result is None:
+				continue
+			if isinstance(result, list):
+				new.extend(result)
+			else:
+				new.append(result)
+
+			if isinstance(new[-1] if new else None, terminators):
+				break
+		return new
+
+	def generic_visit(self, node):
+		for name, value in ast.iter_fields(node):
+			if isinstance(value, list) and value and isinstance(value[0], ast.stmt):
+				value = self.block(value)
+				# Only else blocks may be left empty.
+				setattr(node, name, value if name == "orelse" else fill(value))
+			elif isinstance(value, list):
+				setattr(node, name, [
+					self.visit(item) if isinstance(item, ast.AST) else item
+					for item in value
+				])
+			elif isinstance(value, ast.AST):
+				setattr(node, name, self.visit(value))
+		return node
+
+	def visit_Module(self, node):
+		node.body = self.block(node.body)
+		return node
+
+	def visit_If(self, node):
+		self.generic_visit(node)
+		if not is_constant(node.test):
+			return node
+
+		taken = node.body if node.test.value else node.orelse
+		# A do block can't be flattened if it holds nothing but pass.
+		return [statement for statement in taken if not isinstance(statement, ast.Pass)]
+
+	def visit_While(self, node):
+		self.generic_visit(node)
+		if is_constant(node.test) and not node.test.value:
+			return node.orelse
+		return node
+
+class SimplifyRange(ast.NodeTransformer):
+	"""Removes the step of range(start, stop, 1), which numeric fors
+	without a step get."""
+
+	def visit_Call(self, node):
+		self.generic_visit(node)
+		if (isinstance(node.func, ast.Name) and node.func.id == "range" and
+			len(node.args) == 3 and not node.keywords and
+			is_constant(node.args[2], (int,)) and node.args[2].value == 1):
+			node.args = node.args[:2]
+		return node
+
+class InlineConcat(ast.NodeTransformer):
+	"""Replaces the calls of the two argument LUA_CONCAT (x + y), which
+	LuaParser defines in its "call" concat mode, by additions."""
+
+	def visit_Module(self, node):
+		# Only with the x + y helper, the "join" one is variadic.
+		for statement in node.body:
+			if isinstance(statement, ast.FunctionDef) and statement.name == "LUA_CONCAT":
+				arguments = statement.args
+				if (len(arguments.args) == 2 and arguments.vararg is None and
+					len(statement.body) == 1 and isinstance(statement.body[0], ast.Return) and
+					isinstance(statement.body[0].value, ast.BinOp) and
+					isinstance(statement.body[0].value.op, ast.Add)):
+					return self.generic_visit(node)
+				return node
+		return node
+
+	def visit_Call(self, node):
+		self.generic_visit(node)
+		if (isinstance(node.func, ast.Name) and node.func.id == "LUA_CONCAT" and
+			len(node.args) == 2 and not node.keywords and
+			not any(isinstance(argument, ast.Starred) for argument in node.args)):
+			return ast.copy_location(ast.BinOp(node.args[0], ast.Add(), node.args[1]), node)
+		return node
+
+class SplitAssignments(ast.NodeTransformer):
+	"""Splits `a, b = x, y` into `a = x` and `b = y` when the values are
+	constants or names other than the targets, so no tuple is built."""
+
+	def visit_Assign(self, node):
+		targets, value = node.targets, node.value
+		if (len(targets) != 1 or not isinstance(targets[0], ast.Tuple) or
+			not isinstance(value, ast.Tuple) or len(targets[0].elts) != len(value.elts)):
+			return node
+		if not all(isinstance(target, ast.Name) for target in targets[0].elts):
+			return node
+
+		names = {target.id for target in targets[0].elts}
+		if len(names) != len(targets[0].elts):
+			return node
+		for element in value.elts:
+			if not (is_constant(element) or (
+				isinstance(element, ast.Name) and element.id not in names
+			)):
+				return node
+
+		return [
+			ast.copy_location(ast.Assign([target], element), node)
+			for target, element in zip(targets[0].elts, value.elts)
+		]
+
+levels = {
+	0: (),
+	1: (FoldConstants, RemoveDeadCode, SimplifyRange),
+	2: (InlineConcat, FoldConstants, SplitAssignments, RemoveDeadCode, SimplifyRange)
+}
+
+@phase("optimize_py_ast")
+def optimize_py_ast(py_ast, level=1, passes=None):
+	"""Runs the passes of an optimization level, or the given pass
+	classes, over a python abstract syntax tree. Returns the new tree."""
+	if passes is None:
+		if level not in levels:
+			raise ValueError(f"Unknown optimization level: {level}")
+		passes = levels[level]
+
+	for transformer in passes:
+		py_ast = transformer().visit(py_ast)
+	return py_ast
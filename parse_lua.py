@@ -1,17 +1,20 @@
 import ast
 import random
 import string
+import types
 
-python_reserved = [
+from .visitor import LuaVisitor
+
+python_reserved = frozenset((
 	"class", "finally", "is", "return",
-	"continue", "for", "lambda", "trye",
+	"continue", "for", "lambda", "try",
 	"def", "from", "nonlocal", "while",
 	"and", "del", "global", "not", "with",
 	"as", "elif", "if", "or", "yield",
 	"assert", "else", "import", "pass",
 	"break", "except", "in", "raise",
 	"async", "await"
-]
+))
 compare_operators = {
 	"==": ast.Eq, "~=": ast.NotEq,
 	"<": ast.Lt, "<=": ast.LtE,
@@ -25,6 +28,10 @@ binary_operators = {
 	"|": ast.BitOr, "^^": ast.BitXor,
 	"&": ast.BitAnd
 }
+unary_operators = {
+	"-": ast.USub, "~": ast.Invert,
+	"not": ast.Not
+}
 valid_random = string.ascii_letters + "_"
 
 def check_reserved(word):
@@ -32,12 +39,113 @@ def check_reserved(word):
 		return "_" + word
 	return word
 
+# LUA_CONCAT of the "join" concat mode, taking a whole .. chain.
+join_concat_code = """
+def LUA_CONCAT(*values):
+    try:
+        return ''.join(values)
+    except TypeError:
+        return ''.join([
+            str(value) if isinstance(value, (int, float)) else value
+            for value in values
+        ])
+"""
+
+# Names the code of the "lua" tables mode imports.
+runtime_module = __package__ + ".runtime"
+runtime_names = ("LuaTable", "ipairs", "pairs", "table")
+
+def store(target):
+	"""Gives an assignment target, and the elements of a tuple one, the
+	Store context compile() requires."""
+	target.ctx = ast.Store()
+	if isinstance(target, ast.Tuple):
+		for element in target.elts:
+			element.ctx = ast.Store()
+	return target
+
+def store_chunk_return(module):
+	"""Replaces the return ending a converted chunk, which python only
+	allows in functions, by an assignment of its values to LUA_RETURN.
+	Returns the module."""
+	if module.body and isinstance(module.body[-1], ast.Return):
+		value = module.body[-1].value
+		module.body[-1] = ast.copy_location(ast.Assign(
+			[ast.Name("LUA_RETURN", ast.Store())],
+			value if value is not None else ast.Constant(None)
+		), module.body[-1])
+	return module
+
+def locate(statement, location):
+	"""Gives a python statement the location of a lua node's "loc"."""
+	start, end = location["start"], location["end"]
+	statement.lineno = start["line"]
+	statement.col_offset = start["column"]
+	statement.end_lineno = end["line"]
+	statement.end_col_offset = end["column"]
+	return statement
+
+def lua_name(identifier):
+	"""Returns the lua name of a function's identifier (like M.f or
+	M:f), or None."""
+	if identifier["type"] == "Identifier":
+		return identifier["name"]
+	if identifier["type"] == "MemberExpression":
+		base = lua_name(identifier["base"])
+		if base is not None:
+			name = identifier["identifier"]
+			if not isinstance(name, str):
+				name = name["name"]
+			return base + identifier["indexer"] + name
+	return None
+
+def rename_functions(code, names):
+	"""Returns a code object whose functions, and the nested ones, are
+	named after `names`: {python name: lua name}, see LuaParser.names."""
+	consts = tuple(
+		rename_functions(const, names) if isinstance(const, types.CodeType) else const
+		for const in code.co_consts
+	)
+	changes = {"co_consts": consts, "co_name": names.get(code.co_name, code.co_name)}
+	if hasattr(code, "co_qualname"):
+		changes["co_qualname"] = ".".join(
+			names.get(part, part) for part in code.co_qualname.split(".")
+		)
+	return code.replace(**changes)
+
 def gen_random_text(length):
 	return "hybridpython_var_" + ("".join(random.choices(valid_random, k=length)))
 
-class LuaParser:
-	def __init__(self, py38=False):
+class LuaParser(LuaVisitor):
+	"""Converts a lua abstract syntax tree into a python one.
+
+	With `concat` set to "call", every .. is a LUA_CONCAT(x, y) call.
+	With "join", a chain of them is flattened into a single string: a
+	constant when every operand is a string or integer literal, an
+	f-string when every operand is known to be a string (literals,
+	tostring calls), and a call of a variadic LUA_CONCAT otherwise, which
+	joins the operands and turns numbers into strings like lua does.
+
+	With `tables` set to "dict", tables are dicts with the keys 1 to n.
+	With "lua", they are runtime.LuaTable objects, with an array part,
+	and the code imports LuaTable, ipairs, pairs and table from the
+	runtime module; generic fors keep their ipairs and pairs calls.
+	LuaTables take less memory and have the lengths of lua, but they are
+	indexed by python code, slower than dicts, which stay the default.
+
+	Statements of lua nodes with a "loc" key get its location, and
+	`names` maps the random names of the functions declared as fields
+	or expressions to their lua names (M.f, or <anonymous>)."""
+
+	def __init__(self, py38=False, concat="call", tables="dict"):
+		if concat not in ("call", "join"):
+			raise ValueError(f"Unknown concat mode: {concat}")
+		if tables not in ("dict", "lua"):
+			raise ValueError(f"Unknown tables mode: {tables}")
 		self.py38 = py38
+		self.concat = concat
+		self.tables = tables
+		self.names = {}
 
 	def get_obj(self, obj):
 		if self.py38:
@@ -58,58 +166,78 @@ class LuaParser:
 		if len(values) == 0:
 			return None
 		if len(values) == 1:
-			return self.visit(values[0], body)
-		return ast.Tuple([self.visit(value, body) for value in values], ast.Load())
+			return (yield values[0], body)
 
-	def visit(self, node, body):
-		parser = getattr(self, f"visit_{node['type']}", None)
-		if parser is None:
-			raise TypeError(f"Unknown Lua AST node: {node['type']}")
-
-		return parser(node, body)
+		elements = []
+		for value in values:
+			elements.append((yield value, body))
+		return ast.Tuple(elements, ast.Load())
 
 	def visit_LuaBody(self, body): # Not really a lua node.
 		new = []
 
 		for child in body:
-			obj = self.visit(child, new)
+			start = len(new)
+			obj = yield child, new
 			if obj is not None:
 				if isinstance(obj, ast.expr):
 					new.append(ast.Expr(obj))
 				else:
 					new.append(obj)
 
+			location = child.get("loc")
+			if location is not None:
+				# With the functions the statement declared before it.
+				for statement in new[start:]:
+					if getattr(statement, "lineno", None) is None:
+						locate(statement, location)
+
 		if len(new) == 0:
 			new.append(ast.Pass())
 
 		return new
 
-	def visit_Chunk(self, node, body):
-		return ast.Module([ast.FunctionDef(
-			"LUA_CONCAT",
-			ast.arguments(
-				posonlyargs=[],
-				args=[
-					ast.arg("x", None),
-					ast.arg("y", None)
-				],
-				kwonlyargs=[],
-				kw_defaults=[],
-				defaults=[],
-				kwarg=None,
-				vararg=None
-			),
-			[
-				ast.Return(
-					ast.BinOp(
-						ast.Name("x", ast.Load()),
-						ast.Add(),
-						ast.Name("y", ast.Load())
+	def prelude(self):
+		"""Returns the statements every converted chunk starts with."""
+		if self.concat == "join":
+			statements = ast.parse(join_concat_code).body
+		else:
+			statements = [ast.FunctionDef(
+				"LUA_CONCAT",
+				ast.arguments(
+					posonlyargs=[],
+					args=[
+						ast.arg("x", None),
+						ast.arg("y", None)
+					],
+					kwonlyargs=[],
+					kw_defaults=[],
+					defaults=[],
+					kwarg=None,
+					vararg=None
+				),
+				[
+					ast.Return(
+						ast.BinOp(
+							ast.Name("x", ast.Load()),
+							ast.Add(),
+							ast.Name("y", ast.Load())
+						)
 					)
-				)
-			],
-			[]
-		)] + self.visit_LuaBody(node["body"]))
+				],
+				[]
+			)]
+
+		if self.tables == "lua":
+			statements.insert(0, ast.ImportFrom(
+				runtime_module,
+				[ast.alias(name, None) for name in runtime_names],
+				0
+			))
+		return statements
+
+	def visit_Chunk(self, node, body):
+		return ast.Module(self.prelude() + (yield from self.visit_LuaBody(node["body"])), [])
 
 	# Statements
 
@@ -125,7 +253,7 @@ are not supported.")
 		return ast.Break()
 
 	def visit_ReturnStatement(self, node, body):
-		values = self.parse_values(node["arguments"], body)
+		values = yield from self.parse_values(node["arguments"], body)
 		if isinstance(values, ast.Tuple):
 			for index, value in enumerate(values.elts):
 				if isinstance(value, ast.Starred):
@@ -142,9 +270,9 @@ are not supported.")
 		return ast.Return(values)
 
 	def visit_AssignmentStatement(self, node, body):
-		targets = self.parse_values(node["variables"], body)
-		values = self.parse_values(node["init"], body)
-		targets.ctx = ast.Store()
+		targets = yield from self.parse_values(node["variables"], body)
+		values = yield from self.parse_values(node["init"], body)
+		store(targets)
 
 		len_init, len_vars = len(node["init"]), len(node["variables"])
 		if len_init != len_vars:
@@ -162,42 +290,41 @@ are not supported.")
 		return self.visit_AssignmentStatement(node, body)
 
 	def visit_IfStatement(self, node, body):
-		clause = node["clauses"].pop(0)
-
-		return ast.If(
-			self.visit(clause["condition"], body),
-			self.visit_LuaBody(clause["body"]),
-
-			# No more clauses
-			[]
-			if len(node["clauses"]) == 0 else
-
-			# Elseif clause is next
-			[self.visit_IfStatement(node, body)]
-			if node["clauses"][0]["type"] == "ElseifClause" else
-
-			# Else clause is next
-			self.visit_LuaBody(node["clauses"][0]["body"])
-		)
+		# Elseif ladders become nested ifs, built from the last clause
+		# up so long ladders don't need recursion.
+		clauses = []
+		for clause in node["clauses"]:
+			condition = None
+			if clause["type"] != "ElseClause":
+				condition = yield clause["condition"], body
+			clauses.append((condition, (yield from self.visit_LuaBody(clause["body"]))))
+
+		orelse = []
+		if clauses[-1][0] is None:
+			orelse = clauses.pop()[1]
+
+		for condition, clause_body in reversed(clauses):
+			orelse = [ast.If(condition, clause_body, orelse)]
+		return orelse[0]
 
 	def visit_WhileStatement(self, node, body):
 		return ast.While(
-			self.visit(node["condition"], body),
-			self.visit_LuaBody(node["body"]),
+			(yield node["condition"], body),
+			(yield from self.visit_LuaBody(node["body"])),
 			[]
 		)
 
 	def visit_DoStatement(self, node, body):
 		return ast.If(
 			self.get_obj(True),
-			self.visit_LuaBody(node["body"]),
+			(yield from self.visit_LuaBody(node["body"])),
 			[]
 		)
 
 	def visit_RepeatStatement(self, node, body):
-		repeat_body = self.visit_LuaBody(node["body"])
+		repeat_body = yield from self.visit_LuaBody(node["body"])
 		repeat_body.append(ast.If(
-			self.visit(node["condition"], body),
+			(yield node["condition"], body),
 			[ast.Break()],
 			[]
 		))
@@ -209,24 +336,19 @@ are not supported.")
 		)
 
 	def visit_CallStatement(self, node, body):
-		return self.visit(node["expression"], body)
+		return (yield node["expression"], body)
 
 	def visit_ForNumericStatement(self, node, body):
-		if node["step"] is None:
-			step = self.get_obj(1)
-		else:
-			step = self.visit(node["step"], body)
-		target = self.visit(node["variable"], body)
-		target.ctx = ast.Store()
+		target = store((yield node["variable"], body))
 
 		return ast.For(
 			target,
 			ast.Call(
 				ast.Name("range", ast.Load()),
 				[
-					self.visit(node["start"], body),
+					(yield node["start"], body),
 					ast.BinOp(
-						self.visit(node["end"], body),
+						(yield node["end"], body),
 						ast.Add(),
 						self.get_obj(1)
 					),
@@ -236,11 +358,11 @@ are not supported.")
 					if node["step"] is None else
 
 					# Explicit step (for x = 1, 10, 2 do)
-					self.visit(node["step"], body)
+					(yield node["step"], body)
 				],
 				[]
 			),
-			self.visit_LuaBody(node["body"]),
+			(yield from self.visit_LuaBody(node["body"])),
 			[]
 		)
 
@@ -267,32 +389,37 @@ are not supported.")
 			vararg=vararg
 		)
 
+		location = node.get("loc")
+
 		# obj = function()
 		if node["identifier"] is None:
 			function_name = gen_random_text(30)
+			self.names[function_name] = "<anonymous>"
 
-			body.append(ast.FunctionDef(
+			function = ast.FunctionDef(
 				function_name,
 				args,
-				self.visit_LuaBody(node["body"]),
+				(yield from self.visit_LuaBody(node["body"])),
 				[]
-			))
+			)
+			body.append(function if location is None else locate(function, location))
 
 			return ast.Name(function_name, ast.Load())
 
 		# some.thing = function()
 		if node["identifier"]["type"] == "MemberExpression":
 			function_name = gen_random_text(30)
+			self.names[function_name] = lua_name(node["identifier"]) or "<anonymous>"
 
-			body.append(ast.FunctionDef(
+			function = ast.FunctionDef(
 				function_name,
 				args,
-				self.visit_LuaBody(node["body"]),
+				(yield from self.visit_LuaBody(node["body"])),
 				[]
-			))
+			)
+			body.append(function if location is None else locate(function, location))
 
-			target = self.visit(node["identifier"], body)
-			target.ctx = ast.Store()
+			target = store((yield node["identifier"], body))
 			return ast.Assign([target], ast.Name(function_name, ast.Load()))
 
 		# function obj()
@@ -300,14 +427,14 @@ are not supported.")
 			# We assume it is an identifier object.
 			node["identifier"]["name"],
 			args,
-			self.visit_LuaBody(node["body"]),
+			(yield from self.visit_LuaBody(node["body"])),
 			[]
 		)
 
 	def visit_ForGenericStatement(self, node, body):
 		if len(node["iterators"]) == 1:
-			iterator = self.visit(node["iterators"][0], body)
-			if (isinstance(iterator, ast.Call) and
+			iterator = yield node["iterators"][0], body
+			if (self.tables == "dict" and isinstance(iterator, ast.Call) and
 				isinstance(iterator.func, ast.Name) and
 				iterator.func.id in ("pairs", "ipairs")):
 				iterator.func = ast.Name("enumerate", ast.Load())
@@ -316,8 +443,8 @@ are not supported.")
 			  node["iterators"][0]["type"] == "Identifier" and
 			  node["iterators"][0]["name"] == "next"):
 			iterator = ast.Call(
-				ast.Name("enumerate", ast.Load()),
-				[self.visit(node["iterators"][1], body)],
+				ast.Name("enumerate" if self.tables == "dict" else "pairs", ast.Load()),
+				[(yield node["iterators"][1], body)],
 				[]
 			)
 
@@ -326,9 +453,9 @@ are not supported.")
 than one iterator (besides next and a table).")
 
 		return ast.For(
-			self.parse_values(node["variables"], body),
+			store((yield from self.parse_values(node["variables"], body))),
 			iterator,
-			self.visit_LuaBody(node["body"]),
+			(yield from self.visit_LuaBody(node["body"])),
 			[]
 		)
 
@@ -360,6 +487,9 @@ We highly recommend you to rename it.".format(node["name"]))
 		return ast.Name(check_reserved(node["name"]), ast.Load())
 
 	def visit_TableConstructorExpression(self, node, body):
+		if self.tables == "lua":
+			return (yield from self.lua_table(node, body))
+
 		new = ast.Dict([], [])
 
 		# Make python "tables" start from 1
@@ -372,14 +502,14 @@ We highly recommend you to rename it.".format(node["name"]))
 				key = self.get_obj(lastIndex)
 
 			elif field["type"] == "TableKey":
-				key = self.visit(field["key"], body)
+				key = yield field["key"], body
 
 			elif field["type"] == "TableKeyString":
 				# We assume field["key"] is an identifier and
 				# it needs to be interpreted as string.
 				key = self.get_obj(check_reserved(field["key"]["name"]))
 
-			value = self.visit(field["value"], body)
+			value = yield field["value"], body
 			if isinstance(value, ast.Starred):
 				value = value.value
 				has_starred = True
@@ -391,53 +521,132 @@ We highly recommend you to rename it.".format(node["name"]))
 			return new.values[0]
 		return new
 
+	def lua_table(self, node, body):
+		# LuaTable([positional values], {keyed values}), with (key, value)
+		# pairs instead of the dict when a key may be true or false, which
+		# the dict would merge with 1 or 0.
+		array, keys, values = [], [], []
+		for field in node["fields"]:
+			if field["type"] == "TableValue":
+				array.append((yield field["value"], body))
+				continue
+
+			if field["type"] == "TableKey":
+				keys.append((yield field["key"], body))
+			else:
+				keys.append(self.get_obj(check_reserved(field["key"]["name"])))
+			value = yield field["value"], body
+			if isinstance(value, ast.Starred):
+				value = value.value
+			values.append(value)
+
+		arguments = []
+		if array or keys:
+			arguments.append(ast.List(array, ast.Load()))
+		if keys and all(
+			isinstance(key, ast.Constant) and key.value.__class__ in (str, int, float)
+			for key in keys
+		):
+			arguments.append(ast.Dict(keys, values))
+		elif keys:
+			arguments.append(ast.Tuple(
+				[ast.Tuple(pair, ast.Load()) for pair in zip(keys, values)],
+				ast.Load()
+			))
+		return ast.Call(ast.Name("LuaTable", ast.Load()), arguments, [])
+
 	def visit_LogicalExpression(self, node, body):
 		return ast.BoolOp(
 			ast.And() if node["operator"] == "and" else ast.Or(),
-			[self.visit(node["left"], body), self.visit(node["right"], body)]
+			[(yield node["left"], body), (yield node["right"], body)]
 		)
 
 	def visit_UnaryExpression(self, node, body):
 		if node["operator"] == "#":
 			return ast.Call(
 				ast.Name("len", ast.Load()),
-				[self.visit(node["argument"], body)],
+				[(yield node["argument"], body)],
 				[]
 			)
 
 		return ast.UnaryOp(
-			ast.USub() if node["operator"] == "-" else
-			ast.Invert() if node["operator"] == "~" else
-			ast.Not(), # if node["operator"] == "not"
-			self.visit(node["argument"], body)
+			unary_operators[ node["operator"] ](),
+			(yield node["argument"], body)
+		)
+
+	def join_concat(self, node, body):
+		# Flattens the chain of .. iteratively, it can be long.
+		values, pending = [], [node]
+		while pending:
+			operand = pending.pop()
+			if operand["type"] == "BinaryExpression" and operand["operator"] == "..":
+				pending.append(operand["right"])
+				pending.append(operand["left"])
+			else:
+				values.append((yield operand, body))
+
+		parts = [] # Literals, as str, merged, and other values
+		for value in values:
+			if isinstance(value, ast.Constant) and value.value.__class__ in (str, int):
+				value = str(value.value)
+				if parts and parts[-1].__class__ is str:
+					parts[-1] += value
+					continue
+			parts.append(value)
+
+		if len(parts) == 1 and parts[0].__class__ is str:
+			return self.get_obj(parts[0])
+
+		if all(
+			part.__class__ is str or (
+				isinstance(part, ast.Call) and isinstance(part.func, ast.Name) and
+				part.func.id == "tostring"
+			)
+			for part in parts
+		):
+			return ast.JoinedStr([
+				self.get_obj(part) if part.__class__ is str
+				else ast.FormattedValue(part, -1, None)
+				for part in parts
+			])
+
+		return ast.Call(
+			ast.Name("LUA_CONCAT", ast.Load()),
+			[
+				self.get_obj(part) if part.__class__ is str else part
+				for part in parts
+			],
+			[]
 		)
 
 	def visit_BinaryExpression(self, node, body):
+		if node["operator"] == ".." and self.concat == "join":
+			return (yield from self.join_concat(node, body))
 		if node["operator"] == "..":
 			return ast.Call(
 				ast.Name("LUA_CONCAT", ast.Load()),
 				[
-					self.visit(node["left"], body),
-					self.visit(node["right"], body)
+					(yield node["left"], body),
+					(yield node["right"], body)
 				],
 				[]
 			)
 		if node["operator"] in compare_operators:
 			return ast.Compare(
-				self.visit(node["left"], body),
+				(yield node["left"], body),
 				[ compare_operators[ node["operator"] ]() ],
-				[self.visit(node["right"], body)]
+				[(yield node["right"], body)]
 			)
 
 		return ast.BinOp(
-			self.visit(node["left"], body),
+			(yield node["left"], body),
 			binary_operators[ node["operator"] ](),
-			self.visit(node["right"], body)
+			(yield node["right"], body)
 		)
 
 	def visit_MemberExpression(self, node, body):
 		return ast.Attribute(
-			self.visit(node["base"], body),
+			(yield node["base"], body),
 			check_reserved(node["identifier"]["name"]),
 			ast.Load(),
 
@@ -446,7 +655,7 @@ We highly recommend you to rename it.".format(node["name"]))
 		)
 
 	def visit_IndexExpression(self, node, body):
-		index = self.visit(node["index"], body)
+		index = yield node["index"], body
 		if isinstance(index, ast.Starred):
 			index = ast.Subscript(
 				index.value,
@@ -455,17 +664,17 @@ We highly recommend you to rename it.".format(node["name"]))
 			)
 
 		return ast.Subscript(
-			self.visit(node["base"], body),
+			(yield node["base"], body),
 			ast.Index(index),
 			ast.Load()
 		)
 
-	def visit_CallExpression(self, node, body):
+	def visit_CallExpression(self, node, body, node_arguments=None):
 		arguments = []
-		for argument in node["arguments"]:
-			arguments.append(self.visit(argument, body))
+		for argument in node_arguments or node["arguments"]:
+			arguments.append((yield argument, body))
 
-		base = self.visit(node["base"], body)
+		base = yield node["base"], body
 		if isinstance(base, ast.Attribute) and base.is_colon_call:
 			arguments.insert(0, base)
 		elif isinstance(base, ast.Name) and base.id == "assert":
@@ -481,9 +690,7 @@ We highly recommend you to rename it.".format(node["name"]))
 		)
 
 	def visit_TableCallExpression(self, node, body):
-		node["arguments"] = [node["arguments"]]
-		return self.visit_CallExpression(node, body)
+		return self.visit_CallExpression(node, body, [node["arguments"]])
 
 	def visit_StringCallExpression(self, node, body):
-		node["arguments"] = [node["argument"]]
-		return self.visit_CallExpression(node, body)
\ No newline at end of file
+		return self.visit_CallExpression(node, body, [node["argument"]])
@@ -1,16 +1,18 @@
 import ast
-import lua_nodes as lua
+from . import lua_nodes as lua
+from .visitor import Visitor
+from .parse_lua import runtime_module
 
-python_reserved = [
+python_reserved = frozenset((
 	"_class", "_finally", "_is", "_return",
-	"_continue", "_for", "_lambda", "_trye",
+	"_continue", "_for", "_lambda", "_try",
 	"_def", "_from", "_nonlocal", "_while",
 	"_and", "_del", "_global", "_not", "_with",
 	"_as", "_elif", "_if", "_or", "_yield",
 	"_assert", "_else", "_import", "_pass",
 	"_break", "_except", "_in", "_raise",
 	"_async", "_await"
-]
+))
 compare_operators = {
 	ast.Eq: "==", ast.NotEq: "~=",
 	ast.Lt: "<", ast.LtE: "<=",
@@ -24,13 +26,17 @@ binary_operators = {
 	ast.BitOr: "|", ast.BitXor: "^^",
 	ast.BitAnd: "&"
 }
+unary_operators = {
+	ast.Invert: "~", ast.USub: "-",
+	ast.Not: "not"
+}
 
 def check_reserved(word):
 	if word in python_reserved:
 		return word[1:]
 	return word
 
-class PythonParser:
+class PythonParser(Visitor):
 	def __init__(self):
 		self.hybrid_vars = {}
 
@@ -39,51 +45,63 @@ class PythonParser:
 			elements = []
 
 			for element in value.elts:
-				elements.append(self.visit(element, body))
+				elements.append((yield element, body))
 
 			return elements
 
-		return [self.visit(value, body)]
+		return [(yield value, body)]
 
-	def visit(self, node, body):
-		parser = getattr(self, f"visit_{node.__class__.__name__}", None)
-		if parser is None:
-			raise TypeError(f"Unknown Python AST node: {node.__class__.__name__}")
+	@classmethod
+	def dispatch_keys(cls, name):
+		# Keyed by node class, and by class name for subclasses.
+		node_class = vars(ast).get(name)
+		if isinstance(node_class, type) and issubclass(node_class, ast.AST):
+			return (name, node_class)
+		return (name,)
 
-		return parser(node, body)
+	def lookup(self, node):
+		parser = self.dispatch.get(node.__class__)
+		if parser is None:
+			parser = self.dispatch.get(node.__class__.__name__)
+			if parser is None:
+				raise TypeError(f"Unknown Python AST node: {node.__class__.__name__}")
+		return parser
 
 	def visit_PyBody(self, body): # Not really a python node.
 		new = []
 
 		for child in body:
-			obj = self.visit(child, new)
+			obj = yield child, new
 			if obj is not None:
+				line = getattr(child, "lineno", None)
+				if line is not None: # Kept for the source maps
+					lua.locate(obj, line, getattr(child, "end_lineno", None))
 				new.append(obj)
 
 		return new
 
 	def visit_Module(self, node, body):
-		return lua.Chunk(self.visit_PyBody(node.body))
+		return lua.Chunk((yield from self.visit_PyBody(node.body)))
 
 	def visit_Expr(self, node, body):
-		return self.visit(node.value, body)
+		return (yield node.value, body)
 
 	def visit_Break(self, node, body):
 		return lua.BreakStatement()
 
 	def visit_Return(self, node, body):
 		return lua.ReturnStatement(
-			self.unpack_values(
+			(yield from self.unpack_values(
 				node.value,
 				body
-			) if node.value is not None else []
+			)) if node.value is not None else []
 		)
 
 	def visit_Assign(self, node, body):
 		return lua.AssignmentStatement(
 			False,
-			self.unpack_values(node.targets[0], body),
-			self.unpack_values(node.value, body)
+			(yield from self.unpack_values(node.targets[0], body)),
+			(yield from self.unpack_values(node.value, body))
 		)
 
 	def visit_Assert(self, node, body):
@@ -91,45 +109,41 @@ class PythonParser:
 			lua.CallExpression(
 				lua.Identifier("assert"),
 
-				[self.visit(node.test, body)]
+				[(yield node.test, body)]
 				if node.msg is None else
-				[self.visit(node.test, body), self.visit(node.msg, body)]
+				[(yield node.test, body), (yield node.msg, body)]
 			)
 		)
 
-	def visit_If(self, node, body, as_clause=False, as_if=False):
-		if not as_clause:
-			clauses = self.visit_If(
-				node,
-				body,
-				as_clause=True,
-				as_if=True
-			)
-			if (len(clauses) == 1 and
-				clauses[0]["condition"]["type"] == "BooleanLiteral"
-				and clauses[0]["condition"]["value"]):
-				return lua.DoStatement(clauses[0]["body"])
-			return lua.IfStatement(clauses)
-
-		generator = lua.IfClause if as_if else lua.ElseifClause
-		clauses = [
-			generator(
-				self.visit(node.test, body),
-				self.visit_PyBody(node.body)
-			)
-		]
+	def visit_If(self, node, body):
+		# elif chains are nested ifs in python, walk them in a loop.
+		clauses = []
+		generator = lua.IfClause
+
+		while True:
+			clauses.append(generator(
+				(yield node.test, body),
+				(yield from self.visit_PyBody(node.body))
+			))
+			generator = lua.ElseifClause
 
-		if len(node.orelse) == 1 and isinstance(node.orelse[0], ast.If):
-			clauses.extend(self.visit_If(node.orelse[0], body, as_clause=True))
+			if len(node.orelse) == 1 and isinstance(node.orelse[0], ast.If):
+				node = node.orelse[0]
+				continue
 
-		elif len(node.orelse) > 0:
-			clauses.append(lua.ElseClause(self.visit_PyBody(node.orelse)))
+			if len(node.orelse) > 0:
+				clauses.append(lua.ElseClause((yield from self.visit_PyBody(node.orelse))))
+			break
 
-		return clauses
+		if (len(clauses) == 1 and
+			clauses[0]["condition"]["type"] == "BooleanLiteral"
+			and clauses[0]["condition"]["value"]):
+			return lua.DoStatement(clauses[0]["body"])
+		return lua.IfStatement(clauses)
 
 	def visit_While(self, node, body):
-		condition = self.visit(node.test, body)
-		while_body = self.visit_PyBody(node.body)
+		condition = yield node.test, body
+		while_body = yield from self.visit_PyBody(node.body)
 
 		# while True:
 		# 	...
@@ -151,24 +165,65 @@ class PythonParser:
 			)
 		return lua.WhileStatement(condition, while_body)
 
+	def concat(self, values):
+		expression = values[-1]
+		for value in reversed(values[:-1]):
+			expression = lua.BinaryExpression("..", value, expression)
+		return expression
+
+	def visit_JoinedStr(self, node, body):
+		values = []
+		for value in node.values:
+			if isinstance(value, ast.FormattedValue):
+				if value.conversion != -1 or value.format_spec is not None:
+					raise TypeError("Lua has no equivalent of f-string conversions.")
+				value = value.value
+			values.append((yield value, body))
+
+		if not values:
+			return lua.StringLiteral("")
+		return self.concat(values)
+
+	def lua_table(self, node, body):
+		# LuaTable([positional values], {keyed values})
+		array, hash = (node.args + [None, None])[:2]
+		fields = []
+		if isinstance(array, ast.List):
+			for value in array.elts:
+				fields.append(lua.TableValue((yield value, body)))
+		if isinstance(hash, ast.Dict):
+			for key, value in zip(hash.keys, hash.values):
+				fields.append(lua.TableKey((yield key, body), (yield value, body)))
+		return lua.TableConstructorExpression(fields)
+
+	def visit_ImportFrom(self, node, body):
+		# The runtime of LuaTable, lua has it built in.
+		if node.module == runtime_module:
+			return
+		raise TypeError(f"Can not import {node.module} in lua.")
+
 	def visit_Call(self, node, body):
+		if (isinstance(node.func, ast.Name) and node.func.id == "LuaTable" and
+			len(node.args) <= 2 and not node.keywords):
+			return (yield from self.lua_table(node, body))
+
 		arguments = []
 		for argument in node.args:
-			arguments.append(self.visit(argument, body))
+			arguments.append((yield argument, body))
 
-		fnc = self.visit(node.func, body)
+		fnc = yield node.func, body
 		if fnc["type"] == "Identifier":
 			if fnc["name"] == "len" and len(arguments) == 1:
 				return lua.UnaryExpression("#", *arguments)
-			if fnc["name"] == "LUA_CONCAT" and len(arguments) == 2:
-				return lua.BinaryExpression("..", *arguments)
+			if fnc["name"] == "LUA_CONCAT" and len(arguments) >= 2:
+				return self.concat(arguments)
 
 		return lua.CallStatement(
 			lua.CallExpression(fnc, arguments)
 		)
 
 	def visit_For(self, node, body):
-		target = self.unpack_values(node.target, body)
+		target = yield from self.unpack_values(node.target, body)
 
 		if (isinstance(node.iter, ast.Call) and
 			isinstance(node.iter.func, ast.Name)):
@@ -178,7 +233,7 @@ class PythonParser:
 			elif node.iter.func.id == "range":
 				arguments = []
 				for arg in node.iter.args:
-					arguments.append(self.visit(arg, body))
+					arguments.append((yield arg, body))
 
 				if len(arguments) == 1:
 					start = lua.NumericLiteral(1)
@@ -212,13 +267,13 @@ class PythonParser:
 					start,
 					end,
 					step,
-					self.visit_PyBody(node.body)
+					(yield from self.visit_PyBody(node.body))
 				)
 
 		return lua.ForGenericStatement(
 			target,
-			[self.visit(node.iter, body)],
-			self.visit_PyBody(node.body)
+			[(yield node.iter, body)],
+			(yield from self.visit_PyBody(node.body))
 		)
 
 	def visit_FunctionDef(self, node, body):
@@ -231,7 +286,7 @@ class PythonParser:
 		]
 		if node.args.vararg is not None:
 			parameters.append(lua.VarargLiteral())
-		body = self.visit_PyBody(node.body)
+		body = yield from self.visit_PyBody(node.body)
 
 		if node.name.startswith("hybridpython_var_"):
 			self.hybrid_vars[node.name] = lua.FunctionStatement(
@@ -288,15 +343,15 @@ class PythonParser:
 
 		for key, value in zip(node.keys, node.values):
 			fields.append(lua.TableKey(
-				self.visit(check_reserved(key), body),
-				self.visit(value, body)
+				(yield check_reserved(key), body),
+				(yield value, body)
 			))
 
 		return lua.TableConstructorExpression(fields)
 
 	def visit_BoolOp(self, node, body):
 		operator = "and" if isinstance(node.op, ast.And) else "or"
-		expression = self.visit(node.values[0], body)
+		expression = yield node.values[0], body
 
 		for index, value in enumerate(node.values):
 			if index == 0:
@@ -305,69 +360,70 @@ class PythonParser:
 			expression = lua.LogicalExpression(
 				operator,
 				expression,
-				self.visit(value, body)
+				(yield value, body)
 			)
 		return expression
 
+	def get_operator(self, operators, operator):
+		symbol = operators.get(operator.__class__)
+		if symbol is None:
+			raise TypeError(
+				f"Lua has no equivalent of the {operator.__class__.__name__} operator."
+			)
+		return symbol
+
 	def visit_Compare(self, node, body):
-		for operator_class, symbol in compare_operators.items():
-			if isinstance(node.ops[0], operator_class):
-				expression = lua.BinaryExpression(
-					symbol,
-					self.visit(node.left, body),
-					self.visit(node.comparators[0], body)
-				)
-				break
+		expression = lua.BinaryExpression(
+			self.get_operator(compare_operators, node.ops[0]),
+			(yield node.left, body),
+			(yield node.comparators[0], body)
+		)
 
 		for index, operator in enumerate(node.ops):
 			if index == 0:
 				continue
 
-			for operator_class, symbol in compare_operators.items():
-				if isinstance(operator, operator_class):
-					expression = lua.LogicalExpression(
-						"and",
-						expression,
-						lua.BinaryExpression(
-							symbol,
-							self.visit(node.comparators[index - 1], body),
-							self.visit(node.comparators[index], body)
-						)
-					)
-					break
+			expression = lua.LogicalExpression(
+				"and",
+				expression,
+				lua.BinaryExpression(
+					self.get_operator(compare_operators, operator),
+					(yield node.comparators[index - 1], body),
+					(yield node.comparators[index], body)
+				)
+			)
 
 		return expression
 
 	def visit_BinOp(self, node, body):
-		for operator_class, symbol in binary_operators.items():
-			if isinstance(node.op, operator_class):
-				return lua.BinaryExpression(
-					symbol,
-					self.visit(node.left, body),
-					self.visit(node.right, body)
-				)
+		return lua.BinaryExpression(
+			self.get_operator(binary_operators, node.op),
+			(yield node.left, body),
+			(yield node.right, body)
+		)
 
 	def visit_UnaryOp(self, node, body):
 		if isinstance(node.op, ast.UAdd): # +1
-			return self.visit(node.operand, body)
+			return (yield node.operand, body)
 		return lua.UnaryExpression(
-			"~" if isinstance(node.op, ast.Invert) else # ~1
-			"-" if isinstance(node.op, ast.USub) else # -1
-			"not", # if isinstance(node.op, ast.Not) # not True
-			self.visit(node.operand, body)
+			self.get_operator(unary_operators, node.op),
+			(yield node.operand, body)
 		)
 
 	def visit_Attribute(self, node, body):
 		return lua.MemberExpression(
-			self.visit(node.value, body),
+			(yield node.value, body),
 			".",
 			check_reserved(node.attr)
 		)
 
 	def visit_Subscript(self, node, body):
-		if not isinstance(node.slice, ast.Index):
+		index = node.slice
+		if isinstance(index, ast.Index): # Python < 3.9
+			index = index.value
+		if isinstance(index, (ast.Slice, ast.ExtSlice)):
 			raise TypeError("Lua doesn't support item slicing.")
 		return lua.IndexExpression(
-			self.visit(node.value, body),
-			self.visit(node.slice.value, body)
+			(yield node.value, body),
+			(yield index, body)
 		)
\ No newline at end of file
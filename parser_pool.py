@@ -0,0 +1,254 @@
+import subprocess
+import functools
+import threading
+import struct
+import atexit
+import queue
+import json
+import os
+
+from . import ast_codec
+
+script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lua-parser.js")
+header = struct.Struct(">cI")
+
+@functools.lru_cache(None)
+def luaparse_version(script=script_path):
+	"""Returns the luaparse version lua-parser.js would load, without
+	starting node (read from node_modules, then package-lock.json)."""
+	directory = os.path.dirname(script)
+	try:
+		with open(os.path.join(directory, "node_modules", "luaparse", "package.json")) as file:
+			return json.load(file)["version"]
+	except (OSError, ValueError, KeyError):
+		pass
+
+	try:
+		with open(os.path.join(directory, "package-lock.json")) as file:
+			return json.load(file)["dependencies"]["luaparse"]["version"]
+	except (OSError, ValueError, KeyError):
+		return "unknown"
+
+class WorkerCrashed(RuntimeError):
+	pass
+
+class ParserWorker:
+	"""A long-lived `node lua-parser.js --server` process."""
+
+	def __init__(self, node="node", script=script_path):
+		self.node = node
+		self.script = script
+		self.process = None
+		self.start()
+
+	def start(self):
+		self.process = subprocess.Popen(
+			[self.node, self.script, "--server"],
+			stdin=subprocess.PIPE, stdout=subprocess.PIPE
+		)
+
+	def restart(self):
+		self.close()
+		self.start()
+
+	def close(self):
+		if self.process is None:
+			return
+
+		try:
+			self.process.stdin.close()
+		except OSError:
+			pass
+		try:
+			self.process.wait(1)
+		except subprocess.TimeoutExpired:
+			self.process.kill()
+			self.process.wait()
+		self.process.stdout.close()
+		self.process = None
+
+	def alive(self):
+		return self.process is not None and self.process.poll() is None
+
+	def read(self, size):
+		data = self.process.stdout.read(size)
+		if len(data) != size:
+			raise WorkerCrashed("The lua parser worker exited unexpectedly.")
+		return data
+
+	def request(self, kind, payload=b""):
+		"""Sends a request frame and returns the (status, payload) answer."""
+		try:
+			self.process.stdin.write(header.pack(kind, len(payload)))
+			self.process.stdin.write(payload)
+			self.process.stdin.flush()
+		except (OSError, ValueError):
+			raise WorkerCrashed("The lua parser worker exited unexpectedly.")
+
+		status, length = header.unpack(self.read(header.size))
+		return status, self.read(length)
+
+	def ping(self):
+		"""Returns the luaparse version the worker runs."""
+		status, payload = self.request(b"P")
+		if status != b"O":
+			raise WorkerCrashed(payload.decode())
+		return payload.decode()
+
+	def healthy(self):
+		if not self.alive():
+			return False
+
+		try:
+			self.ping()
+		except WorkerCrashed:
+			return False
+		return True
+
+	def parse(self, lua_code, version, encoding="json", locations=False):
+		"""Returns the raw answer of the worker, either JSON or
+		marshal encoded (encoding="binary"). With `locations`, nodes
+		have a "loc" key (luaparse's locations option)."""
+		if isinstance(lua_code, str):
+			lua_code = lua_code.encode()
+
+		header = str(version) + (" locations" if locations else "")
+		status, payload = self.request(
+			b"B" if encoding == "binary" else b"Q",
+			header.encode() + b"\n" + lua_code
+		)
+		if status != b"O":
+			raise SyntaxError(payload.decode())
+		return payload
+
+class ParserPool:
+	"""A pool of lua parser workers.
+
+	Workers are spawned lazily, up to `size` of them, and are reused
+	between parses. A worker that crashes is restarted and the parse is
+	retried once."""
+
+	def __init__(self, size=None, node="node", script=script_path):
+		self.size = size or os.cpu_count() or 1
+		self.node = node
+		self.script = script
+
+		self.idle = queue.LifoQueue()
+		self.workers = []
+		self.lock = threading.Lock()
+
+	def acquire(self):
+		try:
+			worker = self.idle.get_nowait()
+		except queue.Empty:
+			with self.lock:
+				if len(self.workers) < self.size:
+					worker = ParserWorker(self.node, self.script)
+					self.workers.append(worker)
+					return worker
+			worker = self.idle.get()
+
+		if not worker.alive():
+			worker.restart()
+		return worker
+
+	def release(self, worker):
+		with self.lock:
+			if worker in self.workers and len(self.workers) <= self.size:
+				self.idle.put(worker)
+				return
+
+			if worker in self.workers:
+				self.workers.remove(worker)
+		worker.close()
+
+	def parse_raw(self, lua_code, version, encoding="json", locations=False):
+		"""Returns the encoded abstract syntax tree of a given code."""
+		worker = self.acquire()
+		try:
+			try:
+				return worker.parse(lua_code, version, encoding, locations)
+			except WorkerCrashed:
+				worker.restart()
+				return worker.parse(lua_code, version, encoding, locations)
+		finally:
+			self.release(worker)
+
+	def parse(self, lua_code, version, encoding="json", locations=False):
+		"""Returns the lua abstract syntax tree of a given code.
+		`encoding` is the interchange format used with the worker:
+		"json" or "binary" (see ast_codec). With `locations`, nodes have
+		a "loc" key."""
+		data = self.parse_raw(lua_code, version, encoding, locations)
+		if encoding == "binary":
+			return ast_codec.decode(data)
+		return json.loads(data)
+
+	def check(self):
+		"""Health checks every idle worker, restarting unhealthy ones.
+		Returns the amount of restarted workers."""
+		restarted = 0
+		workers = []
+
+		while True:
+			try:
+				workers.append(self.idle.get_nowait())
+			except queue.Empty:
+				break
+
+		for worker in workers:
+			if not worker.healthy():
+				worker.restart()
+				restarted += 1
+			self.release(worker)
+
+		return restarted
+
+	def resize(self, size):
+		"""Changes the maximum amount of workers. Extra idle workers
+		are stopped right away, busy ones once they are released."""
+		with self.lock:
+			self.size = size
+
+		while len(self.workers) > self.size:
+			try:
+				worker = self.idle.get_nowait()
+			except queue.Empty:
+				break
+
+			with self.lock:
+				self.workers.remove(worker)
+			worker.close()
+
+	def close(self):
+		with self.lock:
+			workers, self.workers = self.workers, []
+
+		while True:
+			try:
+				self.idle.get_nowait()
+			except queue.Empty:
+				break
+
+		for worker in workers:
+			worker.close()
+
+default_pool = None
+
+def get_pool():
+	"""Returns the shared parser pool, creating it if needed."""
+	global default_pool
+	if default_pool is None:
+		default_pool = ParserPool()
+	return default_pool
+
+def set_pool_size(size):
+	"""Sets the maximum amount of workers of the shared parser pool."""
+	get_pool().resize(size)
+
+@atexit.register
+def close_pool():
+	global default_pool
+	if default_pool is not None:
+		default_pool.close()
+		default_pool = None
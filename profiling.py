@@ -0,0 +1,187 @@
+from contextlib import contextmanager
+import tracemalloc
+import functools
+import time
+
+class MemoryBudgetExceeded(MemoryError):
+	"""Raised when the memory traced by a Profile goes over its budget.
+	`report` holds the phases finished until then."""
+
+	def __init__(self, phase, used, budget, report):
+		message = f"{phase} used {used / 1e6:.1f} MB, over the budget of {budget / 1e6:.1f} MB"
+		super().__init__(f"{message}\n{report}" if report else message)
+		self.phase = phase
+		self.used = used
+		self.budget = budget
+		self.report = report
+
+class Profile:
+	"""Visit counts and times of the conversion phases and node types.
+
+	While a profile is active (see set_profile), or set as the `profile`
+	of a visitor, every node visited is counted in `nodes`, keyed by
+	(visitor, node type), as [visits, own time, total time]. The own time
+	is spent in the visit function of the node, the total one also counts
+	its children, once for nested nodes of a type (like cProfile's
+	cumulative time).
+	The phases of the module functions (gen_lua_ast, lua_to_py_ast, ...)
+	are kept in `phases` as [calls, time, peak, retained]; they can be
+	nested, transpile running the others.
+
+	With `memory`, allocations are traced with tracemalloc while the
+	profile is active. The peak of a phase is the most memory allocated
+	at once while it ran, counting what earlier phases left alive (the
+	lua tree while converting it, ...), and its retained memory is what
+	it left allocated (the tree it returned, ...); both are the largest
+	seen over its calls, in bytes. Memory of the node parser processes
+	isn't traced. With a `budget`, in bytes, MemoryBudgetExceeded is
+	raised once the memory allocated goes over it, checked at the end of
+	every phase and every `check_interval` visited nodes.
+
+	`callback`, if given, is called with ("phase", name, time) after every
+	phase and ("node", "visitor.type", total time) after every node.
+	Without an active profile, or with one without `node_stats` that
+	only measures the phases, visitors run their usual loop."""
+	check_interval = 4096
+
+	def __init__(self, callback=None, memory=False, budget=None, node_stats=True):
+		self.node_stats = node_stats
+		self.nodes = {}
+		self.phases = {}
+		self.callback = callback
+		self.memory = memory or budget is not None
+		self.budget = budget
+		self.running = [] # [name, peak] of the running phases
+		self.visits = 0
+		self.tracing = False # Whether tracemalloc was started by start()
+
+	def start(self):
+		if self.memory and not tracemalloc.is_tracing():
+			tracemalloc.start()
+			self.tracing = True
+
+	def stop(self):
+		if self.tracing:
+			tracemalloc.stop()
+			self.tracing = False
+
+	def check(self):
+		"""Raises MemoryBudgetExceeded if the memory allocated is over
+		the budget."""
+		if self.budget is not None and tracemalloc.is_tracing():
+			used = tracemalloc.get_traced_memory()[0]
+			if used > self.budget:
+				phase = self.running[-1][0] if self.running else "conversion"
+				raise MemoryBudgetExceeded(phase, used, self.budget, self.report())
+
+	def add_node(self, visitor, kind, own, total):
+		stats = self.nodes.get((visitor, kind))
+		if stats is None:
+			stats = self.nodes[visitor, kind] = [0, 0.0, 0.0]
+		stats[0] += 1
+		stats[1] += own
+		stats[2] += total
+
+		if self.callback is not None:
+			self.callback("node", f"{visitor}.{kind}", total)
+
+		if self.budget is not None:
+			self.visits += 1
+			if self.visits % self.check_interval == 0:
+				self.check()
+
+	def add_phase(self, name, elapsed, peak=0, retained=0):
+		stats = self.phases.get(name)
+		if stats is None:
+			stats = self.phases[name] = [0, 0.0, 0, 0]
+		stats[0] += 1
+		stats[1] += elapsed
+		stats[2] = max(stats[2], peak)
+		stats[3] = max(stats[3], retained)
+
+		if self.callback is not None:
+			self.callback("phase", name, elapsed)
+
+	@contextmanager
+	def phase(self, name):
+		"""Times the code it wraps as a phase, and measures its memory
+		when tracing."""
+		tracing = self.memory and tracemalloc.is_tracing()
+		current = 0
+		if tracing:
+			current, peak = tracemalloc.get_traced_memory()
+			if self.running: # The peak is reset, keep the one of the parent
+				self.running[-1][1] = max(self.running[-1][1], peak)
+			tracemalloc.reset_peak()
+		self.running.append([name, current])
+		start = time.perf_counter()
+
+		try:
+			yield self
+		finally:
+			elapsed = time.perf_counter() - start
+			peak = self.running.pop()[1]
+			retained = 0
+			if tracing:
+				used, traced_peak = tracemalloc.get_traced_memory()
+				peak, retained = max(peak, traced_peak), max(used - current, 0)
+				if self.running:
+					self.running[-1][1] = max(self.running[-1][1], peak)
+			self.add_phase(name, elapsed, peak, retained)
+
+		if tracing and self.budget is not None and peak > self.budget:
+			raise MemoryBudgetExceeded(name, peak, self.budget, self.report())
+
+	def clear(self):
+		self.nodes.clear()
+		self.phases.clear()
+
+	def report(self, limit=20):
+		"""Returns the phases and the `limit` node types with the most
+		own time, as text."""
+		lines = []
+		for name, (calls, elapsed, peak, retained) in self.phases.items():
+			line = f"{name}: {calls} calls, {elapsed * 1000:.1f} ms"
+			if self.memory:
+				line += f", peak {peak / 1e6:.1f} MB, retained {retained / 1e6:.1f} MB"
+			lines.append(line)
+
+		nodes = sorted(self.nodes.items(), key=lambda item: -item[1][1])[:limit]
+		if nodes:
+			lines.append(f"{'node':<52} {'visits':>8} {'own ms':>9} {'total ms':>9}")
+		for (visitor, kind), (visits, own, total) in nodes:
+			lines.append(
+				f"{visitor + '.' + kind:<52} {visits:>8} "
+				f"{own * 1000:>9.2f} {total * 1000:>9.2f}"
+			)
+		return "\n".join(lines)
+
+active_profile = None
+
+def get_profile():
+	"""Returns the active profile, or None if profiling is disabled."""
+	return active_profile
+
+def set_profile(profile):
+	"""Makes a Profile the active one (None disables profiling). Memory
+	is traced while a profile measuring it is active."""
+	global active_profile
+	if active_profile is not None:
+		active_profile.stop()
+	active_profile = profile
+	if profile is not None:
+		profile.start()
+	return profile
+
+def phase(name):
+	"""Decorates a function so its calls are a phase of the active
+	profile."""
+	def decorator(function):
+		@functools.wraps(function)
+		def wrapper(*args, **kwargs):
+			if active_profile is None:
+				return function(*args, **kwargs)
+			with active_profile.phase(name):
+				return function(*args, **kwargs)
+		return wrapper
+	return decorator
@@ -0,0 +1,56 @@
+"""Moves the locations of a profile of converted code back to its source.
+
+	python -m <package>.remap -m file.py.map profile.pstats
+	python -m <package>.remap -m file.lua.map --text dump.txt
+
+The maps are the ones written with the --source-map option of the cli.
+The first form prints a cProfile/pstats profile of the generated code
+with the source files, lines and function names (or dumps it again
+with -o), the second rewrites every file:line and generated name of a
+text, like the dumps of lua profilers."""
+import argparse
+import pstats
+import sys
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(
+		prog=f"python -m {__package__}.remap", description=__doc__.splitlines()[0]
+	)
+	parser.add_argument("profile", help="pstats file, or text with --text (- for stdin)")
+	parser.add_argument(
+		"-m", "--map", action="append", required=True, dest="maps",
+		help="source map of a generated file, repeatable"
+	)
+	parser.add_argument("--text", action="store_true", help="rewrite a text profile")
+	parser.add_argument("-o", "--output", help="remapped pstats file, or text")
+	parser.add_argument("--sort", default="cumulative", help="pstats sort key")
+	parser.add_argument("--limit", type=int, default=30, help="functions printed")
+	args = parser.parse_args(argv)
+
+	from .source_map import SourceMap, remap_stats, remap_text
+
+	maps = [SourceMap.load(path) for path in args.maps]
+
+	if args.text:
+		if args.profile == "-":
+			text = sys.stdin.read()
+		else:
+			with open(args.profile, encoding="utf-8") as file:
+				text = file.read()
+		text = remap_text(text, maps)
+		if args.output is None:
+			sys.stdout.write(text)
+		else:
+			with open(args.output, "w", encoding="utf-8") as file:
+				file.write(text)
+		return 0
+
+	stats = remap_stats(pstats.Stats(args.profile), maps)
+	if args.output is not None:
+		stats.dump_stats(args.output)
+	else:
+		stats.sort_stats(args.sort).print_stats(args.limit)
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,262 @@
+"""Runtime of the python code converted with the "lua" tables mode of
+LuaParser, which imports LuaTable, ipairs, pairs and table from here.
+
+LuaTable trades speed for memory and lua semantics: indexing runs
+__getitem__ and __setitem__ in python, 2 to 4 times slower than the C
+lookups of the dicts of the default mode (see benchmarks.tables)."""
+from itertools import count
+
+class LuaTable:
+	"""A lua table, split in an array part and a hash part like the
+	ones of the lua interpreter.
+
+	The values of the keys 1 to n are kept in a list, the others in the
+	__dict__ of the table, so fields are attributes too (t.name is
+	t["name"]) and cost a dict access. The array part never ends with
+	nil and the key n + 1 is never in the hash part, so n, its length,
+	is a border of the table (a key whose value isn't nil followed by
+	one whose value is): #t is len(t). nil values in the middle of the
+	array part are kept as None, as lua allows #t to be any border.
+	Integral float keys are the integer ones, true and false are kept
+	apart from 1 and 0 (see BooleanKey), and missing keys are nil.
+
+	The fields `_array`, `_sparse` and the ones named like special
+	methods can only be accessed by indexing."""
+	__slots__ = ("_array", "_sparse", "__dict__")
+
+	def __init__(self, array=(), hash=None):
+		# `hash` is a dict, or (key, value) pairs for boolean keys.
+		self._array = list(array)
+		self._sparse = False # Whether the hash part has integer keys
+		if hash:
+			values, self._array = self._array, []
+			for key, value in (hash.items() if hash.__class__ is dict else hash):
+				set_field(self, key, value)
+			# Positional fields win over the keyed ones, like in lua.
+			for index, value in enumerate(values, 1):
+				set_field(self, index, value)
+		else:
+			trim(self._array)
+
+	def __getitem__(self, key):
+		if key.__class__ is int:
+			if key > 0:
+				try:
+					return self._array[key - 1]
+				except IndexError:
+					pass
+			if not self._sparse:
+				return None
+		elif key.__class__ is float and key.is_integer():
+			return self[int(key)]
+		elif key.__class__ is bool:
+			key = boolean_keys[key]
+		return self.__dict__.get(key)
+
+	def __setitem__(self, key, value):
+		# Assignments and appends of the array part first.
+		if key.__class__ is int and value is not None:
+			array = self._array
+			size = len(array)
+			if 0 < key <= size:
+				array[key - 1] = value
+				return
+			if key == size + 1:
+				array.append(value)
+				if self._sparse:
+					grow(self)
+				return
+		set_field(self, key, value)
+
+	def __getattr__(self, name):
+		# Missing fields, attributes found elsewhere never get here.
+		if name.startswith("__") or name in LuaTable.__slots__:
+			raise AttributeError(name)
+		return None
+
+	def __len__(self):
+		return len(self._array)
+
+	def __bool__(self):
+		return True # Even when empty, like every lua table
+
+	def __iter__(self):
+		# The keys, like a dict.
+		for index, value in enumerate(self._array, 1):
+			if value is not None:
+				yield index
+		for key, value in tuple(self.__dict__.items()):
+			if value is not None:
+				yield key.value if key.__class__ is BooleanKey else key
+
+	def __repr__(self):
+		return f"LuaTable({self._array!r}, {self.__dict__!r})"
+
+class BooleanKey:
+	"""The key true or false is kept under in the hash part of a
+	LuaTable, where True and False would be the keys 1 and 0."""
+	__slots__ = ("value",)
+
+	def __init__(self, value):
+		self.value = value
+
+	def __repr__(self):
+		return f"BooleanKey({self.value})"
+
+boolean_keys = {True: BooleanKey(True), False: BooleanKey(False)}
+
+def trim(array):
+	while array and array[-1] is None:
+		array.pop()
+
+def grow(table):
+	# Moves the keys following the array part out of the hash part.
+	array, hash = table._array, table.__dict__
+	key = len(array) + 1
+	while key in hash:
+		value = hash.pop(key)
+		if value is None:
+			break
+		array.append(value)
+		key += 1
+
+def set_field(table, key, value):
+	"""Assigns a field of a LuaTable, the general case of __setitem__."""
+	if key.__class__ is float and key.is_integer():
+		key = int(key)
+
+	if key.__class__ is int:
+		array = table._array
+		size = len(array)
+		if 0 < key <= size:
+			array[key - 1] = value
+			if key == size and value is None:
+				trim(array)
+			return
+		if key == size + 1:
+			if value is not None:
+				array.append(value)
+				if table._sparse:
+					grow(table)
+			return
+		if value is not None:
+			table._sparse = True
+	elif key.__class__ is bool:
+		key = boolean_keys[key]
+
+	if value is None:
+		table.__dict__.pop(key, None)
+	elif key is None:
+		raise ValueError("table index is nil")
+	elif key != key:
+		raise ValueError("table index is NaN")
+	else:
+		table.__dict__[key] = value
+
+def ipairs(table):
+	"""Returns an iterator of the (index, value) pairs of a table, from
+	1 until the first nil."""
+	if isinstance(table, LuaTable):
+		# Stops at the first None, or the end of the array part (the
+		# hash part never has the following key).
+		return zip(count(1), iter(iter(table._array).__next__, None))
+	return ipairs_items(table)
+
+def ipairs_items(table):
+	get = table.get if isinstance(table, dict) else table.__getitem__
+	for index in count(1):
+		value = get(index)
+		if value is None:
+			return
+		yield index, value
+
+def pairs(table):
+	"""Returns an iterator of the (key, value) pairs of a table. Like
+	with lua's next, fields can be assigned or cleared meanwhile."""
+	if isinstance(table, LuaTable):
+		return pairs_items(table)
+	return iter(tuple(table.items()))
+
+def pairs_items(table):
+	for index, value in enumerate(table._array, 1):
+		if value is not None:
+			yield index, value
+	for key, value in tuple(table.__dict__.items()):
+		if value is not None: # Fields cleared as attributes
+			yield (key.value if key.__class__ is BooleanKey else key), value
+
+class table:
+	"""The functions of lua's table library that work on the array part
+	of tables."""
+
+	@staticmethod
+	def insert(table, *arguments):
+		"""table.insert(t, [position,] value)"""
+		if len(arguments) == 1:
+			table[len(table) + 1] = arguments[0]
+			return
+		if len(arguments) != 2:
+			raise TypeError("wrong number of arguments to 'insert'")
+
+		position, value = arguments
+		size = len(table)
+		if not 1 <= position <= size + 1:
+			raise IndexError("bad argument #2 to 'insert' (position out of bounds)")
+		if isinstance(table, LuaTable) and value is not None:
+			table._array.insert(position - 1, value)
+			grow(table)
+			return
+		for index in range(size, position - 1, -1):
+			table[index + 1] = table[index]
+		table[position] = value
+
+	@staticmethod
+	def remove(table, position=None):
+		"""table.remove(t, [position]), returns the removed value."""
+		size = len(table)
+		if position is None:
+			position = size
+		elif position != size and not 1 <= position <= size + 1:
+			raise IndexError("bad argument #2 to 'remove' (position out of bounds)")
+
+		if isinstance(table, LuaTable) and 1 <= position <= size:
+			value = table._array.pop(position - 1)
+			trim(table._array)
+			return value
+		value = table[position]
+		for index in range(position, size):
+			table[index] = table[index + 1]
+		table[max(position, size)] = None
+		return value
+
+	@staticmethod
+	def concat(table, separator="", start=1, end=None):
+		"""table.concat(t, [separator, [start, [end]]])"""
+		if end is None:
+			end = len(table)
+		if isinstance(table, LuaTable) and start == 1 and end == len(table):
+			try:
+				return separator.join(table._array)
+			except TypeError:
+				pass # Numbers, or invalid values reported below
+		values = []
+		for index in range(start, end + 1):
+			value = table[index]
+			if value.__class__ is str:
+				values.append(value)
+			elif value.__class__ in (int, float):
+				values.append(str(value))
+			else:
+				raise TypeError(
+					f"invalid value (at index {index}) in table for 'concat'"
+				)
+		return separator.join(values)
+
+	@staticmethod
+	def unpack(table, start=1, end=None):
+		"""table.unpack(t, [start, [end]]), as a tuple."""
+		if end is None:
+			end = len(table)
+		if isinstance(table, LuaTable) and start == 1 and end == len(table):
+			return tuple(table._array)
+		return tuple(table[index] for index in range(start, end + 1))
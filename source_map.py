@@ -0,0 +1,161 @@
+"""Source maps of converted code, and their use on profiles.
+
+transpile fills a SourceMap (and the cli writes it next to the output
+with --source-map): the lines of the generated code are mapped to the
+ones of the code it was converted from, and the random names of the
+functions LuaParser declares to their lua names. remap_stats and
+remap_text (see the remap tool) move the locations of a profile of
+the generated code back to the source.
+
+Code objects compiled by compile_lua (and imported by the import hook)
+don't need a map: they already have the lua lines and names."""
+import bisect
+import pstats
+import json
+import ast
+import re
+import os
+
+class SourceMap:
+	"""Maps the lines of a generated file to the ones of its source.
+
+	`lines` maps the generated lines statements start at to their
+	source lines, the lines in between belonging to the statement
+	before; `names` maps generated names to original ones."""
+
+	def __init__(self, source=None, generated=None, lines=None, names=None):
+		self.source = source
+		self.generated = generated
+		self.lines = {} if lines is None else lines
+		self.names = {} if names is None else names
+		self.starts = None # Sorted generated lines, once needed
+
+	def add(self, generated_line, source_line):
+		"""Maps a generated line, unless it already is."""
+		if generated_line not in self.lines:
+			self.lines[generated_line] = source_line
+			self.starts = None
+
+	def source_line(self, line):
+		"""Returns the source line of a generated one, or None if it is
+		before every mapped line (code the converter added)."""
+		if self.starts is None:
+			self.starts = sorted(self.lines)
+		index = bisect.bisect_right(self.starts, line)
+		if index == 0:
+			return None
+		return self.lines[self.starts[index - 1]]
+
+	def matches(self, filename):
+		"""Returns whether a file name (as written in a profile) is the
+		generated file, compared from the end: file.py matches
+		/srv/app/file.py."""
+		if self.generated is None:
+			return False
+		filename = os.path.normpath(filename)
+		generated = os.path.normpath(self.generated)
+		if len(filename) < len(generated):
+			filename, generated = generated, filename
+		return filename == generated or filename.endswith(os.sep + generated)
+
+	def remap(self, filename, line, name):
+		"""Returns the source (filename, line, name) of a generated
+		location, or the given one if it isn't in the generated file."""
+		if not self.matches(filename):
+			return filename, line, name
+		name = self.names.get(name, name)
+		source_line = self.source_line(line)
+		if source_line is None:
+			return filename, line, name
+		return self.source or filename, source_line, name
+
+	def to_dict(self):
+		return {
+			"version": 1,
+			"source": self.source,
+			"generated": self.generated,
+			"lines": sorted(self.lines.items()),
+			"names": self.names
+		}
+
+	@classmethod
+	def from_dict(cls, data):
+		if data.get("version") != 1:
+			raise ValueError(f"Unknown source map version: {data.get('version')}")
+		return cls(
+			data["source"], data["generated"],
+			{generated: source for generated, source in data["lines"]},
+			data["names"]
+		)
+
+	def save(self, path):
+		with open(path, "w", encoding="utf-8") as file:
+			json.dump(self.to_dict(), file)
+
+	@classmethod
+	def load(cls, path):
+		with open(path, encoding="utf-8") as file:
+			return cls.from_dict(json.load(file))
+
+def map_python_lines(py_ast, code, source_map):
+	"""Maps the lines of a python code generated from a python tree to
+	the lines its statements were given, reparsing the code: the
+	statements of both trees are walked side by side, until they
+	differ."""
+	generated = (node for node in ast.walk(ast.parse(code)) if isinstance(node, ast.stmt))
+	original = (node for node in ast.walk(py_ast) if isinstance(node, ast.stmt))
+
+	for new, old in zip(generated, original):
+		if new.__class__ is not old.__class__:
+			break
+		line = getattr(old, "lineno", None)
+		if line is not None:
+			source_map.add(new.lineno, line)
+	return source_map
+
+def remap_location(maps, filename, line, name):
+	for source_map in maps:
+		if source_map.matches(filename):
+			return source_map.remap(filename, line, name)
+	return filename, line, name
+
+def remap_stats(stats, maps):
+	"""Returns a pstats.Stats of the functions of `stats`, a profile of
+	generated code, at their source locations. Functions mapped to the
+	same location are merged."""
+	remapped = {}
+	for function, (cc, nc, tt, ct, callers) in stats.stats.items():
+		function = remap_location(maps, *function)
+		callers = {
+			remap_location(maps, *caller): timing for caller, timing in callers.items()
+		}
+		if function in remapped:
+			remapped[function] = pstats.add_func_stats(
+				remapped[function], (cc, nc, tt, ct, callers)
+			)
+		else:
+			remapped[function] = (cc, nc, tt, ct, callers)
+
+	result = pstats.Stats(stream=stats.stream)
+	result.stats = remapped
+	result.files = list(stats.files)
+	result.get_top_level_stats()
+	return result
+
+location_pattern = re.compile(r"([^\s:()\[\]<>\"']+):(\d+)")
+
+def remap_text(text, maps):
+	"""Rewrites the file:line locations of generated files in a text
+	(like the dump of a lua profiler) and their generated names."""
+	def location(match):
+		filename, line, _ = remap_location(maps, match[1], int(match[2]), None)
+		return f"{filename}:{line}"
+	text = location_pattern.sub(location, text)
+
+	names = {}
+	for source_map in maps:
+		names.update(source_map.names)
+	if names:
+		pattern = re.compile(r"\b(?:" + "|".join(map(re.escape, names)) + r")\b")
+		text = pattern.sub(lambda match: names[match[0]], text)
+	return text
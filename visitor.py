@@ -0,0 +1,180 @@
+from types import GeneratorType
+import time
+import abc
+
+from .profiling import get_profile
+
+class Visitor(abc.ABC):
+	"""Base class of the abstract syntax tree visitors.
+
+	Every subclass gets a `dispatch` table, built once when the class is
+	created, mapping the node types it handles to its visit_<type>
+	functions. Lookups are a single dict access instead of formatting
+	the method name and calling getattr for every node.
+
+	A visit function either returns its result, or is a generator that
+	yields the children it needs visited and receives their results:
+
+		left = yield node["left"], body
+
+	A yielded tuple is (node, *arguments), anything else is a node
+	visited without arguments. visit() runs those generators on an
+	explicit stack, so the depth of the tree is not limited by the
+	python recursion limit. Resuming generators costs about 1.6 times
+	the time per node of recursive visit functions (see
+	benchmarks.visitors and benchmarks.deep).
+
+	With a `profile` (the visitor's own, or the active one) keeping node
+	stats, visit() runs visit_profiled instead, timing every visit
+	function."""
+	dispatch = {}
+	profile = None
+
+	def __init_subclass__(cls, **kwargs):
+		super().__init_subclass__(**kwargs)
+		cls.dispatch = {}
+
+		for name in dir(cls):
+			if name.startswith("visit_"):
+				function = getattr(cls, name)
+				for key in cls.dispatch_keys(name[6:]):
+					cls.dispatch[key] = function
+
+	@classmethod
+	def dispatch_keys(cls, name):
+		"""Returns the dispatch table keys of a visit_<name> function."""
+		return (name,)
+
+	@abc.abstractmethod
+	def lookup(self, node):
+		"""Returns the visit function of a node."""
+
+	def node_type(self, node):
+		"""Returns the name of the type of a node."""
+		return node.__class__.__name__
+
+	def visit(self, node, *args):
+		profile = self.profile or get_profile()
+		if profile is not None and profile.node_stats:
+			return self.visit_profiled(profile, node, *args)
+
+		lookup = self.lookup
+		stack = [] # Suspended parents of the running generator
+		generator = None
+		value = lookup(node)(self, node, *args)
+		error = None
+
+		while True:
+			if value.__class__ is GeneratorType:
+				if generator is not None:
+					stack.append(generator)
+				generator, value = value, None
+			elif generator is None:
+				return value
+
+			try:
+				if error is None:
+					request = generator.send(value)
+				else:
+					# Raised where the child was requested, so tracebacks
+					# show the visit functions that led to the error.
+					request, error = generator.throw(error), None
+			except StopIteration as stop:
+				value = stop.value
+				generator = stack.pop() if stack else None
+				continue
+			except Exception as raised:
+				if not stack:
+					raise
+				generator, value, error = stack.pop(), None, raised
+				continue
+
+			try:
+				if request.__class__ is tuple:
+					value = lookup(request[0])(self, *request)
+				else:
+					value = lookup(request)(self, request)
+			except Exception as raised:
+				value, error = None, raised
+
+	def visit_profiled(self, profile, node, *args):
+		"""Runs like visit, adding every node to a Profile. The own time
+		of a node is the one spent running its visit function (resuming
+		its generator), the total one runs until it returned, and is only
+		counted for the outermost of nested nodes of a type."""
+		lookup, node_type, clock = self.lookup, self.node_type, time.perf_counter
+		visitor = f"{self.__module__.rpartition('.')[2]}.{self.__class__.__name__}"
+		stack = [] # Suspended parents of the running frame
+		frame = None # [generator, node type, start, own time]
+		running = {} # node type: frames of that type on the stack
+		request = (node, *args)
+		value = error = None
+
+		while True:
+			if request is not None:
+				kind, start = None, clock()
+				try:
+					kind = node_type(request[0])
+					value = lookup(request[0])(self, *request)
+				except Exception as raised:
+					value, error = None, raised
+				now = clock()
+				request = None
+
+				if value.__class__ is GeneratorType:
+					if frame is not None:
+						stack.append(frame)
+					frame, value = [value, kind, start, now - start], None
+					running[kind] = running.get(kind, 0) + 1
+				else:
+					if kind is not None:
+						total = 0.0 if running.get(kind) else now - start
+						profile.add_node(visitor, kind, now - start, total)
+					if frame is None:
+						if error is not None:
+							raise error
+						return value
+
+			start = clock()
+			try:
+				if error is None:
+					request = frame[0].send(value)
+				else:
+					request, error = frame[0].throw(error), None
+			except StopIteration as stop:
+				self.end_frame(profile, visitor, frame, running, clock() - start)
+				value = stop.value
+				if not stack:
+					return value
+				frame = stack.pop()
+				continue
+			except Exception as raised:
+				self.end_frame(profile, visitor, frame, running, clock() - start)
+				if not stack:
+					raise
+				frame, value, error = stack.pop(), None, raised
+				continue
+
+			frame[3] += clock() - start
+			if request.__class__ is not tuple:
+				request = (request,)
+
+	def end_frame(self, profile, visitor, frame, running, elapsed):
+		_, kind, start, own = frame
+		running[kind] -= 1
+		total = 0.0 if running[kind] else time.perf_counter() - start
+		profile.add_node(visitor, kind, own + elapsed, total)
+
+class LuaVisitor(Visitor):
+	"""A visitor of lua abstract syntax trees, either luaparse dicts or
+	lua_nodes."""
+
+	def node_type(self, node):
+		return node["type"] if isinstance(node, dict) else node.type
+
+	def lookup(self, node):
+		kind = node["type"] if isinstance(node, dict) else node.type
+		parser = self.dispatch.get(kind)
+		if parser is None:
+			raise TypeError(f"Unknown Lua AST node: {kind}")
+		return parser
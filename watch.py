@@ -0,0 +1,180 @@
+import tempfile
+import hashlib
+import time
+import os
+
+from .batch import TranspileResult, collect_files
+
+def write_if_changed(path, code):
+	"""Writes a code to a file unless it already holds the same bytes,
+	so its modification time only changes with its content. Returns
+	whether the file was written."""
+	data = code.encode("utf-8")
+	try:
+		with open(path, "rb") as file:
+			if file.read() == data:
+				return False
+	except OSError:
+		pass
+
+	directory = os.path.dirname(path) or "."
+	os.makedirs(directory, exist_ok=True)
+	descriptor, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+	try:
+		with os.fdopen(descriptor, "wb") as file:
+			file.write(data)
+		os.replace(temporary, path)
+	except BaseException:
+		try:
+			os.unlink(temporary)
+		except OSError:
+			pass
+		raise
+	return True
+
+class Watcher:
+	"""Keeps the files converted from src into dst up to date.
+
+	src is polled every `interval` seconds, comparing the modification
+	time and size of every file. Changes are converted once no file
+	changed for `debounce` seconds, so a burst of saves is a single
+	rebuild. Files are converted with transpile_incremental, keeping
+	their manifests in the `manifests` directory (a temporary one by
+	default), and outputs are only written when their content changed.
+	`concat`, `optimize` and `tables` are the ones of
+	transpile_incremental.
+
+	`report` is called with the TranspileResult of every converted file
+	and whether its output was written. Outputs of deleted files are
+	left in place."""
+
+	def __init__(self, src, dst, direction, version="5.1", parser="node",
+				 indent="  ", manifests=None, interval=0.5, debounce=0.2,
+				 report=None, concat="call", optimize=0, tables="dict"):
+		from .incremental import check_options
+		from . import directions
+
+		if direction not in directions:
+			raise ValueError(f"Unknown direction: {direction}")
+		check_options(direction, optimize)
+		self.source_suffix, self.destination_suffix = directions[direction]
+
+		self.src = src
+		self.dst = dst
+		self.direction = direction
+		self.version = version
+		self.parser = parser
+		self.indent = indent
+		self.manifests = manifests or tempfile.mkdtemp(prefix="hybrid-manifests-")
+		self.interval = interval
+		self.debounce = debounce
+		self.report = report
+		self.concat = concat
+		self.optimize = optimize
+		self.tables = tables
+
+		self.snapshot = {} # path: (mtime, size)
+		self.digests = {} # path: digest of the last converted code
+
+	def scan(self):
+		"""Returns the (modification time, size) of every source file,
+		by path relative to src."""
+		snapshot = {}
+		for path in collect_files(self.src, self.source_suffix):
+			try:
+				stat = os.stat(os.path.join(self.src, path))
+			except OSError:
+				continue # Removed while scanning
+			snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+		return snapshot
+
+	def convert(self, path):
+		"""Converts a file if its code changed since it was last
+		converted. Returns (TranspileResult, written)."""
+		from . import transpile_incremental
+
+		source = os.path.join(self.src, path)
+		destination = os.path.join(
+			self.dst, path[:-len(self.source_suffix)] + self.destination_suffix
+		)
+		manifest = os.path.join(self.manifests, path + ".manifest")
+
+		start = time.perf_counter()
+		try:
+			with open(source, "rb") as file:
+				code = file.read()
+
+			digest = hashlib.sha256(code).digest()
+			written = False
+			if self.digests.get(path) != digest or not os.path.exists(destination):
+				result = transpile_incremental(
+					code.decode("utf-8"), self.direction, manifest,
+					self.version, self.parser, self.indent, self.concat,
+					self.optimize, self.tables
+				)
+				written = write_if_changed(destination, result.code)
+				self.digests[path] = digest
+		except Exception as error: # One bad file must not stop the watch
+			self.digests.pop(path, None)
+			return TranspileResult(
+				source, destination,
+				f"{type(error).__name__}: {error}",
+				time.perf_counter() - start
+			), False
+
+		return TranspileResult(
+			source, destination, None, time.perf_counter() - start
+		), written
+
+	def build(self, paths):
+		"""Converts the given files, in order, and returns their
+		(TranspileResult, written)."""
+		results = []
+		for path in paths:
+			result = self.convert(path)
+			if self.report is not None:
+				self.report(*result)
+			results.append(result)
+		return results
+
+	def settle(self, snapshot):
+		"""Returns a snapshot of src once it stopped changing for
+		`debounce` seconds, starting from a fresh one."""
+		quiet_since = time.monotonic()
+		while True:
+			time.sleep(min(self.debounce, self.interval))
+			current = self.scan()
+			if current != snapshot:
+				snapshot, quiet_since = current, time.monotonic()
+			elif time.monotonic() - quiet_since >= self.debounce:
+				return snapshot
+
+	def poll(self):
+		"""Converts the files added or changed since the last poll,
+		waiting for the changes to settle. Returns their results."""
+		snapshot = self.scan()
+		if snapshot == self.snapshot:
+			return []
+
+		snapshot = self.settle(snapshot)
+		changed = [
+			path for path, stat in snapshot.items()
+			if self.snapshot.get(path) != stat
+		]
+		for path in self.digests.keys() - snapshot.keys():
+			del self.digests[path]
+		self.snapshot = snapshot
+		return self.build(changed)
+
+	def run(self, stop=None):
+		"""Converts every file, then keeps converting changes until
+		`stop()` returns True or the watch is interrupted."""
+		self.snapshot = self.scan()
+		self.build(sorted(self.snapshot))
+
+		try:
+			while stop is None or not stop():
+				time.sleep(self.interval)
+				self.poll()
+		except KeyboardInterrupt:
+			pass